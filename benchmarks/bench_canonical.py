@@ -0,0 +1,166 @@
+"""
+Canonical JSON Benchmark
+========================
+Checks that the orjson canonical encoder is byte-identical to the stdlib
+one, then times both and the signing paths built on them.
+
+Equivalence: --fuzz random payloads mixing nested dicts/lists, ints,
+floats across 60 orders of magnitude, NaN/Infinity, None/bools, and
+strings with non-ASCII, astral, control, quote and backslash characters
+(plus the same on keys). Any mismatch is printed and fails the run.
+
+Timed payloads:
+- small:   2 keys
+- large:   ~64 KB sync payload (same shape as bench_lib)
+- chunks:  --chunks document chunks with text and 1536-d embeddings
+           (a chunk batch of several MB)
+
+Usage:
+    python -m benchmarks.bench_canonical [--fuzz 20000] [--chunks 100] [--repeat 5] [--json]
+
+Exit status is 1 on any mismatch, 2 if orjson is not installed.
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.canonical import stdlib_canonical_json, orjson_canonical_json, set_canonical_encoder
+from lib.crypto import CryptoIdentity, SecretGenerator
+
+ALPHABET = 'abcXYZ019 é中😀"\\/\n\t\x00\x1f\x7f e.:,[]{}-'
+
+
+def random_payload(rng: random.Random, depth: int = 0) -> Any:
+    roll = rng.random()
+    if depth > 3 or roll < 0.3:
+        kind = rng.random()
+        if kind < 0.02:
+            return rng.choice([float('nan'), float('inf'), float('-inf')])
+        if kind < 0.1:
+            return rng.choice([0.0, -0.0, 1e16, 1e-5, 0.0001, 5e-324, 1.7976931348623157e308])
+        return rng.uniform(-1, 1) * 10 ** rng.randint(-30, 30)
+    if roll < 0.45:
+        return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 12)))
+    if roll < 0.55:
+        return rng.choice([None, True, False, rng.randint(-2 ** 63, 2 ** 64), rng.randint(-10, 10)])
+    if roll < 0.8:
+        return [random_payload(rng, depth + 1) for _ in range(rng.randint(0, 6))]
+    return {''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 6))): random_payload(rng, depth + 1)
+            for _ in range(rng.randint(0, 6))}
+
+
+def fuzz(count: int, seed: int) -> int:
+    """Number of payloads where the encoders disagree."""
+    rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(count):
+        payload = random_payload(rng)
+        expected = stdlib_canonical_json(payload)
+        actual = orjson_canonical_json(payload)
+        if actual != expected:
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"✗ mismatch for {payload!r}\n  stdlib: {expected!r}\n  orjson: {actual!r}")
+    return mismatches
+
+
+def payloads(chunks: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    return {
+        'small': {'action': 'verify', 'yacht_id': 'BENCH_001'},
+        'large': {'action': 'sync', 'items': [
+            {'id': i, 'name': f'item-{i}', 'hash': 'ab' * 16, 'size': i * 1024} for i in range(900)
+        ]},
+        'chunks': {'yacht_id': 'BENCH_001', 'old_hashes': [], 'chunks': [{
+            'text': 'Ölfilter alle 500 Betriebsstunden wechseln; see section 4.2 for torque values. ' * 18,
+            'chunk_index': i,
+            'char_start': i * 1400,
+            'char_end': (i + 1) * 1400,
+            'file_path': f'/nas/manuals/MTU/service_manual.pdf#{i}',
+            'file_hash': 'cd' * 32,
+            'embedding': [rng.gauss(0, 0.03) for _ in range(1536)],
+            'metadata': {'page': i // 3, 'section': None},
+        } for i in range(chunks)]},
+    }
+
+
+def _best_us(fn: Callable[[], Any], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= 0.05:
+                break
+            number *= 4
+        best = min(best, elapsed / number)
+    return best * 1e6
+
+
+def run(chunks: int, repeat: int, seed: int) -> Dict[str, Dict[str, float]]:
+    identity = CryptoIdentity('BENCH_001', SecretGenerator.generate_shared_secret())
+    results = {}
+    for name, payload in payloads(chunks, seed).items():
+        body = stdlib_canonical_json(payload)
+        row = {
+            'bytes': len(body),
+            'stdlib_us': _best_us(lambda: stdlib_canonical_json(payload), repeat),
+            'orjson_us': _best_us(lambda: orjson_canonical_json(payload), repeat),
+        }
+        set_canonical_encoder('stdlib')
+        row['sign_request_stdlib_us'] = _best_us(lambda: identity.sign_request(payload, 1), repeat)
+        set_canonical_encoder('orjson')
+        row['sign_request_orjson_us'] = _best_us(lambda: identity.sign_request(payload, 1), repeat)
+        row['sign_body_us'] = _best_us(lambda: identity.sign_body(body, 1), repeat)
+        row['speedup'] = row['stdlib_us'] / row['orjson_us']
+        results[name] = {k: round(v, 2) for k, v in row.items()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and benchmark the canonical JSON encoders")
+    parser.add_argument('--fuzz', type=int, default=20000, help='Random payloads to compare')
+    parser.add_argument('--chunks', type=int, default=100, help='Chunks in the large chunk batch')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per case (best is kept)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    try:
+        set_canonical_encoder('orjson')
+    except ImportError:
+        print("✗ orjson is not installed", file=sys.stderr)
+        sys.exit(2)
+
+    mismatches = fuzz(args.fuzz, args.seed)
+    results = run(args.chunks, args.repeat, args.seed)
+
+    if args.json:
+        print(json.dumps({'fuzz': args.fuzz, 'mismatches': mismatches, 'results': results}, indent=2))
+    else:
+        print("=" * 78)
+        print(f"Canonical JSON: {args.fuzz:,} random payloads, {mismatches} mismatches")
+        print("=" * 78)
+        print(f"  {'payload':<8}{'bytes':>11}{'stdlib':>11}{'orjson':>11}{'speedup':>9}"
+              f"{'sign(std)':>11}{'sign(oj)':>11}{'sign_body':>11}")
+        for name, r in results.items():
+            print(f"  {name:<8}{r['bytes']:>11,}{r['stdlib_us']:>11.1f}{r['orjson_us']:>11.1f}"
+                  f"{r['speedup']:>8.1f}x{r['sign_request_stdlib_us']:>11.1f}"
+                  f"{r['sign_request_orjson_us']:>11.1f}{r['sign_body_us']:>11.1f}")
+        print("\n  times in microseconds per call (best of repeats)")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
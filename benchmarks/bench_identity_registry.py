@@ -0,0 +1,198 @@
+"""
+Identity Registry Benchmark
+===========================
+Memory per yacht and signing cost of lib.crypto.IdentityRegistry against
+what a relay does without it, plus a hot-reload consistency check.
+
+Memory (tracemalloc, --yachts identities built from freshly fetched hex
+secrets; yacht_id strings excluded):
+- registry      IdentityRegistry
+- identities    dict of yacht_id -> CryptoIdentity with its hash computed
+
+Signing one small body for a random yacht (best of --repeat):
+- per_request   CryptoIdentity(yacht_id, secret) built per request, hash included
+- identities    lookup in the CryptoIdentity dict, then sign_body
+- registry      IdentityRegistry.sign_body
+
+Hot reload: --threads signers sign random yachts while the main thread
+swaps the whole table between two secret sets (load) and rotates single
+yachts (update). Every signature must match one of the yacht's two
+secrets; anything else is a torn read and fails the run.
+
+Usage:
+    python -m benchmarks.bench_identity_registry [--yachts 50000] [--repeat 5] [--threads 4] [--json]
+
+Exit status is 1 if the reload check saw an inconsistent signature.
+"""
+
+import sys
+import hmac
+import json
+import time
+import random
+import argparse
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.crypto import CryptoIdentity, IdentityRegistry, mint_tokens
+
+BODY = b'{"action":"sync","yacht_id":"relay"}'
+TIMESTAMP = 1700000000
+
+
+def _traced_bytes(build: Callable[[], Any]) -> Tuple[Any, int]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return built, after - before
+
+
+def _best_ns(fn: Callable[[str], Any], ids: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for yacht_id in ids:
+            fn(yacht_id)
+        best = min(best, (time.perf_counter() - start) / len(ids))
+    return best * 1e9
+
+
+def memory(fleet: List[Tuple[str, str]]) -> Dict[str, float]:
+    # Secrets arrive as fresh hex strings (e.g. from a database fetch);
+    # CryptoIdentity keeps them, the registry keeps only the raw bytes
+    def fresh():
+        return ((yacht_id, secret.encode('ascii').decode('ascii')) for yacht_id, secret in fleet)
+
+    def identities():
+        table = {}
+        for yacht_id, secret in fresh():
+            identity = CryptoIdentity(yacht_id, secret)
+            identity.yacht_id_hash
+            table[yacht_id] = identity
+        return table
+
+    _, registry_bytes = _traced_bytes(lambda: IdentityRegistry(fresh()))
+    _, identity_bytes = _traced_bytes(identities)
+    n = len(fleet)
+    return {
+        'registry_bytes_per_yacht': round(registry_bytes / n, 1),
+        'identities_bytes_per_yacht': round(identity_bytes / n, 1),
+        'registry_total_mb': round(registry_bytes / 2 ** 20, 2),
+        'identities_total_mb': round(identity_bytes / 2 ** 20, 2),
+    }
+
+
+def signing(fleet: List[Tuple[str, str]], repeat: int, seed: int) -> Dict[str, float]:
+    secrets = dict(fleet)
+    registry = IdentityRegistry(fleet)
+    identities = {yacht_id: CryptoIdentity(yacht_id, secret) for yacht_id, secret in fleet}
+    rng = random.Random(seed)
+    ids = [rng.choice(fleet)[0] for _ in range(min(len(fleet), 50000))]
+
+    def per_request(yacht_id):
+        identity = CryptoIdentity(yacht_id, secrets[yacht_id])
+        identity.yacht_id_hash
+        return identity.sign_body(BODY, TIMESTAMP)
+
+    row = {
+        'per_request_ns': _best_ns(per_request, ids, repeat),
+        'identities_ns': _best_ns(lambda y: identities[y].sign_body(BODY, TIMESTAMP), ids, repeat),
+        'registry_ns': _best_ns(lambda y: registry.sign_body(y, BODY, TIMESTAMP), ids, repeat),
+    }
+
+    start = time.perf_counter()
+    registry.load(fleet)
+    row['load_ms'] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    registry.update({ids[0]: secrets[ids[0]]})
+    row['update_one_ms'] = (time.perf_counter() - start) * 1000
+    row['speedup'] = row['per_request_ns'] / row['registry_ns']
+    return {k: round(v, 2) for k, v in row.items()}
+
+
+def reload_check(fleet: List[Tuple[str, str]], threads: int, seconds: float, seed: int) -> Dict[str, int]:
+    """Sign while the table is swapped; count signatures matching neither secret."""
+    alternate = list(zip([y for y, _ in fleet], [t for t, _ in mint_tokens(len(fleet))]))
+    allowed = {y: (bytes.fromhex(a), bytes.fromhex(b)) for (y, a), (_, b) in zip(fleet, alternate)}
+    registry = IdentityRegistry(fleet)
+    ids = [y for y, _ in fleet]
+    stop = threading.Event()
+    counts = {'signatures': 0, 'inconsistent': 0, 'reloads': 0}
+    lock = threading.Lock()
+
+    def signer(worker: int):
+        rng = random.Random(seed + worker)
+        signed = bad = 0
+        while not stop.is_set():
+            yacht_id = rng.choice(ids)
+            signature = registry.sign_body(yacht_id, BODY, TIMESTAMP)['X-Signature']
+            message = f"{TIMESTAMP}:".encode('utf-8') + BODY
+            if signature not in (hmac.digest(k, message, 'sha256').hex() for k in allowed[yacht_id]):
+                bad += 1
+            signed += 1
+        with lock:
+            counts['signatures'] += signed
+            counts['inconsistent'] += bad
+
+    workers = [threading.Thread(target=signer, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        registry.load(alternate if counts['reloads'] % 2 == 0 else fleet)
+        registry.update([rng.choice(alternate), rng.choice(fleet)])
+        counts['reloads'] += 2
+    stop.set()
+    for w in workers:
+        w.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the multi-yacht identity registry")
+    parser.add_argument('--yachts', type=int, default=50000, help='Yachts in the registry')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per signing case (best is kept)')
+    parser.add_argument('--threads', type=int, default=4, help='Signer threads in the reload check')
+    parser.add_argument('--reload-seconds', type=float, default=3.0, help='Duration of the reload check')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    fleet = [(f"YACHT_{i:06d}", secret) for i, (secret, _) in enumerate(mint_tokens(args.yachts))]
+    report = {
+        'yachts': args.yachts,
+        'memory': memory(fleet),
+        'signing': signing(fleet, args.repeat, args.seed),
+        'reload': reload_check(fleet, args.threads, args.reload_seconds, args.seed),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        m, s, r = report['memory'], report['signing'], report['reload']
+        print("=" * 64)
+        print(f"Identity registry: {args.yachts:,} yachts")
+        print("=" * 64)
+        print(f"  memory/yacht    registry {m['registry_bytes_per_yacht']:.0f} B "
+              f"({m['registry_total_mb']:.2f} MB), CryptoIdentity dict "
+              f"{m['identities_bytes_per_yacht']:.0f} B ({m['identities_total_mb']:.2f} MB)")
+        print(f"  sign_body       per-request {s['per_request_ns']:.0f} ns, "
+              f"identity dict {s['identities_ns']:.0f} ns, registry {s['registry_ns']:.0f} ns "
+              f"({s['speedup']:.1f}x)")
+        print(f"  reload          load {s['load_ms']:.1f} ms, rotate one {s['update_one_ms']:.2f} ms")
+        verdict = 'OK' if not r['inconsistent'] else 'TORN READS'
+        print(f"  hot reload      {r['signatures']:,} signatures across {r['reloads']} swaps, "
+              f"{r['inconsistent']} inconsistent  [{verdict}]")
+
+    sys.exit(1 if report['reload']['inconsistent'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Import-Time Benchmark
+=====================
+Measures import work for the installer and CLI entry points with
+`python -X importtime`, and fails when a scenario exceeds its budget.
+
+Only imports made after interpreter startup (after `site`) are counted,
+so the numbers reflect this package and what it pulls in, not the
+environment's .pth hooks.
+
+Scenarios:
+- lib:            `import lib` (lazy package, should load nothing)
+- verify_help:    `python -m lib.verify --help`
+- installer_gui:  everything the installer binary imports before its
+                  first window (lib.installer, lib.installer_ui, tkinter)
+- installer_cli:  `import lib.installer`
+
+Usage:
+    python -m benchmarks.bench_import [--budget-ms 100] [--runs 5] [--json]
+
+Exit status is 1 if any scenario's median exceeds the budget.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCENARIOS: Dict[str, List[str]] = {
+    'lib': ['-c', 'import lib'],
+    'verify_help': ['-m', 'lib.verify', '--help'],
+    'installer_gui': ['-c', 'import lib.installer, lib.installer_ui, tkinter, tkinter.ttk'],
+    'installer_cli': ['-c', 'import lib.installer'],
+}
+
+
+def parse_importtime(stderr: str) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Sum self-time of imports made after interpreter startup.
+
+    Returns:
+        (total_us, [(module, self_us), ...]) for post-startup imports
+    """
+    modules = []
+    after_site = False
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _cumulative, name = line[len('import time:'):].split('|')
+        if not after_site:
+            # Top-level `site` line closes the startup block
+            if name.rstrip() == ' site':
+                after_site = True
+            continue
+        modules.append((name.strip(), int(self_us)))
+    return sum(us for _, us in modules), modules
+
+
+def measure(args: List[str], write_bytecode: bool = False) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Run one scenario in a fresh interpreter.
+
+    Measured runs never write .pyc files, so one run cannot speed up the
+    next; only the warm-up (write_bytecode=True) fills the cache.
+    """
+    env = dict(os.environ)
+    if write_bytecode:
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+    else:
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Scenario {args} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def run(runs: int) -> Dict[str, Dict]:
+    """Measure every scenario; median of `runs` fresh processes."""
+    results = {}
+    for name, args in SCENARIOS.items():
+        totals = []
+        heaviest: List[Tuple[str, int]] = []
+        for _ in range(runs):
+            total, modules = measure(args)
+            totals.append(total)
+            heaviest = sorted(modules, key=lambda m: m[1], reverse=True)[:5]
+        results[name] = {
+            'median_ms': statistics.median(totals) / 1000,
+            'max_ms': max(totals) / 1000,
+            'heaviest': [{'module': m, 'self_ms': us / 1000} for m, us in heaviest],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time regression check")
+    parser.add_argument('--budget-ms', type=float, default=100.0, help='Per-scenario budget')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per scenario')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    # Warm the bytecode cache so the first run does not count compilation
+    measure(['-c', 'import lib.installer, lib.verify, lib.installer_ui, tkinter, tkinter.ttk'],
+            write_bytecode=True)
+
+    results = run(args.runs)
+    over = [name for name, r in results.items() if r['median_ms'] > args.budget_ms]
+
+    if args.json:
+        print(json.dumps({'budget_ms': args.budget_ms, 'results': results, 'over_budget': over}, indent=2))
+    else:
+        print("=" * 60)
+        print(f"Import time (budget {args.budget_ms:.0f} ms, median of {args.runs})")
+        print("=" * 60)
+        for name, r in results.items():
+            icon = "✗" if name in over else "✓"
+            print(f"  {icon} {name:<16} {r['median_ms']:8.1f} ms  (max {r['max_ms']:.1f})")
+            for m in r['heaviest'][:3]:
+                print(f"        {m['module']:<32} {m['self_ms']:6.1f} ms")
+
+    sys.exit(1 if over else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Library Benchmark Suite
+=======================
+Per-operation timings for the crypto, manifest and installer hot paths,
+compared against a stored JSON baseline.
+
+Cases:
+- sign_request / verify_signature / verify_response at 3 payload sizes
+  (small: 2 keys, medium: ~1 KB, large: ~64 KB)
+- compute_yacht_hash
+- InstallConfig.load, cold (cache cleared) and warm
+- full register -> activate -> verify cycle of one InstallationOrchestrator
+  against the local CloudStub (benchmarks.cloud_stub)
+
+Each case reports the best-of-N mean time per call in microseconds, which
+is the figure least disturbed by other load on the machine.
+
+Usage:
+    python -m benchmarks.bench_lib                    # compare to baseline
+    python -m benchmarks.bench_lib --save-baseline    # record new baseline
+    python -m benchmarks.bench_lib --threshold 0.5 --json
+
+Exit status is 1 if any case is slower than baseline * (1 + threshold).
+Baselines are machine-specific: re-record after changing hardware.
+"""
+
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Callable, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.crypto import CryptoIdentity, RequestVerifier, SecretGenerator, compute_yacht_hash
+from lib.installer import InstallConfig, InstallationOrchestrator, InstallState, KeychainStore
+from benchmarks.cloud_stub import CloudStub, MemorySecretBackend
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines' / 'bench_lib.json'
+DEFAULT_THRESHOLD = 0.25
+
+
+def _payloads() -> Dict[str, Dict[str, Any]]:
+    return {
+        'small': {'action': 'verify', 'yacht_id': 'BENCH_001'},
+        'medium': {'action': 'sync', 'items': [
+            {'id': i, 'name': f'item-{i}', 'ok': True} for i in range(24)
+        ]},
+        'large': {'action': 'sync', 'items': [
+            {'id': i, 'name': f'item-{i}', 'hash': 'ab' * 16, 'size': i * 1024} for i in range(900)
+        ]},
+    }
+
+
+def _time_us(fn: Callable[[], Any], repeat: int) -> float:
+    """
+    Best-of-`repeat` mean microseconds per call.
+
+    The loop count is calibrated so each repetition runs for at least
+    0.2 s, which keeps scheduler noise out of the microsecond cases.
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(number=number, repeat=repeat)) / number * 1e6
+
+
+def crypto_cases(repeat: int) -> Dict[str, float]:
+    secret = SecretGenerator.generate_shared_secret()
+    identity = CryptoIdentity('BENCH_001', secret)
+    results = {}
+
+    for size, payload in _payloads().items():
+        headers = identity.sign_request(payload)
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        ts = headers['X-Timestamp']
+        response_sig = identity.sign_request(payload, int(ts))['X-Signature']
+
+        results[f'sign_request[{size}]'] = _time_us(
+            lambda: identity.sign_request(payload), repeat)
+        results[f'verify_signature[{size}]'] = _time_us(
+            lambda: RequestVerifier.verify_signature(
+                'BENCH_001', secret, payload, headers['X-Signature'], ts),
+            repeat)
+        results[f'verify_response[{size}]'] = _time_us(
+            lambda: identity.verify_response(body, response_sig, ts), repeat)
+
+    results['compute_yacht_hash'] = _time_us(
+        lambda: compute_yacht_hash('BENCH_001'), repeat)
+    return results
+
+
+def manifest_cases(repeat: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'install_manifest.json'
+        path.write_text(json.dumps({
+            'yacht_id': 'BENCH_001',
+            'yacht_id_hash': compute_yacht_hash('BENCH_001'),
+            'api_endpoint': 'https://example.supabase.co',
+            'version': '1.0.0',
+            'build_timestamp': int(time.time()),
+        }))
+
+        def cold():
+            InstallConfig.clear_cache()
+            InstallConfig.load(path)
+
+        results = {
+            'manifest_load[cold]': _time_us(cold, repeat),
+            'manifest_load[warm]': _time_us(lambda: InstallConfig.load(path), repeat),
+        }
+        InstallConfig.clear_cache()
+        return results
+
+
+def install_cycle_case(repeat: int) -> Dict[str, float]:
+    """Fresh yacht per call: initialize -> register -> activate -> verify."""
+    KeychainStore.set_backend(MemorySecretBackend())
+    counter = iter(range(10**9))
+
+    with CloudStub() as stub:
+        def cycle():
+            yacht_id = f"BENCH_{next(counter):06d}"
+            config = InstallConfig(
+                yacht_id=yacht_id,
+                yacht_id_hash=compute_yacht_hash(yacht_id),
+                api_endpoint=stub.url,
+                n8n_endpoint=stub.url,
+            )
+            orchestrator = InstallationOrchestrator(config)
+            orchestrator.ACTIVATION_POLL_INTERVAL = 0
+            try:
+                if orchestrator.initialize() != InstallState.UNREGISTERED:
+                    raise RuntimeError("unexpected initial state")
+                ok, message = orchestrator.register()
+                if not ok:
+                    raise RuntimeError(message)
+                if not orchestrator.wait_for_activation():
+                    raise RuntimeError("activation failed")
+                if not orchestrator._verify_credentials():
+                    raise RuntimeError("credential verification failed")
+            finally:
+                orchestrator._transport.close()
+
+        try:
+            return {'install_cycle': _time_us(cycle, repeat)}
+        finally:
+            KeychainStore.set_backend(None)
+
+
+def run(repeat: int = 5) -> Dict[str, float]:
+    """Run every case and return microseconds per call."""
+    results: Dict[str, float] = {}
+    results.update(crypto_cases(repeat))
+    results.update(manifest_cases(repeat))
+    results.update(install_cycle_case(repeat))
+    return results
+
+
+def compare(
+    results: Dict[str, float],
+    baseline: Dict[str, float],
+    threshold: float
+) -> Dict[str, Tuple[float, float, bool]]:
+    """
+    Compare results with a baseline.
+
+    Returns:
+        case -> (baseline_us, ratio, regressed); cases missing from the
+        baseline are skipped
+    """
+    report = {}
+    for case, us in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        ratio = us / base
+        report[case] = (base, ratio, ratio > 1 + threshold)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lib crypto / installer hot paths")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE,
+                        help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Write results as the new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per case (best is kept)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'recorded': time.strftime('%Y-%m-%d'),
+            'results_us': {k: round(v, 3) for k, v in results.items()},
+        }, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text()).get('results_us', {})
+    report = compare(results, baseline, args.threshold)
+    regressions = [case for case, (_, _, bad) in report.items() if bad]
+
+    if args.json:
+        print(json.dumps({
+            'threshold': args.threshold,
+            'results_us': results,
+            'ratios': {case: ratio for case, (_, ratio, _) in report.items()},
+            'regressions': regressions,
+        }, indent=2))
+    else:
+        print("=" * 72)
+        print(f"lib benchmark (threshold {args.threshold:.0%}, baseline {args.baseline.name})")
+        print("=" * 72)
+        for case, us in results.items():
+            if case in report:
+                base, ratio, bad = report[case]
+                mark = '✗' if bad else '✓'
+                print(f"  {mark} {case:<28} {us:12.2f} µs   baseline {base:12.2f} µs   x{ratio:.2f}")
+            else:
+                print(f"    {case:<28} {us:12.2f} µs   (no baseline)")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Transport Benchmark
+===================
+Requests/sec against a local keep-alive HTTP server.
+
+Compares:
+- bare requests.post per call (no pooling; the old verify.py pattern)
+- Transport, single thread (pooled keep-alive)
+- Transport, N threads sharing one pool
+- AsyncTransport, N concurrent tasks (skipped if httpx is not installed)
+
+Usage:
+    python -m benchmarks.bench_transport [--requests 2000] [--concurrency 8] [--json]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.transport import Transport, AsyncTransport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Echo-style JSON handler with keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # second write waits on the client's delayed ACK (~40 ms per request)
+    disable_nagle_algorithm = True
+    body = json.dumps({'status': 'verified'}).encode('utf-8')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    """Start the local server on an ephemeral port."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _rate(n: int, fn: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - start)
+
+
+def bench_bare_requests(url: str, n: int) -> float:
+    import requests
+
+    def run():
+        for _ in range(n):
+            requests.post(url, json={'action': 'verify'}, timeout=10)
+    return _rate(n, run)
+
+
+def bench_transport(url: str, n: int) -> float:
+    transport = Transport(headers={'Content-Type': 'application/json'})
+
+    def run():
+        for _ in range(n):
+            transport.post(url, json={'action': 'verify'})
+    try:
+        return _rate(n, run)
+    finally:
+        transport.close()
+
+
+def bench_transport_threads(url: str, n: int, concurrency: int) -> float:
+    transport = Transport(pool_size=concurrency)
+
+    def run():
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: transport.post(url, json={'action': 'verify'}), range(n)))
+    try:
+        return _rate(n, run)
+    finally:
+        transport.close()
+
+
+def bench_async_transport(url: str, n: int, concurrency: int) -> float:
+    async def main():
+        async with AsyncTransport(pool_size=concurrency) as transport:
+            sem = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with sem:
+                    await transport.post(url, json={'action': 'verify'})
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(n)))
+            return n / (time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+
+def run(n: int, concurrency: int) -> Dict[str, Any]:
+    """Run every scenario and return requests/sec per scenario."""
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/functions/v1/verify-credentials"
+
+    results: Dict[str, Any] = {
+        'requests': n,
+        'concurrency': concurrency,
+        'bare_requests_rps': bench_bare_requests(url, n),
+        'transport_rps': bench_transport(url, n),
+        'transport_threads_rps': bench_transport_threads(url, n, concurrency),
+    }
+
+    try:
+        results['async_transport_rps'] = bench_async_transport(url, n, concurrency)
+    except ImportError:
+        results['async_transport_rps'] = None
+
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lib.transport against a local server")
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Threads / async tasks')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    results = run(args.requests, args.concurrency)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 60)
+    print(f"Transport benchmark ({args.requests} requests, concurrency {args.concurrency})")
+    print("=" * 60)
+    for key in ('bare_requests_rps', 'transport_rps', 'transport_threads_rps', 'async_transport_rps'):
+        value = results[key]
+        shown = f"{value:10.0f} req/s" if value is not None else "   skipped (httpx not installed)"
+        print(f"  {key:<24} {shown}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,483 @@
+"""
+Local Cloud Stub
+================
+In-process stand-in for the registration webhook and the Supabase edge
+functions the installer talks to, so installer flows can be timed and
+load-tested without touching the live project or its quota.
+
+Endpoints:
+    POST /register                          n8n registration webhook
+    GET  /activate/<yacht_id>               owner's activation link
+    POST /functions/v1/check-activation     pending / active (+secret once) /
+    POST /check-activation/<yacht_id>       already_retrieved; {"wait": N}
+                                            holds a pending poll up to N s
+    POST /functions/v1/verify-credentials   HMAC check via RequestVerifier
+    GET  /functions/v1/download?token=...   token validation, 302 to the DMG
+                                            (?format=json: ticket; &resume=1)
+    GET  /installers/<path>                 fake DMG bytes (Range supported)
+                                            and <dmg>.parts.json
+
+Activation:
+    activation_delay=0     yachts activate as soon as they register
+    activation_delay=N     yachts activate N seconds after registering
+    activation_delay=None  only the /activate link (or activate()) activates
+
+A long-poll ({"wait": N}) is woken the moment its yacht activates (the
+edge function re-checks once a second instead), and a pending reply
+carries "waited" so clients can tell long-polling is supported.
+
+Responses match the edge functions' shapes and status codes; HMAC rules
+are RequestVerifier's (300 s drift, canonical sorted JSON).
+
+drop_rate=P cuts that fraction of DMG responses off half way, like a
+dropped satellite link, for exercising lib.download resume.
+
+Usage (standalone, e.g. for test_e2e_validation.sh or load_activation --url):
+    python -m benchmarks.cloud_stub [--port 8787] [--activation-delay 2]
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.crypto import SecretGenerator, RequestVerifier
+from lib.secret_store import SecretBackend
+from lib.download import DEFAULT_PART_SIZE, CLAIM_HTTP_STATUS, DownloadClaim
+
+# Same limits as supabase/functions/download
+MAX_DOWNLOADS = 3
+DOWNLOAD_TOKEN_TTL = 7 * 24 * 3600
+RESUME_WINDOW = 24 * 3600
+# Same cap as supabase/functions/check-activation
+MAX_ACTIVATION_WAIT = 60.0
+CLAIM_ERRORS = {
+    'invalid': 'Invalid or expired download link',
+    'expired': 'Download link has expired. Please request a new one.',
+    'limit_reached': 'Maximum downloads reached. Please contact support.',
+}
+
+Reply = Union[Tuple[int, Any], Tuple[int, Any, Dict[str, str]]]
+
+
+class MemorySecretBackend(SecretBackend):
+    """Dict-backed SecretBackend so benchmarks never touch a real Keychain."""
+
+    def __init__(self):
+        self._secrets: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def store(self, service: str, account: str, secret: str) -> bool:
+        with self._lock:
+            self._secrets[(service, account)] = secret
+        return True
+
+    def retrieve(self, service: str, account: str) -> Optional[str]:
+        return self._secrets.get((service, account))
+
+    def delete(self, service: str, account: str) -> bool:
+        with self._lock:
+            return self._secrets.pop((service, account), None) is not None
+
+
+class _Yacht:
+    __slots__ = ('yacht_id', 'shared_secret', 'active', 'activate_at',
+                 'credentials_retrieved')
+
+    def __init__(self, yacht_id: str):
+        self.yacht_id = yacht_id
+        self.shared_secret = SecretGenerator.generate_shared_secret()
+        self.active = False
+        self.activate_at: Optional[float] = None
+        self.credentials_retrieved = False
+
+
+class _DownloadLink:
+    __slots__ = ('yacht_id', 'expires_at', 'download_count', 'last_download_at')
+
+    def __init__(self, yacht_id: str, expires_at: float):
+        self.yacht_id = yacht_id
+        self.expires_at = expires_at
+        self.download_count = 0
+        self.last_download_at: Optional[float] = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: '_StubServer'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        try:
+            body = json.loads(raw or b'{}')
+        except json.JSONDecodeError:
+            return self._reply(400, {'error': 'Invalid request body'})
+        self._dispatch('POST', body)
+
+    def do_GET(self):
+        self._dispatch('GET', None)
+
+    def _dispatch(self, method: str, body: Optional[Dict[str, Any]]):
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        parts = urlsplit(self.path)
+        handler, arg = stub.route(method, parts.path)
+        if handler is None:
+            return self._reply(404, {'error': 'Not found'})
+
+        stub.count(handler.__name__)
+        if method == 'GET':
+            reply = handler(arg, {k: v[0] for k, v in parse_qs(parts.query).items()}, self.headers)
+        else:
+            reply = handler(body, self.headers, arg)
+        self._reply(*reply)
+
+    def _reply(self, status: int, data: Any, headers: Optional[Dict[str, str]] = None):
+        if isinstance(data, bytes):
+            payload, content_type = data, 'application/octet-stream'
+        elif isinstance(data, str):
+            payload, content_type = data.encode('utf-8'), 'text/html'
+        else:
+            payload, content_type = json.dumps(data).encode('utf-8'), 'application/json'
+
+        headers = dict(headers or {})
+        # A Content-Length beyond the payload simulates a dropped connection
+        length = int(headers.pop('Content-Length', len(payload)))
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        if length > len(payload):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    stub: 'CloudStub'
+
+
+class CloudStub:
+    """Threaded local HTTP server emulating the activation and download flows."""
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        activation_delay: Optional[float] = 0.0,
+        latency: float = 0.0,
+        dmg_size: int = 64 * 1024,
+        dmg_part_size: int = DEFAULT_PART_SIZE,
+        drop_rate: float = 0.0,
+    ):
+        """
+        Initialize the stub (call start() or use as a context manager).
+
+        Args:
+            host: Bind address
+            port: Bind port (0 = ephemeral)
+            activation_delay: Seconds from registration to activation
+                (None = wait for the activation link)
+            latency: Artificial delay added to every request, in seconds
+            dmg_size: Size of the fake DMG served after a download redirect
+            dmg_part_size: Part size of the DMG's .parts.json manifest
+            drop_rate: Fraction of DMG responses cut off half way
+        """
+        self.activation_delay = activation_delay
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self._rng = random.Random(0)
+        self.dmg = self._rng.randbytes(dmg_size)
+        self.dmg_sha256 = hashlib.sha256(self.dmg).hexdigest()
+        self.dmg_manifest = {
+            'size': dmg_size,
+            'sha256': self.dmg_sha256,
+            'part_size': dmg_part_size,
+            'parts': [hashlib.sha256(self.dmg[i:i + dmg_part_size]).hexdigest()
+                      for i in range(0, dmg_size, dmg_part_size)],
+        }
+        self.yachts: Dict[str, _Yacht] = {}
+        self.download_links: Dict[str, _DownloadLink] = {}
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._activated = threading.Condition(self._lock)
+
+        self._exact = {
+            ('POST', '/register'): self.register,
+            ('POST', '/functions/v1/check-activation'): self.check_activation,
+            ('POST', '/functions/v1/verify-credentials'): self.verify_credentials,
+            ('GET', '/functions/v1/download'): self.download,
+        }
+        self._prefix = {
+            ('POST', '/check-activation/'): self.check_activation,
+            ('GET', '/activate/'): self.activate_link,
+            ('GET', '/installers/'): self.installer_file,
+        }
+
+        self._server = _StubServer((host, port), _Handler)
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'CloudStub':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'CloudStub':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def route(self, method: str, path: str):
+        """Return (handler, path argument) for a request, or (None, None)."""
+        handler = self._exact.get((method, path))
+        if handler is not None:
+            return handler, None
+        for (m, prefix), handler in self._prefix.items():
+            if m == method and path.startswith(prefix):
+                return handler, path[len(prefix):]
+        return None, None
+
+    def count(self, name: str):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    # Test controls
+
+    def activate(self, yacht_id: str) -> bool:
+        """Activate a registered yacht (what the owner's email link does)."""
+        with self._lock:
+            yacht = self.yachts.get(yacht_id)
+            if yacht is None:
+                return False
+            yacht.active = True
+            self._activated.notify_all()
+            return True
+
+    def issue_download_token(self, yacht_id: str, ttl: float = DOWNLOAD_TOKEN_TTL) -> str:
+        """Create a download link for a yacht and return its plaintext token."""
+        token = SecretGenerator.generate_download_token()
+        token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with self._lock:
+            self.download_links[token_hash] = _DownloadLink(yacht_id, time.time() + ttl)
+        return token
+
+    def _is_active(self, yacht: _Yacht) -> bool:
+        if not yacht.active and yacht.activate_at is not None and time.time() >= yacht.activate_at:
+            yacht.active = True
+        return yacht.active
+
+    # Routes return (status, body[, headers]); body is a dict (JSON), str (HTML) or bytes
+
+    def register(self, body: Dict[str, Any], headers, arg=None) -> Reply:
+        yacht_id = body.get('yacht_id')
+        if not yacht_id or not body.get('yacht_id_hash'):
+            return 400, {'success': False, 'message': 'Missing yacht_id or yacht_id_hash'}
+        if not RequestVerifier.verify_yacht_hash(yacht_id, body['yacht_id_hash']):
+            return 403, {'success': False, 'message': 'Invalid yacht_id_hash'}
+
+        with self._lock:
+            yacht = self.yachts.get(yacht_id)
+            if yacht is None:
+                yacht = self.yachts[yacht_id] = _Yacht(yacht_id)
+            if self.activation_delay is not None and not yacht.active:
+                yacht.activate_at = time.time() + self.activation_delay
+                self._is_active(yacht)
+
+        return 200, {
+            'success': True,
+            'message': 'Registration successful. Check email.',
+            'activation_link': f"{self.url}/activate/{yacht_id}",
+        }
+
+    def activate_link(self, yacht_id: str, query: Dict[str, str], headers=None) -> Reply:
+        if not self.activate(yacht_id):
+            return 404, '<html><body><h1>Yacht Not Found</h1></body></html>'
+        return 200, '<html><body><h1>Yacht Activated</h1></body></html>'
+
+    def check_activation(self, body: Dict[str, Any], headers, yacht_id: Optional[str] = None) -> Reply:
+        yacht_id = yacht_id or body.get('yacht_id')
+        if not yacht_id:
+            return 400, {'error': 'Missing yacht_id'}
+        try:
+            wait = min(max(float(body.get('wait') or 0), 0.0), MAX_ACTIVATION_WAIT)
+        except (TypeError, ValueError):
+            return 400, {'error': 'Invalid wait'}
+
+        start = time.time()
+        with self._activated:
+            yacht = self.yachts.get(yacht_id)
+            if yacht is None:
+                return 404, {'error': 'Yacht not found'}
+            while not self._is_active(yacht):
+                now = time.time()
+                remaining = start + wait - now
+                if remaining <= 0:
+                    return 200, {'status': 'pending', 'message': 'Waiting for owner activation',
+                                 'waited': round(now - start, 3)}
+                if yacht.activate_at is not None:
+                    remaining = min(remaining, max(yacht.activate_at - now, 0.0))
+                self._activated.wait(remaining)
+            if yacht.credentials_retrieved:
+                return 200, {
+                    'status': 'already_retrieved',
+                    'message': 'Credentials were already retrieved. Contact support if this is unexpected.',
+                }
+            # Flip the flag before the secret leaves, as claim_activation_secret() does
+            yacht.credentials_retrieved = True
+            secret = yacht.shared_secret
+
+        return 200, {
+            'status': 'active',
+            'shared_secret': secret,
+            'retrieved_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'message': 'Credentials retrieved. Store securely in Keychain.',
+        }
+
+    def verify_credentials(self, body: Dict[str, Any], headers, arg=None) -> Reply:
+        yacht_id = headers.get('X-Yacht-ID')
+        signature = headers.get('X-Signature')
+        timestamp = headers.get('X-Timestamp')
+        if not (yacht_id and signature and timestamp):
+            return 401, {'error': 'Missing authentication headers', 'code': 'MISSING_AUTH'}
+
+        yacht = self.yachts.get(yacht_id)
+        if yacht is None:
+            return 401, {'error': 'Authentication failed', 'code': 'AUTH_FAILED'}
+        if not self._is_active(yacht):
+            return 401, {'error': 'Yacht not activated', 'code': 'NOT_ACTIVATED'}
+
+        ok, _ = RequestVerifier.verify_signature(
+            yacht_id, yacht.shared_secret, body, signature, timestamp
+        )
+        if not ok:
+            return 401, {'error': 'Authentication failed', 'code': 'AUTH_FAILED'}
+        return 200, {
+            'status': 'verified',
+            'yacht_id': yacht_id,
+            'yacht_active': True,
+            'message': 'Credentials verified successfully',
+        }
+
+    def claim_download(self, token_hash: str, resume: bool = False) -> DownloadClaim:
+        """Same checks and single conditional increment as claim_download() in SQL."""
+        with self._lock:
+            link = self.download_links.get(token_hash)
+            if link is None:
+                return DownloadClaim('invalid')
+            now = time.time()
+            if link.expires_at <= now:
+                status = 'expired'
+            elif resume and link.download_count > 0 and now - link.last_download_at < RESUME_WINDOW:
+                status = 'resumed'
+            elif link.download_count >= MAX_DOWNLOADS:
+                status = 'limit_reached'
+            else:
+                status = 'ok'
+                link.download_count += 1
+                link.last_download_at = now
+            return DownloadClaim(status, yacht_id=link.yacht_id, dmg_sha256=self.dmg_sha256,
+                                 download_count=link.download_count, max_downloads=MAX_DOWNLOADS)
+
+    def download(self, arg, query: Dict[str, str], headers=None) -> Reply:
+        token = query.get('token')
+        if not token:
+            return 400, {'error': 'Missing download token'}
+
+        claim = self.claim_download(hashlib.sha256(token.encode('utf-8')).hexdigest(),
+                                    resume=query.get('resume') == '1')
+        if not claim.granted:
+            return CLAIM_HTTP_STATUS[claim.status], {'error': CLAIM_ERRORS[claim.status]}
+        yacht_id = claim.yacht_id
+
+        location = f"{self.url}/installers/dmg/{yacht_id}/CelesteOS-{yacht_id}.dmg"
+        if query.get('format') == 'json':
+            return 200, {
+                'url': location,
+                'expires_in': 3600,
+                'sha256': self.dmg_sha256,
+                'parts_url': f"{location}.parts.json",
+                'download_number': claim.download_count,
+                'resumed': claim.status == 'resumed',
+            }
+        return 302, {}, {'Location': location}
+
+    def installer_file(self, path: str, query: Dict[str, str], headers=None) -> Reply:
+        if path.endswith('.parts.json'):
+            return 200, self.dmg_manifest
+
+        size = len(self.dmg)
+        match = re.match(r'bytes=(\d+)-(\d*)$', (headers or {}).get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start > end:
+                return 416, {'error': 'Range not satisfiable'}, {'Content-Range': f'bytes */{size}'}
+            status, body = 206, self.dmg[start:end + 1]
+            reply_headers = {'Content-Range': f'bytes {start}-{end}/{size}'}
+        else:
+            status, body, reply_headers = 200, self.dmg, {}
+        reply_headers['Accept-Ranges'] = 'bytes'
+
+        with self._lock:
+            drop = len(body) > 1 and self._rng.random() < self.drop_rate
+        if drop:
+            reply_headers['Content-Length'] = str(len(body))
+            body = body[:len(body) // 2]
+        return status, body, reply_headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local CelesteOS cloud stub")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--activation-delay', type=float, default=0.0,
+                        help='Seconds from registration to activation (-1 = activation link only)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Artificial per-request delay in seconds')
+    args = parser.parse_args()
+
+    delay = None if args.activation_delay < 0 else args.activation_delay
+    stub = CloudStub(args.host, args.port, activation_delay=delay, latency=args.latency)
+    print(f"Cloud stub listening on {stub.url} (Ctrl-C to stop)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Fleet Document Deduplication Report
+===================================
+Storage and embedding cost of per-yacht document copies versus the
+fleet-wide content-addressed store (lib.blob_store).
+
+By default builds a deterministic sample fleet: each yacht fits one make
+per equipment category (main engines, gensets, stabilizers, ...) from an
+OEM catalog, each make shipping several manuals, plus a set of documents
+unique to the yacht (drawings, class certificates, logs). Yachts of the
+same build series share their whole equipment list.
+
+With --live the same report is produced from the real database via the
+document_dedup_savings() RPC (needs SUPABASE_URL and
+SUPABASE_SERVICE_ROLE_KEY).
+
+Usage:
+    python -m benchmarks.dedup_report [--yachts 50] [--series 8] [--seed 7] [--json]
+    python -m benchmarks.dedup_report --live
+"""
+
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.blob_store import BlobStore, estimate_savings
+
+
+# Category -> makes; each make ships these manuals (name, MB, pages)
+OEM_CATALOG: Dict[str, List[str]] = {
+    'main_engines': ['MTU 16V2000 M96L', 'MTU 12V4000 M73', 'CAT C32 ACERT', 'MAN V12-1900'],
+    'gensets': ['Kohler 99EFOZ', 'Northern Lights M944W3', 'Cummins Onan QD27'],
+    'stabilizers': ['Naiad 302', 'Quantum XT', 'Seakeeper 26'],
+    'watermakers': ['Sea Recovery Aqua Whisper', 'Dessalator D900'],
+    'hvac': ['Heinen & Hopman CW', 'Dometic Marine Air', 'Condaria MCW'],
+    'navigation': ['Furuno NavNet TZT', 'Raymarine Axiom', 'Simrad NSO evo3'],
+    'thrusters': ['Vetus BOW', 'Side-Power SE'],
+    'tenders': ['Williams Sportjet 520', 'Castoro 6.5'],
+}
+MANUALS: List[Tuple[str, float, int]] = [
+    ('operators_manual', 18.0, 240),
+    ('service_manual', 42.0, 610),
+    ('parts_catalog', 65.0, 880),
+    ('wiring_diagrams', 12.0, 90),
+]
+# Yacht-specific documents: (count, MB, pages) per yacht
+OWN_DOCUMENTS = (160, 1.8, 14)
+
+CHUNKS_PER_PAGE = 1.6
+CHARS_PER_CHUNK = 1400
+
+
+def _sha(name: str) -> str:
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+def sample_fleet(yachts: int, series: int, seed: int) -> Dict[str, List[Tuple[str, int, int]]]:
+    """
+    Yacht -> documents as (sha256, size_bytes, chunks).
+
+    Yachts are spread over `series` build series; a series shares its
+    equipment makes.
+    """
+    rng = random.Random(seed)
+    series_kit = [
+        {category: rng.choice(makes) for category, makes in OEM_CATALOG.items()}
+        for _ in range(series)
+    ]
+
+    fleet = {}
+    for y in range(yachts):
+        kit = dict(series_kit[y % series])
+        # Refits: some yachts swapped a make away from their series
+        for category in rng.sample(list(OEM_CATALOG), k=rng.randint(0, 2)):
+            kit[category] = rng.choice(OEM_CATALOG[category])
+
+        docs = []
+        for make in kit.values():
+            for manual, mb, pages in MANUALS:
+                docs.append((_sha(f"{make}/{manual}"), int(mb * 1e6), int(pages * CHUNKS_PER_PAGE)))
+        count, mb, pages = OWN_DOCUMENTS
+        for i in range(count):
+            scale = rng.uniform(0.3, 2.5)
+            docs.append((_sha(f"Y{y:03d}/doc{i}"), int(mb * 1e6 * scale),
+                         max(1, int(pages * scale * CHUNKS_PER_PAGE))))
+        fleet[f"Y{y:03d}"] = docs
+    return fleet
+
+
+def fleet_totals(fleet: Dict[str, List[Tuple[str, int, int]]]) -> Dict[str, int]:
+    """Totals in the shape document_dedup_savings() returns."""
+    blobs: Dict[str, Tuple[int, int]] = {}
+    refs = logical_bytes = logical_chunks = 0
+    for docs in fleet.values():
+        for sha, size, chunks in docs:
+            blobs[sha] = (size, chunks)
+            refs += 1
+            logical_bytes += size
+            logical_chunks += chunks
+    stored_chunks = sum(c for _, c in blobs.values())
+    return {
+        'yachts': len(fleet),
+        'unique_blobs': len(blobs),
+        'refs': refs,
+        'stored_bytes': sum(s for s, _ in blobs.values()),
+        'logical_bytes': logical_bytes,
+        'stored_chunks': stored_chunks,
+        'logical_chunks': logical_chunks,
+        'stored_chunk_chars': stored_chunks * CHARS_PER_CHUNK,
+        'logical_chunk_chars': logical_chunks * CHARS_PER_CHUNK,
+    }
+
+
+def print_report(title: str, report: Dict[str, Any]):
+    print("=" * 64)
+    print(title)
+    print("=" * 64)
+    print(f"  yachts:          {report['yachts']}")
+    print(f"  documents:       {report['refs']} per-yacht copies, {report['unique_blobs']} unique")
+    print(f"  dedup ratio:     {report['dedup_ratio']}x")
+    print(f"\n  {'':<22}{'per-yacht':>14}{'content-addr.':>16}{'saved':>14}")
+    print(f"  {'storage (GB)':<22}{report['logical_bytes'] / 1e9:>14.1f}"
+          f"{report['stored_bytes'] / 1e9:>16.1f}{report['bytes_saved'] / 1e9:>14.1f}")
+    print(f"  {'chunks embedded':<22}{report['logical_chunks']:>14,}"
+          f"{report['stored_chunks']:>16,}{report['chunks_saved']:>14,}")
+    for label, key in (('storage $/month', 'storage_usd_month'), ('embedding $ (once)', 'embedding_usd')):
+        c = report[key]
+        print(f"  {label:<22}{c['logical']:>14.2f}{c['stored']:>16.2f}{c['saved']:>14.2f}")
+    print(f"\n  embedding tokens saved: {report['embedding_tokens_saved']:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report storage/embedding saved by fleet-wide dedup")
+    parser.add_argument('--yachts', type=int, default=50)
+    parser.add_argument('--series', type=int, default=8, help='Build series sharing equipment')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--live', action='store_true', help='Report on the real database')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    if args.live:
+        url = os.environ.get('SUPABASE_URL')
+        key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+        if not url or not key:
+            print("✗ SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set", file=sys.stderr)
+            sys.exit(2)
+        store = BlobStore(url, key)
+        try:
+            report = store.savings()
+        finally:
+            store.close()
+        title = "Fleet document deduplication (live)"
+    else:
+        report = estimate_savings(fleet_totals(sample_fleet(args.yachts, args.series, args.seed)))
+        title = f"Fleet document deduplication (sample: {args.yachts} yachts, {args.series} series)"
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(title, report)
+
+
+if __name__ == '__main__':
+    main()
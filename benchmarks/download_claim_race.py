@@ -0,0 +1,160 @@
+"""
+Download Claim Race Test
+========================
+Fires parallel downloads at the same links and checks that no link is
+granted more than its max_downloads.
+
+By default runs against the in-process cloud stub's download endpoint
+(?format=json), whose claim mirrors claim_download() in SQL. --naive
+runs the old select-then-update sequence against the same links for
+comparison; it overshoots the limit under the same load.
+
+With --live the claims go straight to claim_download() in the real
+database through lib.download.DownloadLinks, on fresh links issued for
+--yacht-id (needs SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY).
+
+Usage:
+    python -m benchmarks.download_claim_race [--links 50] [--parallel 32] [--naive] [--json]
+    python -m benchmarks.download_claim_race --live --yacht-id YACHT_001 [--links 5]
+
+Exit status is 1 if any link was granted more than its limit.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.download import DownloadLinks, CLAIM_HTTP_STATUS
+from lib.transport import Transport
+from benchmarks.cloud_stub import CloudStub, MAX_DOWNLOADS
+
+
+def race(tokens: List[str], parallel: int, claim: Callable[[str], str]) -> Dict[str, Any]:
+    """
+    Release `parallel` simultaneous claims per token.
+
+    Args:
+        tokens: Download tokens, each good for MAX_DOWNLOADS downloads
+        parallel: Concurrent claims per token
+        claim: token -> status ('ok', 'limit_reached', ...)
+    """
+    outcomes: Counter = Counter()
+    granted: Counter = Counter()
+    lock = threading.Lock()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        for token in tokens:
+            barrier = threading.Barrier(parallel)
+
+            def attempt(token=token, barrier=barrier):
+                barrier.wait()
+                status = claim(token)
+                with lock:
+                    outcomes[status] += 1
+                    if status == 'ok':
+                        granted[token] += 1
+
+            for future in [pool.submit(attempt) for _ in range(parallel)]:
+                future.result()
+    wall = time.perf_counter() - start
+
+    per_link = [granted[t] for t in tokens]
+    return {
+        'links': len(tokens),
+        'parallel': parallel,
+        'limit': MAX_DOWNLOADS,
+        'outcomes': dict(outcomes),
+        'max_granted': max(per_link, default=0),
+        'over_limit_links': sum(1 for n in per_link if n > MAX_DOWNLOADS),
+        'wall_seconds': round(wall, 3),
+    }
+
+
+def naive_claim(stub: CloudStub, token: str) -> str:
+    """The download function's old sequence: read the link, check, then write count + 1."""
+    link = stub.download_links.get(hashlib.sha256(token.encode('utf-8')).hexdigest())
+    if link is None:
+        return 'invalid'
+    count = link.download_count
+    time.sleep(0.001)  # the round-trip between the select and the update
+    if count >= MAX_DOWNLOADS:
+        return 'limit_reached'
+    link.download_count = count + 1
+    return 'ok'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the download limit holds under parallel claims")
+    parser.add_argument('--links', type=int, default=50, help='Download links to race on')
+    parser.add_argument('--parallel', type=int, default=32, help='Simultaneous claims per link')
+    parser.add_argument('--naive', action='store_true', help='Also run the old select-then-update sequence')
+    parser.add_argument('--live', action='store_true', help='Race claim_download() in the real database')
+    parser.add_argument('--yacht-id', help='--live: yacht to issue test links for')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    reports = {}
+    if args.live:
+        url = os.environ.get('SUPABASE_URL')
+        key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+        if not url or not key or not args.yacht_id:
+            print("✗ SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY and --yacht-id must be set", file=sys.stderr)
+            sys.exit(2)
+        links = DownloadLinks(url, key, pool_size=args.parallel)
+        try:
+            tokens = [links.create(args.yacht_id, expires_days=1, max_downloads=MAX_DOWNLOADS)['token']
+                      for _ in range(args.links)]
+            reports['claim_download (live)'] = race(tokens, args.parallel, lambda t: links.claim(t).status)
+        finally:
+            links.close()
+    else:
+        with CloudStub() as stub:
+            # No retries: the limit answer is a 429, which Transport would otherwise retry
+            transport = Transport(timeout=(5, 30), pool_size=args.parallel, retries=0)
+
+            def http_claim(token: str) -> str:
+                resp = transport.get(f"{stub.url}/functions/v1/download",
+                                     params={'token': token, 'format': 'json'})
+                if resp.status_code == 200:
+                    return 'ok'
+                return next((s for s, code in CLAIM_HTTP_STATUS.items() if code == resp.status_code),
+                            str(resp.status_code))
+
+            tokens = [stub.issue_download_token(f"RACE_{i:04d}") for i in range(args.links)]
+            reports['atomic claim'] = race(tokens, args.parallel, http_claim)
+            transport.close()
+
+            if args.naive:
+                tokens = [stub.issue_download_token(f"NAIVE_{i:04d}") for i in range(args.links)]
+                reports['select then update'] = race(tokens, args.parallel, lambda t: naive_claim(stub, t))
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print("=" * 64)
+        print(f"Download claim race: {args.links} links x {args.parallel} parallel, limit {MAX_DOWNLOADS}")
+        print("=" * 64)
+        for name, r in reports.items():
+            verdict = 'OK' if not r['over_limit_links'] else 'LIMIT EXCEEDED'
+            print(f"  {name:<24} max granted {r['max_granted']}, "
+                  f"{r['over_limit_links']} links over limit  [{verdict}]")
+            print(f"  {'':<24} outcomes {r['outcomes']}, {r['wall_seconds']:.2f} s")
+
+    # --naive is expected to overshoot; only the real claim decides the exit status
+    exceeded = any(r['over_limit_links'] for name, r in reports.items() if name != 'select then update')
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == '__main__':
+    main()
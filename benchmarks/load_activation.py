@@ -0,0 +1,187 @@
+"""
+Activation Load Generator
+=========================
+Drives thousands of simulated InstallationOrchestrator instances through
+initialize -> register -> wait_for_activation -> verify against the local
+cloud stub and reports throughput and latency percentiles.
+
+Every simulated install is a real orchestrator with its own Transport;
+secrets go to an in-memory SecretBackend. Phase latencies come from the
+orchestrator's own phase_end events, so they measure exactly what the
+installer measures.
+
+By default the stub runs in this process. For numbers not skewed by the
+server sharing the GIL, start it separately and pass --url:
+    python -m benchmarks.cloud_stub --port 8787 --activation-delay 1
+    python -m benchmarks.load_activation --url http://127.0.0.1:8787
+
+Usage:
+    python -m benchmarks.load_activation [--yachts 2000] [--concurrency 64]
+        [--activation-delay 0] [--poll-interval 0.05] [--long-poll 55] [--json]
+
+--long-poll 0 makes the orchestrators poll plainly every --poll-interval;
+compare server_requests and the activation phase latency between the two
+with a non-zero --activation-delay.
+
+Exit status is 1 if any simulated install failed.
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.crypto import compute_yacht_hash
+from lib.events import InstallEvent, InstallEventStream
+from lib.installer import InstallConfig, InstallationOrchestrator, InstallState, KeychainStore
+from lib.verify import latency_stats
+from benchmarks.cloud_stub import CloudStub, MemorySecretBackend
+
+
+class LoadRun:
+    """One load-test run: shared collectors plus the per-install worker."""
+
+    def __init__(self, url: str, poll_interval: float, run_id: str,
+                 long_poll: float = InstallationOrchestrator.ACTIVATION_LONG_POLL):
+        self.url = url
+        self.poll_interval = poll_interval
+        self.long_poll = long_poll
+        self.run_id = run_id
+        self.phases: Dict[str, List[float]] = {}
+        self.totals: List[float] = []
+        self.outcomes: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _collect(self, event: InstallEvent):
+        if event.event == 'phase_end' and event.duration is not None:
+            with self._lock:
+                self.phases.setdefault(event.phase, []).append(event.duration)
+
+    def install(self, index: int) -> bool:
+        yacht_id = f"LOAD_{self.run_id}_{index:06d}"
+        config = InstallConfig(
+            yacht_id=yacht_id,
+            yacht_id_hash=compute_yacht_hash(yacht_id),
+            api_endpoint=self.url,
+            n8n_endpoint=self.url,
+        )
+        events = InstallEventStream()
+        events.subscribe(self._collect)
+        orchestrator = InstallationOrchestrator(config, events=events)
+        orchestrator.ACTIVATION_POLL_INTERVAL = self.poll_interval
+        orchestrator.ACTIVATION_LONG_POLL = self.long_poll
+
+        start = time.perf_counter()
+        outcome = 'ok'
+        try:
+            if orchestrator.initialize() != InstallState.UNREGISTERED:
+                outcome = 'unexpected_state'
+            elif not orchestrator.register()[0]:
+                outcome = 'register_failed'
+            elif not orchestrator.wait_for_activation():
+                outcome = 'activation_failed'
+            elif not orchestrator._verify_credentials():
+                outcome = 'verify_failed'
+        except Exception as e:
+            outcome = f'error:{type(e).__name__}'
+        finally:
+            orchestrator._transport.close()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.outcomes[outcome] += 1
+            if outcome == 'ok':
+                self.totals.append(elapsed)
+        return outcome == 'ok'
+
+
+def run(
+    yachts: int,
+    concurrency: int,
+    poll_interval: float,
+    activation_delay: float,
+    url: Optional[str] = None,
+    long_poll: float = InstallationOrchestrator.ACTIVATION_LONG_POLL,
+) -> Dict[str, Any]:
+    """Run the load test and return a report dict."""
+    stub = None
+    if url is None:
+        stub = CloudStub(activation_delay=activation_delay).start()
+        url = stub.url
+
+    KeychainStore.set_backend(MemorySecretBackend())
+    load = LoadRun(url, poll_interval, run_id=str(int(time.time() * 1000))[-8:], long_poll=long_poll)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(load.install, range(yachts)))
+    finally:
+        wall = time.perf_counter() - start
+        KeychainStore.set_backend(None)
+        if stub is not None:
+            stub.stop()
+
+    return {
+        'yachts': yachts,
+        'concurrency': concurrency,
+        'activation_delay': activation_delay,
+        'poll_interval': poll_interval,
+        'long_poll': long_poll,
+        'wall_seconds': round(wall, 3),
+        'installs_per_sec': round(load.outcomes['ok'] / wall, 1),
+        'outcomes': dict(load.outcomes),
+        'install_latency': latency_stats(load.totals),
+        'phase_latency': {name: latency_stats(samples) for name, samples in sorted(load.phases.items())},
+        'server_requests': dict(stub.requests) if stub is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the activation flow against the cloud stub")
+    parser.add_argument('--yachts', type=int, default=2000, help='Simulated installs')
+    parser.add_argument('--concurrency', type=int, default=64, help='Installs in flight')
+    parser.add_argument('--poll-interval', type=float, default=0.05,
+                        help='Orchestrator activation poll interval (seconds)')
+    parser.add_argument('--long-poll', type=float, default=InstallationOrchestrator.ACTIVATION_LONG_POLL,
+                        help='Seconds the server may hold an activation poll (0 = plain polling)')
+    parser.add_argument('--activation-delay', type=float, default=0.0,
+                        help='In-process stub: seconds from registration to activation')
+    parser.add_argument('--url', help='Use an already running stub instead of an in-process one')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    report = run(args.yachts, args.concurrency, args.poll_interval, args.activation_delay, args.url,
+                 args.long_poll)
+    failed = sum(n for outcome, n in report['outcomes'].items() if outcome != 'ok')
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("=" * 64)
+        print(f"Activation load test: {args.yachts} installs, concurrency {args.concurrency}")
+        print("=" * 64)
+        print(f"  wall time:      {report['wall_seconds']:.2f} s")
+        print(f"  throughput:     {report['installs_per_sec']:.1f} installs/s")
+        print(f"  outcomes:       {report['outcomes']}")
+        rows = [('install', report['install_latency'])] + list(report['phase_latency'].items())
+        print(f"\n  {'latency (ms)':<14}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+        for name, p in rows:
+            if p:
+                print(f"  {name:<14}{p['p50_ms']:>10.2f}{p['p90_ms']:>10.2f}"
+                      f"{p['p99_ms']:>10.2f}{p['max_ms']:>10.2f}")
+        if report['server_requests']:
+            print(f"\n  server requests: {report['server_requests']}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Progress Channel Stress Test
+============================
+Pushes 100k progress updates through ProgressChannel from a worker thread
+while a consumer drains it at InstallerWindow.FRAME_INTERVAL_MS, the way
+the Tk main loop does.
+
+Checks:
+- the final published state is always delivered
+- the consumer runs once per frame, not once per update
+- detail lines retained between frames never exceed the ring size
+
+With --tk (needs a display) the real InstallerWindow is driven instead and
+the details box is checked against MAX_DETAIL_LINES.
+
+Usage:
+    python -m benchmarks.stress_progress [--updates 100000] [--tk]
+
+Exit status is 1 if any check fails.
+"""
+
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.installer_ui import (
+    InstallerWindow,
+    InstallProgress,
+    InstallUIState,
+    ProgressChannel,
+)
+
+
+def _produce(channel: ProgressChannel, updates: int, done: threading.Event):
+    for i in range(updates - 1):
+        channel.publish(InstallProgress(
+            state=InstallUIState.WAITING_ACTIVATION,
+            message="Waiting for activation...",
+            details=f"poll {i}",
+            elapsed_seconds=i,
+        ))
+    channel.publish(InstallProgress(
+        state=InstallUIState.COMPLETE,
+        message="Installation complete!",
+        progress=1.0,
+        details="done",
+    ))
+    done.set()
+
+
+def run_headless(updates: int, max_details: int) -> bool:
+    channel = ProgressChannel(max_details=max_details)
+    done = threading.Event()
+    frame = InstallerWindow.FRAME_INTERVAL_MS / 1000
+
+    start = time.perf_counter()
+    threading.Thread(target=_produce, args=(channel, updates, done), daemon=True).start()
+
+    frames = 0
+    max_lines = 0
+    final = None
+    while True:
+        finished = done.is_set()
+        progress, details = channel.drain()
+        frames += 1
+        max_lines = max(max_lines, len(details))
+        if progress is not None:
+            final = progress
+        if finished:
+            break
+        time.sleep(frame)
+    elapsed = time.perf_counter() - start
+
+    checks = {
+        'final state delivered': final is not None and final.state == InstallUIState.COMPLETE,
+        'all updates published': channel.published == updates,
+        f'details per frame <= {max_details}': max_lines <= max_details,
+        'frames << updates': frames < updates / 10,
+    }
+
+    print("=" * 60)
+    print(f"ProgressChannel stress: {updates} updates")
+    print("=" * 60)
+    print(f"  elapsed:          {elapsed:.3f} s ({updates / elapsed:,.0f} updates/s)")
+    print(f"  frames drained:   {frames}")
+    print(f"  max lines/frame:  {max_lines}")
+    print(f"  dropped details:  {channel.dropped_details}")
+    for name, ok in checks.items():
+        print(f"  {'✓' if ok else '✗'} {name}")
+    return all(checks.values())
+
+
+def run_tk(updates: int) -> bool:
+    window = InstallerWindow("STRESS_001", "M/Y Stress", "stress@example.com")
+    channel = ProgressChannel()
+    window.attach(channel)
+    done = threading.Event()
+    threading.Thread(target=_produce, args=(channel, updates, done), daemon=True).start()
+
+    def check_finished():
+        if done.is_set() and window._current_state == InstallUIState.COMPLETE:
+            window.root.quit()
+        else:
+            window.root.after(InstallerWindow.FRAME_INTERVAL_MS, check_finished)
+
+    start = time.perf_counter()
+    window.root.after(InstallerWindow.FRAME_INTERVAL_MS, check_finished)
+    window.run()
+    elapsed = time.perf_counter() - start
+
+    lines = int(window.details_text.index('end-1c').split('.')[0]) - 1
+    window.destroy()
+
+    ok = lines <= InstallerWindow.MAX_DETAIL_LINES
+    print(f"Tk: {updates} updates in {elapsed:.3f} s, details box {lines} lines "
+          f"({'✓' if ok else '✗'} <= {InstallerWindow.MAX_DETAIL_LINES})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the installer progress channel")
+    parser.add_argument('--updates', type=int, default=100_000)
+    parser.add_argument('--max-details', type=int, default=200)
+    parser.add_argument('--tk', action='store_true', help='Drive a real InstallerWindow')
+    args = parser.parse_args()
+
+    ok = run_tk(args.updates) if args.tk else run_headless(args.updates, args.max_details)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
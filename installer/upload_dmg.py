@@ -2,33 +2,54 @@
 """
 Upload built DMG to Supabase Storage.
 
-Usage:
-    python upload_dmg.py --dmg-path /path/to/CelesteOS-YACHT_001.dmg --yacht-id YACHT_001
+Usage (from the repository root):
+    python -m installer.upload_dmg --dmg-path /path/to/CelesteOS-YACHT_001.dmg --yacht-id YACHT_001
 """
 
 import os
 import sys
+import json
 import argparse
 import hashlib
 from pathlib import Path
+from datetime import datetime, timezone
+from typing import Optional
+
+from lib.transport import Transport
+from lib.download import build_part_manifest
 
 # Supabase configuration
 SUPABASE_URL = "https://qvzmkaamzaqxpzbewjxe.supabase.co"
 SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
 
-def upload_dmg(dmg_path: Path, yacht_id: str) -> str:
+def _upload_transport() -> Transport:
+    # Uploads stream multi-GB bodies; allow a long read timeout
+    return Transport(timeout=(10, 600))
+
+
+def upload_dmg(dmg_path: Path, yacht_id: str, transport: Optional[Transport] = None) -> str:
     """Upload DMG to Supabase Storage."""
-    import requests
-    
+    if transport is not None:
+        return _upload_dmg(dmg_path, yacht_id, transport)
+    transport = _upload_transport()
+    try:
+        return _upload_dmg(dmg_path, yacht_id, transport)
+    finally:
+        transport.close()
+
+
+def _upload_dmg(dmg_path: Path, yacht_id: str, transport: Transport) -> str:
     if not SERVICE_KEY:
         raise ValueError("SUPABASE_SERVICE_ROLE_KEY environment variable required")
     
     if not dmg_path.exists():
         raise FileNotFoundError(f"DMG not found: {dmg_path}")
     
-    # Calculate hash
-    sha256 = hashlib.sha256(dmg_path.read_bytes()).hexdigest()
+    # Whole-file and per-part hashes in one streaming pass (lib/download.py
+    # verifies each part it fetches against the manifest)
+    manifest = build_part_manifest(dmg_path)
+    sha256 = manifest['sha256']
     print(f"Uploading: {dmg_path.name}")
     print(f"SHA256:    {sha256[:16]}...")
     print(f"Size:      {dmg_path.stat().st_size / 1024 / 1024:.1f} MB")
@@ -46,20 +67,52 @@ def upload_dmg(dmg_path: Path, yacht_id: str) -> str:
     }
     
     with open(dmg_path, "rb") as f:
-        resp = requests.post(url, headers=headers, data=f)
+        resp = transport.post(url, headers=headers, data=f)
     
-    if resp.status_code in (200, 201):
-        print(f"Uploaded to: {storage_path}")
-        return storage_path
-    else:
+    if resp.status_code not in (200, 201):
         raise Exception(f"Upload failed: {resp.status_code} - {resp.text}")
+    print(f"Uploaded to: {storage_path}")
+
+    resp = transport.post(
+        f"{url}.parts.json",
+        headers={**headers, "Content-Type": "application/json"},
+        data=json.dumps(manifest),
+        timeout=(10, 30),
+    )
+    if resp.status_code not in (200, 201):
+        raise Exception(f"Manifest upload failed: {resp.status_code} - {resp.text}")
+    print(f"Manifest:    {storage_path}.parts.json ({len(manifest['parts'])} parts)")
 
+    record_dmg(transport, yacht_id, storage_path, sha256)
+    return storage_path
 
-def create_download_link(yacht_id: str, token: str, expires_hours: int = 168) -> str:
+
+def record_dmg(transport: Transport, yacht_id: str, storage_path: str, sha256: str):
+    """Publish the DMG's digest on fleet_registry (returned by the download function)."""
+    resp = transport.request(
+        "PATCH",
+        f"{SUPABASE_URL}/rest/v1/fleet_registry",
+        params={"yacht_id": f"eq.{yacht_id}"},
+        headers={
+            "Authorization": f"Bearer {SERVICE_KEY}",
+            "apikey": SERVICE_KEY,
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal",
+        },
+        json={
+            "dmg_storage_path": storage_path,
+            "dmg_sha256": sha256,
+            "dmg_built_at": datetime.now(timezone.utc).isoformat(),
+        },
+        timeout=(10, 30),
+    )
+    if resp.status_code >= 300:
+        raise Exception(f"Failed to record DMG digest: {resp.status_code} - {resp.text}")
+
+
+def create_download_link(yacht_id: str, token: str, expires_hours: int = 168,
+                         transport: Optional[Transport] = None) -> str:
     """Create download link in database."""
-    import requests
-    import hashlib
-    
     token_hash = hashlib.sha256(token.encode()).hexdigest()
     
     url = f"{SUPABASE_URL}/rest/v1/download_links"
@@ -79,7 +132,14 @@ def create_download_link(yacht_id: str, token: str, expires_hours: int = 168) ->
         "expires_at": expires_at,
     }
     
-    resp = requests.post(url, headers=headers, json=data)
+    owned = transport is None
+    if owned:
+        transport = _upload_transport()
+    try:
+        resp = transport.post(url, headers=headers, json=data, timeout=(10, 30))
+    finally:
+        if owned:
+            transport.close()
     
     if resp.status_code in (200, 201):
         download_url = f"{SUPABASE_URL}/functions/v1/download?token={token}"
@@ -89,7 +149,7 @@ def create_download_link(yacht_id: str, token: str, expires_hours: int = 168) ->
         raise Exception(f"Failed to create download link: {resp.text}")
 
 
-if __name__ == "__main__":
+def main():
     parser = argparse.ArgumentParser(description="Upload DMG to Supabase Storage")
     parser.add_argument("--dmg-path", required=True, help="Path to DMG file")
     parser.add_argument("--yacht-id", required=True, help="Yacht ID")
@@ -98,17 +158,24 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     dmg_path = Path(args.dmg_path)
+    transport = _upload_transport()
     
     try:
-        storage_path = upload_dmg(dmg_path, args.yacht_id)
+        storage_path = upload_dmg(dmg_path, args.yacht_id, transport)
         
         if args.create_link:
             import secrets
             token = secrets.token_hex(32)
-            create_download_link(args.yacht_id, token)
+            create_download_link(args.yacht_id, token, transport=transport)
         
         print("\nUpload complete")
         
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        transport.close()
+
+
+if __name__ == "__main__":
+    main()
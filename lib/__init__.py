@@ -2,35 +2,117 @@
 CelesteOS Cloud Library
 =======================
 Shared modules for installation, authentication, and verification.
+
+Public names are resolved lazily (PEP 562 module __getattr__): importing
+`lib` loads nothing else, and `from lib import CryptoIdentity` imports only
+lib.crypto. This keeps the PyInstaller installer and `python -m lib.verify`
+from paying for requests, numpy or tkinter before they are needed.
 """
 
-from .crypto import (
-    CryptoIdentity,
-    SecretGenerator,
-    RequestVerifier,
-    compute_yacht_hash,
-    generate_installation_manifest,
-)
-
-from .installer import (
-    InstallState,
-    InstallConfig,
-    KeychainStore,
-    InstallationOrchestrator,
-    SecurityError,
-)
-
-__all__ = [
+import importlib
+from typing import TYPE_CHECKING
+
+# Public name -> submodule that defines it
+_EXPORTS = {
     # Crypto
-    'CryptoIdentity',
-    'SecretGenerator',
-    'RequestVerifier',
-    'compute_yacht_hash',
-    'generate_installation_manifest',
+    'CryptoIdentity': 'crypto',
+    'SecretGenerator': 'crypto',
+    'RequestVerifier': 'crypto',
+    'compute_yacht_hash': 'crypto',
+    'generate_installation_manifest': 'crypto',
+    'TokenMint': 'crypto',
+    'mint_tokens': 'crypto',
+    'hash_tokens': 'crypto',
+    'IdentityRegistry': 'crypto',
+    'canonical_json': 'canonical',
+    'set_canonical_encoder': 'canonical',
     # Installer
-    'InstallState',
-    'InstallConfig',
-    'KeychainStore',
-    'InstallationOrchestrator',
-    'SecurityError',
-]
+    'InstallState': 'installer',
+    'InstallConfig': 'installer',
+    'KeychainStore': 'installer',
+    'InstallationOrchestrator': 'installer',
+    'SecurityError': 'installer',
+    'run_headless': 'installer',
+    # Events
+    'InstallEvent': 'events',
+    'InstallEventStream': 'events',
+    'JsonLinesWriter': 'events',
+    'BatchedEventWriter': 'event_writer',
+    # Secret storage
+    'SecretBackend': 'secret_store',
+    'NativeKeychainBackend': 'secret_store',
+    'SecurityCLIBackend': 'secret_store',
+    'EncryptedFileBackend': 'secret_store',
+    'CachedSecretStore': 'secret_store',
+    # Documents
+    'DocumentClient': 'documents',
+    'QueryCache': 'query_cache',
+    'documents_version': 'query_cache',
+    'LocalVectorIndex': 'local_index',
+    'NasIngestionClient': 'ingestion',
+    'BlobStore': 'blob_store',
+    'IndexingQueue': 'indexing',
+    'IndexingWorkerPool': 'indexing',
+    'DocumentIndexer': 'indexing',
+    # Fleet
+    'FleetStatusClient': 'fleet_status',
+    # Downloads
+    'DownloadClient': 'download',
+    'DownloadCacheProxy': 'download',
+    'DownloadLinks': 'download',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value  # cache: later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+if TYPE_CHECKING:
+    from .crypto import (
+        CryptoIdentity,
+        SecretGenerator,
+        RequestVerifier,
+        compute_yacht_hash,
+        generate_installation_manifest,
+        TokenMint,
+        mint_tokens,
+        hash_tokens,
+        IdentityRegistry,
+    )
+    from .canonical import canonical_json, set_canonical_encoder
+    from .installer import (
+        InstallState,
+        InstallConfig,
+        KeychainStore,
+        InstallationOrchestrator,
+        SecurityError,
+        run_headless,
+    )
+    from .events import InstallEvent, InstallEventStream, JsonLinesWriter
+    from .event_writer import BatchedEventWriter
+    from .secret_store import (
+        SecretBackend,
+        NativeKeychainBackend,
+        SecurityCLIBackend,
+        EncryptedFileBackend,
+        CachedSecretStore,
+    )
+    from .documents import DocumentClient
+    from .query_cache import QueryCache, documents_version
+    from .local_index import LocalVectorIndex
+    from .ingestion import NasIngestionClient
+    from .blob_store import BlobStore
+    from .indexing import IndexingQueue, IndexingWorkerPool, DocumentIndexer
+    from .fleet_status import FleetStatusClient
+    from .download import DownloadClient, DownloadCacheProxy, DownloadLinks
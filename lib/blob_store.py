@@ -0,0 +1,248 @@
+"""
+CelesteOS Fleet Blob Store
+==========================
+Content-addressed document storage shared across the fleet
+(supabase/migrations/20251201_content_addressed_documents.sql).
+
+A document is identified by the sha256 of its bytes. The first yacht to
+add it uploads the object and the indexer extracts and embeds it once;
+every other yacht carrying the same file only records a reference row.
+
+Usage:
+    store = BlobStore(SUPABASE_URL, SERVICE_ROLE_KEY)
+    claims = store.claim([{'sha256': h, 'size_bytes': n, 'content_type': t}])
+    for h, claim in claims.items():
+        if claim['needs_upload']:
+            store.upload(local_path, claim['storage_path'], content_type)
+    store.mark_uploaded([...])
+    store.attach([{'yacht_id': 'Y1', 'sha256': h, 'file_path': '/nas/...'}])
+
+    store.savings()   # stored vs per-yacht bytes, chunks, estimated cost
+"""
+
+from urllib.parse import quote
+from typing import Dict, Any, List, Iterable
+
+from .transport import Transport
+
+
+# text-embedding-3-small list price and Supabase storage price, USD
+EMBEDDING_USD_PER_1M_TOKENS = 0.02
+STORAGE_USD_PER_GB_MONTH = 0.021
+# OpenAI's rule of thumb for English text
+CHARS_PER_TOKEN = 4
+
+
+def blob_path(sha256: str) -> str:
+    """Object path of a blob inside the bucket."""
+    return f"blobs/{sha256[:2]}/{sha256}"
+
+
+def estimate_savings(totals: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn stored/logical totals into savings and estimated cost.
+
+    Args:
+        totals: Row of document_dedup_savings(): yachts, unique_blobs, refs,
+            stored_bytes, logical_bytes, stored_chunks, logical_chunks,
+            stored_chunk_chars, logical_chunk_chars
+
+    Returns:
+        totals plus bytes_saved, chunks_saved, embedding_tokens_saved,
+        dedup_ratio, and storage_usd_month / embedding_usd as
+        {'stored': ..., 'logical': ..., 'saved': ...}
+    """
+    t = {k: float(v or 0) for k, v in totals.items()}
+
+    def cost(stored: float, logical: float) -> Dict[str, float]:
+        return {'stored': round(stored, 4), 'logical': round(logical, 4),
+                'saved': round(logical - stored, 4)}
+
+    stored_tokens = t['stored_chunk_chars'] / CHARS_PER_TOKEN
+    logical_tokens = t['logical_chunk_chars'] / CHARS_PER_TOKEN
+
+    return {
+        **{k: int(v) for k, v in t.items()},
+        'bytes_saved': int(t['logical_bytes'] - t['stored_bytes']),
+        'chunks_saved': int(t['logical_chunks'] - t['stored_chunks']),
+        'embedding_tokens_saved': int(logical_tokens - stored_tokens),
+        'dedup_ratio': round(t['logical_bytes'] / t['stored_bytes'], 2) if t['stored_bytes'] else 1.0,
+        'storage_usd_month': cost(t['stored_bytes'] / 1e9 * STORAGE_USD_PER_GB_MONTH,
+                                  t['logical_bytes'] / 1e9 * STORAGE_USD_PER_GB_MONTH),
+        'embedding_usd': cost(stored_tokens / 1e6 * EMBEDDING_USD_PER_1M_TOKENS,
+                              logical_tokens / 1e6 * EMBEDDING_USD_PER_1M_TOKENS),
+    }
+
+
+class BlobStore:
+    """Fleet-wide blob registry, storage and chunk store (service-role key)."""
+
+    def __init__(
+        self,
+        api_endpoint: str,
+        service_key: str,
+        bucket: str = 'documents',
+        timeout: float = 300,
+        pool_size: int = 10,
+    ):
+        """
+        Initialize client.
+
+        Args:
+            api_endpoint: Supabase project URL
+            service_key: Service-role key (blob tables are not readable by anon)
+            bucket: Storage bucket holding blobs/
+            timeout: Read timeout in seconds for uploads
+            pool_size: Keep-alive connections (match the caller's upload concurrency)
+        """
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self.bucket = bucket
+        self._transport = Transport(headers={
+            'apikey': service_key,
+            'Authorization': f'Bearer {service_key}',
+        }, timeout=(5, timeout), pool_size=pool_size)
+
+    def _rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        resp = self._transport.post(f"{self.api_endpoint}/rest/v1/rpc/{function}", json=params)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{function} failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def claim(self, blobs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Register blobs and learn which ones this caller must upload.
+
+        Args:
+            blobs: [{'sha256', 'size_bytes', 'content_type'}, ...]
+
+        Returns:
+            {sha256: {'storage_path', 'needs_upload', 'indexed'}}. A hash
+            another uploader claimed in the same instant may come back
+            without a row; it is reported as not needing upload.
+
+        Raises:
+            RuntimeError: On a non-200 response
+        """
+        if not blobs:
+            return {}
+        rows = {row['sha256']: row for row in self._rpc('claim_document_blobs', {'p_blobs': blobs}) or []}
+        for blob in blobs:
+            rows.setdefault(blob['sha256'], {
+                'sha256': blob['sha256'],
+                'storage_path': blob_path(blob['sha256']),
+                'needs_upload': False,
+                'indexed': False,
+            })
+        return rows
+
+    def upload(self, local_path: str, storage_path: str, content_type: str) -> str:
+        """
+        Upload a claimed blob from disk.
+
+        Returns:
+            Full storage key ("<bucket>/blobs/..")
+
+        Raises:
+            RuntimeError: On a non-2xx response
+            TransportError: On network failure
+        """
+        with open(local_path, 'rb') as body:
+            resp = self._transport.post(
+                f"{self.api_endpoint}/storage/v1/object/{self.bucket}/{quote(storage_path)}",
+                data=body,
+                # Content-addressed: overwriting a half-finished upload is always safe
+                headers={'Content-Type': content_type, 'x-upsert': 'true'},
+            )
+        if resp.status_code >= 300:
+            raise RuntimeError(f"Blob upload failed: {resp.status_code} {resp.text[:200]}")
+        return f"{self.bucket}/{storage_path}"
+
+    def mark_uploaded(self, hashes: List[str]) -> int:
+        """Confirm uploaded blobs so their claims never expire."""
+        if not hashes:
+            return 0
+        return int(self._rpc('mark_document_blobs_uploaded', {'p_hashes': hashes}) or 0)
+
+    def attach(self, refs: List[Dict[str, Any]]) -> int:
+        """
+        Record which yacht holds which blob, one multi-row upsert.
+
+        Args:
+            refs: [{'yacht_id', 'sha256', 'file_path', 'metadata'?}, ...];
+                an existing (yacht_id, file_path) is re-pointed
+
+        Returns:
+            Number of refs written
+
+        Raises:
+            RuntimeError: On a non-2xx response
+        """
+        if not refs:
+            return 0
+        resp = self._transport.post(
+            f"{self.api_endpoint}/rest/v1/yacht_document_refs",
+            params={'on_conflict': 'yacht_id,file_path'},
+            json=refs,
+            headers={'Prefer': 'resolution=merge-duplicates,return=minimal'},
+        )
+        if resp.status_code >= 300:
+            raise RuntimeError(f"Ref upsert failed: {resp.status_code} {resp.text[:300]}")
+        return len(refs)
+
+    def unindexed(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Uploaded blobs still waiting for extraction and embedding, oldest first.
+
+        NasIngestionClient.requeue_unindexed_blobs() turns these into
+        indexing jobs.
+        """
+        resp = self._transport.get(f"{self.api_endpoint}/rest/v1/document_blobs", params={
+            'select': 'sha256,storage_path,content_type,size_bytes',
+            'indexed': 'is.false',
+            'uploaded_at': 'not.is.null',
+            'order': 'created_at.asc',
+            'limit': str(limit),
+        })
+        if resp.status_code != 200:
+            raise RuntimeError(f"document_blobs query failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def store_chunks(self, sha256: str, chunks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Save a blob's chunks (with embeddings) and mark it indexed.
+
+        Args:
+            sha256: Blob hash
+            chunks: {'chunk_index', 'chunk_text', 'embedding', and optionally
+                'char_start', 'char_end', 'section', 'page_numbers', 'metadata'}
+
+        Returns:
+            Chunk count recorded on the blob
+
+        Raises:
+            RuntimeError: On a non-2xx response
+        """
+        rows = [{**chunk, 'sha256': sha256} for chunk in chunks]
+        if rows:
+            resp = self._transport.post(
+                f"{self.api_endpoint}/rest/v1/document_blob_chunks",
+                params={'on_conflict': 'sha256,chunk_index'},
+                json=rows,
+                headers={'Prefer': 'resolution=merge-duplicates,return=minimal'},
+            )
+            if resp.status_code >= 300:
+                raise RuntimeError(f"Chunk upsert failed: {resp.status_code} {resp.text[:300]}")
+        return int(self._rpc('mark_document_blob_indexed', {'p_sha256': sha256}) or 0)
+
+    def savings(self) -> Dict[str, Any]:
+        """Fleet-wide storage and embedding saved by deduplication (see estimate_savings)."""
+        rows = self._rpc('document_dedup_savings', {}) or []
+        return estimate_savings(rows[0] if rows else {
+            'yachts': 0, 'unique_blobs': 0, 'refs': 0,
+            'stored_bytes': 0, 'logical_bytes': 0,
+            'stored_chunks': 0, 'logical_chunks': 0,
+            'stored_chunk_chars': 0, 'logical_chunk_chars': 0,
+        })
+
+    def close(self):
+        self._transport.close()
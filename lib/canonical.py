@@ -0,0 +1,197 @@
+"""
+CelesteOS Canonical JSON
+========================
+The bytes request signatures are computed over (after "<timestamp>:"):
+
+    json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+Encoders:
+- stdlib  exactly the definition above
+- orjson  orjson with sorted keys, plus a fix-up pass over the places its
+          output differs from the stdlib's: non-ASCII and DEL characters
+          (the stdlib escapes them as \\uXXXX) and float formatting
+          (1e-05 / 1e+16 rather than 0.00001 / 1e16). Payloads orjson
+          cannot reproduce exactly (NaN/Infinity, which it writes as null;
+          non-string keys; integers beyond 64 bits; str/int/dict/list
+          subclasses, dataclasses and datetimes) go to the stdlib encoder.
+
+Both produce identical bytes for every payload the stdlib encoder
+accepts (benchmarks/bench_canonical.py checks this on random payloads
+before timing). The orjson path may additionally accept a few types the
+stdlib rejects (UUID, Enum).
+
+The default is orjson when it is installed, else stdlib, resolved on
+first use so importing this module (and lib.crypto) stays cheap. Override
+with set_canonical_encoder() or CELESTEOS_CANONICAL_JSON=stdlib.
+
+Usage:
+    from lib.canonical import canonical_json
+    body = canonical_json(payload)          # bytes
+"""
+
+import os
+import re
+import json
+import math
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Optional, Union
+
+
+Encoder = Callable[[Any], bytes]
+
+# One JSON string literal in encoder output (escapes included)
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# Where orjson's float formatting can differ from float.__repr__
+_EXPONENT = re.compile(rb'e-?\d')
+_SMALL = re.compile(rb'\.0000')
+_TOKEN_END = re.compile(rb'[,\]}]')
+
+_orjson = None
+
+
+def _load_orjson():
+    """Import orjson on first use (optional dependency)."""
+    global _orjson
+    if _orjson is None:
+        import orjson
+        _orjson = orjson
+    return _orjson
+
+
+def stdlib_canonical_json(payload: Any) -> bytes:
+    """Canonical JSON with the standard library (the reference encoder)."""
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """True if obj contains a NaN or infinite float."""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(map(_has_non_finite, obj.values()))
+    if isinstance(obj, (list, tuple)):
+        # Numeric lists (embeddings) in one C call; NaN and Infinity
+        # propagate through the sum (an overflow only costs the fallback)
+        try:
+            return not math.isfinite(sum(obj, 0.0))
+        except (TypeError, OverflowError):
+            return any(map(_has_non_finite, obj))
+    return False
+
+
+def _fix_floats(segment: bytes) -> bytes:
+    """Re-format floats in a stretch of output outside strings the way float.__repr__ does."""
+    if b'e' not in segment and b'.0000' not in segment:
+        return segment
+
+    spans = set()
+    for hit in (*_EXPONENT.finditer(segment), *_SMALL.finditer(segment)):
+        i = hit.start()
+        start = max(segment.rfind(b',', 0, i), segment.rfind(b'[', 0, i), segment.rfind(b':', 0, i)) + 1
+        end = _TOKEN_END.search(segment, i)
+        spans.add((start, end.start() if end else len(segment)))
+
+    pieces = []
+    pos = 0
+    for start, end in sorted(spans):
+        pieces.append(segment[pos:start])
+        pieces.append(repr(float(segment[start:end])).encode('ascii'))
+        pos = end
+    pieces.append(segment[pos:])
+    return b''.join(pieces)
+
+
+def orjson_canonical_json(payload: Any) -> bytes:
+    """
+    Canonical JSON via orjson, byte-identical to stdlib_canonical_json().
+
+    Raises:
+        ImportError: If orjson is not installed
+        TypeError: For payloads the stdlib encoder also rejects
+    """
+    orjson = _load_orjson()
+    try:
+        out = orjson.dumps(payload, option=(
+            orjson.OPT_SORT_KEYS
+            | orjson.OPT_PASSTHROUGH_SUBCLASS
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+        ))
+    except TypeError:
+        return stdlib_canonical_json(payload)
+
+    # orjson writes NaN/Infinity as null; the stdlib writes NaN/Infinity
+    if b'null' in out and _has_non_finite(payload):
+        return stdlib_canonical_json(payload)
+
+    needs_ascii = not out.isascii() or b'\x7f' in out
+    needs_floats = _EXPONENT.search(out) is not None or _SMALL.search(out) is not None
+    if not (needs_ascii or needs_floats):
+        return out
+
+    # Walk string literals so floats are only rewritten outside them and
+    # escaping only touches strings
+    pieces = []
+    pos = 0
+    for match in _STRING.finditer(out):
+        gap = out[pos:match.start()]
+        pieces.append(_fix_floats(gap) if needs_floats else gap)
+        literal = match.group()
+        if needs_ascii and (not literal.isascii() or b'\x7f' in literal):
+            literal = encode_basestring_ascii(json.loads(literal)).encode('ascii')
+        pieces.append(literal)
+        pos = match.end()
+    tail = out[pos:]
+    pieces.append(_fix_floats(tail) if needs_floats else tail)
+    return b''.join(pieces)
+
+
+ENCODERS = {
+    'stdlib': stdlib_canonical_json,
+    'orjson': orjson_canonical_json,
+}
+
+_encoder: Optional[Encoder] = None
+
+
+def set_canonical_encoder(encoder: Union[str, Encoder]) -> Optional[Encoder]:
+    """
+    Choose the encoder used by canonical_json() (and so by signing).
+
+    Args:
+        encoder: 'stdlib', 'orjson', or a callable payload -> bytes that
+            must match stdlib_canonical_json() byte for byte
+
+    Returns:
+        The previous encoder (None if none was in use yet)
+
+    Raises:
+        ImportError: If 'orjson' is requested but not installed
+        ValueError: On an unknown encoder name
+    """
+    global _encoder
+    if isinstance(encoder, str):
+        if encoder not in ENCODERS:
+            raise ValueError(f"Unknown canonical JSON encoder: {encoder}")
+        if encoder == 'orjson':
+            _load_orjson()
+        encoder = ENCODERS[encoder]
+    previous, _encoder = _encoder, encoder
+    return previous
+
+
+def _default_encoder() -> Encoder:
+    name = os.environ.get('CELESTEOS_CANONICAL_JSON')
+    if name:
+        set_canonical_encoder(name)
+    else:
+        try:
+            set_canonical_encoder('orjson')
+        except ImportError:
+            set_canonical_encoder('stdlib')
+    return _encoder
+
+
+def canonical_json(payload: Any) -> bytes:
+    """Canonical JSON bytes of payload with the configured encoder."""
+    return (_encoder or _default_encoder())(payload)
@@ -22,9 +22,12 @@ Flow:
 import hashlib
 import hmac
 import secrets
+import threading
 import time
-import json
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Sequence, Iterable, Mapping, Union
+
+from .canonical import canonical_json
+from .instrumentation import traced
 
 
 class CryptoIdentity:
@@ -40,17 +43,23 @@ class CryptoIdentity:
         """
         self.yacht_id = yacht_id
         self._shared_secret = shared_secret
+        self._yacht_id_hash: Optional[Tuple[str, str]] = None
 
     @property
     def yacht_id_hash(self) -> str:
-        """SHA256 hash of yacht_id."""
-        return hashlib.sha256(self.yacht_id.encode('utf-8')).hexdigest()
+        """SHA256 hash of yacht_id (computed once, recomputed if yacht_id changes)."""
+        cached = self._yacht_id_hash
+        if cached is None or cached[0] is not self.yacht_id:
+            cached = (self.yacht_id, compute_yacht_hash(self.yacht_id))
+            self._yacht_id_hash = cached
+        return cached[1]
 
     @property
     def has_secret(self) -> bool:
         """Check if shared_secret is available."""
         return self._shared_secret is not None
 
+    @traced('crypto.sign_request')
     def sign_request(self, payload: Dict[str, Any], timestamp: Optional[int] = None) -> Dict[str, str]:
         """
         Sign a request payload with HMAC-SHA256.
@@ -65,6 +74,29 @@ class CryptoIdentity:
             - X-Timestamp: Unix timestamp
             - X-Signature: HMAC-SHA256(timestamp + payload, shared_secret)
 
+        Raises:
+            ValueError: If shared_secret not available
+        """
+        # Canonical payload: sorted JSON (lib.canonical) with timestamp prepended
+        return self.sign_body(canonical_json(payload), timestamp)
+
+    @traced('crypto.sign_body')
+    def sign_body(self, body: bytes, timestamp: Optional[int] = None) -> Dict[str, str]:
+        """
+        Sign an already serialized request body.
+
+        For callers that send the exact bytes they sign: serialize once with
+        lib.canonical.canonical_json(payload), sign those bytes, and post
+        them as the body. The server verifies against the canonical form of
+        the parsed body, so `body` must be canonical JSON.
+
+        Args:
+            body: Canonical JSON bytes
+            timestamp: Unix timestamp (defaults to now)
+
+        Returns:
+            Same headers as sign_request()
+
         Raises:
             ValueError: If shared_secret not available
         """
@@ -73,13 +105,10 @@ class CryptoIdentity:
 
         ts = timestamp or int(time.time())
 
-        # Canonical payload: sorted JSON with timestamp prepended
-        canonical = f"{ts}:{json.dumps(payload, sort_keys=True, separators=(',', ':'))}"
-
         # HMAC-SHA256
         signature = hmac.new(
             bytes.fromhex(self._shared_secret),
-            canonical.encode('utf-8'),
+            f"{ts}:".encode('utf-8') + body,
             hashlib.sha256
         ).hexdigest()
 
@@ -89,6 +118,7 @@ class CryptoIdentity:
             'X-Signature': signature
         }
 
+    @traced('crypto.verify_response')
     def verify_response(self, response_body: bytes, signature: str, timestamp: str) -> bool:
         """
         Verify a signed response from the server.
@@ -138,6 +168,315 @@ class SecretGenerator:
         return hashlib.sha256(code.encode('utf-8')).hexdigest()
 
 
+def hash_tokens(tokens: Sequence[str]) -> List[str]:
+    """
+    SHA256 hex digests of many tokens (the token_hash column values).
+
+    One comprehension with the hash constructor bound once, instead of a
+    helper call per token (benchmarks/bench_tokens.py).
+    """
+    sha256 = hashlib.sha256
+    return [sha256(t.encode('utf-8')).hexdigest() for t in tokens]
+
+
+def mint_tokens(count: int) -> List[Tuple[str, str]]:
+    """
+    Mint `count` tokens with their hashes in bulk.
+
+    Returns:
+        [(token, token_hash), ...]: 256-bit hex tokens and the SHA256 hex
+        digests stored as download_links.token_hash
+
+    Draws all randomness in one read from the OS CSPRNG and hex-encodes it
+    in one call, then slices 64-character tokens out of it. Each token is
+    as strong as SecretGenerator.generate_download_token().
+    """
+    if count <= 0:
+        return []
+    pool = secrets.token_bytes(32 * count).hex()
+    tokens = [pool[i:i + 64] for i in range(0, len(pool), 64)]
+    return list(zip(tokens, hash_tokens(tokens)))
+
+
+class TokenMint:
+    """
+    Pool of pre-minted tokens for bursty issuance.
+
+    When a fleet-wide release reissues links or many yachts activate at
+    once, take() hands out a token and its precomputed token_hash without
+    touching the CSPRNG or hashing in the request path. The pool refills in
+    bulk (mint_tokens) once it drops below low_water, on a background
+    thread if refill_in_background is set.
+
+    Every token is handed out at most once. Tokens serve both download
+    links and shared secrets (same 256-bit hex format).
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10000,
+        low_water: Optional[int] = None,
+        refill_in_background: bool = False,
+    ):
+        """
+        Initialize mint (the pool is filled immediately).
+
+        Args:
+            pool_size: Tokens held after a refill
+            low_water: Refill when fewer remain (default: pool_size // 4)
+            refill_in_background: Refill on a daemon thread instead of in
+                the take() call that crossed low_water
+        """
+        self.pool_size = pool_size
+        self.low_water = pool_size // 4 if low_water is None else low_water
+        self.refill_in_background = refill_in_background
+        self.minted = 0
+        self._pool: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._refilling = False
+        self._refill()
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    def _refill(self):
+        with self._lock:
+            need = self.pool_size - len(self._pool)
+        fresh = mint_tokens(need)
+        with self._lock:
+            self._pool.extend(fresh)
+            self.minted += len(fresh)
+            self._refilling = False
+
+    def _maybe_refill(self):
+        # Called with the lock held
+        if self._refilling or len(self._pool) >= self.low_water:
+            return False
+        self._refilling = True
+        if self.refill_in_background:
+            threading.Thread(target=self._refill, daemon=True).start()
+            return False
+        return True
+
+    def take(self) -> Tuple[str, str]:
+        """One (token, token_hash)."""
+        with self._lock:
+            if self._pool:
+                minted = self._pool.pop()
+                if len(self._pool) >= self.low_water or not self._maybe_refill():
+                    return minted
+            else:
+                minted = None
+        if minted is None:
+            return self.take_many(1)[0]
+        self._refill()
+        return minted
+
+    def take_many(self, count: int) -> List[Tuple[str, str]]:
+        """
+        `count` (token, token_hash) pairs.
+
+        Mints inline whatever the pool cannot cover, so this never blocks
+        on a background refill.
+        """
+        with self._lock:
+            split = max(0, len(self._pool) - count)
+            taken = self._pool[split:]
+            del self._pool[split:]
+            refill = self._maybe_refill()
+        if len(taken) < count:
+            extra = mint_tokens(count - len(taken))
+            with self._lock:
+                self.minted += len(extra)
+            taken.extend(extra)
+        if refill:
+            self._refill()
+        return taken
+
+
+SecretEntries = Union[Mapping[str, str], Iterable[Tuple[str, str]]]
+
+
+class _KeyTable:
+    """One generation of an IdentityRegistry; never mutated once published."""
+
+    __slots__ = ('slots', 'keys', 'hashes')
+
+    def __init__(self, slots: Dict[str, int], keys: bytes, hashes: bytes):
+        self.slots = slots    # yacht_id -> slot
+        self.keys = keys      # raw 32-byte shared secrets, slot * 32
+        self.hashes = hashes  # raw SHA256(yacht_id), slot * 32
+
+
+def _add_entries(slots: Dict[str, int], keys: bytearray, hashes: bytearray, entries: SecretEntries):
+    """Add or overwrite (yacht_id, hex secret) entries in a table under construction."""
+    if isinstance(entries, Mapping):
+        entries = entries.items()
+    for yacht_id, shared_secret in entries:
+        key = bytes.fromhex(shared_secret)
+        if len(key) != 32:
+            raise ValueError(f"shared_secret for {yacht_id} is not 256 bits")
+        slot = slots.get(yacht_id)
+        if slot is None:
+            slots[yacht_id] = len(slots)
+            keys += key
+            hashes += hashlib.sha256(yacht_id.encode('utf-8')).digest()
+        else:
+            keys[slot * 32:slot * 32 + 32] = key
+
+
+class IdentityRegistry:
+    """
+    Signing keys for many yachts, prepared once (relay / gateway services).
+
+    A service that signs on behalf of a fleet would otherwise build a
+    CryptoIdentity per request: a hex decode of the secret and, for the
+    hash, a SHA256 of yacht_id every time. The registry decodes and hashes
+    at load time and keeps raw 32-byte keys and yacht_id hashes in two flat
+    byte strings indexed by a yacht_id -> slot dict, so a lookup is one dict
+    probe and a 32-byte slice, and the per-yacht footprint is the dict entry
+    plus 64 bytes (benchmarks/bench_identity_registry.py measures it).
+
+    Hot reload: load(), update() and remove() build a new table and swap it
+    in with one reference assignment. Signers read the current table
+    without locking and always see either the old or the new generation,
+    never a mix; writers are serialized.
+
+    Usage:
+        registry = IdentityRegistry({'YACHT_001': secret_hex, ...})
+        headers = registry.sign_request('YACHT_001', payload)
+        registry.update({'YACHT_001': rotated_hex})
+    """
+
+    def __init__(self, secrets: Optional[SecretEntries] = None):
+        """
+        Args:
+            secrets: Mapping or (yacht_id, shared_secret hex) pairs
+        """
+        self._lock = threading.Lock()
+        self._table = _KeyTable({}, b'', b'')
+        self.generation = 0
+        if secrets is not None:
+            self.load(secrets)
+
+    def __len__(self) -> int:
+        return len(self._table.slots)
+
+    def __contains__(self, yacht_id: str) -> bool:
+        return yacht_id in self._table.slots
+
+    def _publish(self, table: _KeyTable):
+        # Called with the lock held
+        self._table = table
+        self.generation += 1
+
+    def load(self, secrets: SecretEntries):
+        """
+        Replace every key (e.g. a full reload from fleet_registry).
+
+        Raises:
+            ValueError: If a secret is not 64 hex characters; the current
+                table stays in place
+        """
+        slots: Dict[str, int] = {}
+        keys, hashes = bytearray(), bytearray()
+        _add_entries(slots, keys, hashes, secrets)
+        with self._lock:
+            self._publish(_KeyTable(slots, bytes(keys), bytes(hashes)))
+
+    def update(self, secrets: SecretEntries):
+        """
+        Add yachts or rotate their secrets, keeping everyone else's.
+
+        Raises:
+            ValueError: If a secret is not 64 hex characters; the current
+                table stays in place
+        """
+        with self._lock:
+            table = self._table
+            slots = dict(table.slots)
+            keys, hashes = bytearray(table.keys), bytearray(table.hashes)
+            _add_entries(slots, keys, hashes, secrets)
+            self._publish(_KeyTable(slots, bytes(keys), bytes(hashes)))
+
+    def remove(self, yacht_ids: Iterable[str]):
+        """Drop yachts (e.g. deactivated); unknown ids are ignored."""
+        with self._lock:
+            table = self._table
+            gone = set(yacht_ids)
+            slots: Dict[str, int] = {}
+            keys, hashes = bytearray(), bytearray()
+            for yacht_id, slot in table.slots.items():
+                if yacht_id not in gone:
+                    slots[yacht_id] = len(slots)
+                    keys += table.keys[slot * 32:slot * 32 + 32]
+                    hashes += table.hashes[slot * 32:slot * 32 + 32]
+            self._publish(_KeyTable(slots, bytes(keys), bytes(hashes)))
+
+    def _key(self, yacht_id: str) -> bytes:
+        table = self._table
+        slot = table.slots[yacht_id]
+        return table.keys[slot * 32:slot * 32 + 32]
+
+    def yacht_id_hash(self, yacht_id: str) -> str:
+        """SHA256 hash of a registered yacht_id (KeyError if not registered)."""
+        table = self._table
+        slot = table.slots[yacht_id]
+        return table.hashes[slot * 32:slot * 32 + 32].hex()
+
+    def identity(self, yacht_id: str) -> CryptoIdentity:
+        """
+        A standalone CryptoIdentity for a registered yacht.
+
+        For code that needs the object; it keeps the secret it was built
+        with, so prefer the registry's own signing methods, which follow
+        rotation.
+
+        Raises:
+            KeyError: If yacht_id is not registered
+        """
+        table = self._table
+        slot = table.slots[yacht_id]
+        identity = CryptoIdentity(yacht_id, table.keys[slot * 32:slot * 32 + 32].hex())
+        identity._yacht_id_hash = (yacht_id, table.hashes[slot * 32:slot * 32 + 32].hex())
+        return identity
+
+    def sign_request(self, yacht_id: str, payload: Dict[str, Any],
+                     timestamp: Optional[int] = None) -> Dict[str, str]:
+        """
+        Sign a payload for yacht_id; same headers as CryptoIdentity.sign_request().
+
+        Raises:
+            KeyError: If yacht_id is not registered
+        """
+        return self.sign_body(yacht_id, canonical_json(payload), timestamp)
+
+    @traced('crypto.registry_sign_body')
+    def sign_body(self, yacht_id: str, body: bytes, timestamp: Optional[int] = None) -> Dict[str, str]:
+        """
+        Sign canonical JSON bytes for yacht_id; see CryptoIdentity.sign_body().
+
+        Raises:
+            KeyError: If yacht_id is not registered
+        """
+        key = self._key(yacht_id)
+        ts = timestamp or int(time.time())
+        return {
+            'X-Yacht-ID': yacht_id,
+            'X-Timestamp': str(ts),
+            'X-Signature': hmac.digest(key, f"{ts}:".encode('utf-8') + body, 'sha256').hex(),
+        }
+
+    def verify_response(self, yacht_id: str, response_body: bytes, signature: str, timestamp: str) -> bool:
+        """Verify a signed response for yacht_id; False if it is not registered."""
+        try:
+            key = self._key(yacht_id)
+        except KeyError:
+            return False
+        expected = hmac.digest(key, f"{timestamp}:".encode('utf-8') + response_body, 'sha256').hex()
+        return hmac.compare_digest(signature, expected)
+
+
 class RequestVerifier:
     """Server-side request verification (for Edge Functions)."""
 
@@ -145,6 +484,7 @@ class RequestVerifier:
     MAX_TIMESTAMP_DRIFT = 300
 
     @classmethod
+    @traced('crypto.verify_signature')
     def verify_signature(
         cls,
         yacht_id: str,
@@ -163,6 +503,23 @@ class RequestVerifier:
             signature: X-Signature header
             timestamp: X-Timestamp header
 
+        Returns:
+            (is_valid, error_message)
+        """
+        return cls.verify_body(yacht_id, shared_secret, canonical_json(payload), signature, timestamp)
+
+    @classmethod
+    def verify_body(
+        cls,
+        yacht_id: str,
+        shared_secret: str,
+        body: bytes,
+        signature: str,
+        timestamp: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a signature over an already canonical body (see sign_body).
+
         Returns:
             (is_valid, error_message)
         """
@@ -177,10 +534,9 @@ class RequestVerifier:
             return False, "Timestamp outside acceptable window"
 
         # Compute expected signature
-        canonical = f"{ts}:{json.dumps(payload, sort_keys=True, separators=(',', ':'))}"
         expected = hmac.new(
             bytes.fromhex(shared_secret),
-            canonical.encode('utf-8'),
+            f"{ts}:".encode('utf-8') + body,
             hashlib.sha256
         ).hexdigest()
 
@@ -0,0 +1,110 @@
+"""
+CelesteOS Document Sync Client
+==============================
+Agent-side client for the document indexing endpoints.
+
+Re-indexing an edited document used to cost one delete-chunks call per
+stale file_hash plus one row upsert per new chunk. replace_document() sends
+a single signed request carrying the old hash list and the complete new
+chunk set; the server applies it as one set-based DELETE plus one multi-row
+INSERT inside a single transaction.
+
+Signing:
+    The body is serialized once in canonical form (sorted keys, no spaces)
+    and those exact bytes are both signed and sent, so the server verifies
+    the HMAC over the raw body without re-serializing it.
+"""
+
+import time
+from typing import Dict, Any, List, Iterable
+
+from .canonical import canonical_json
+from .crypto import CryptoIdentity
+from .transport import Transport
+
+
+class DocumentClient:
+    """Signed client for yacht document endpoints."""
+
+    def __init__(self, api_endpoint: str, crypto: CryptoIdentity, timeout: int = 120):
+        """
+        Initialize document client.
+
+        Args:
+            api_endpoint: Supabase project URL
+            crypto: Identity holding the yacht's shared_secret
+            timeout: Request timeout in seconds (embedding large documents is slow)
+        """
+        if not crypto.has_secret:
+            raise ValueError("DocumentClient requires an activated identity")
+
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self.crypto = crypto
+        self.timeout = timeout
+        self._transport = Transport(headers={'Content-Type': 'application/json'})
+
+    def replace_document(
+        self,
+        old_hashes: Iterable[str],
+        chunks: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """
+        Atomically replace a document's chunks.
+
+        Args:
+            old_hashes: file_hash values of every previous version to remove
+            chunks: New chunk set, same shape as upload-chunks
+                    (text, chunk_index, char_start, char_end, file_path,
+                    file_hash, metadata, section, page_numbers)
+
+        Returns:
+            Dict with server counts plus client-side throughput:
+            - deleted: rows removed
+            - inserted: rows written
+            - elapsed_seconds: wall time of the round-trip
+            - rows_per_sec: (deleted + inserted) / elapsed_seconds
+
+        Raises:
+            TransportError: On network failure
+            RuntimeError: If the server rejects the replacement
+        """
+        payload = {
+            'yacht_id': self.crypto.yacht_id,
+            'old_hashes': sorted(set(old_hashes)),
+            'chunks': chunks,
+        }
+
+        # Serialize once: the canonical bytes are both signed and sent
+        body = canonical_json(payload)
+        headers = self.crypto.sign_body(body)
+
+        start = time.perf_counter()
+        resp = self._transport.post(
+            f"{self.api_endpoint}/functions/v1/replace-document",
+            data=body,
+            headers=headers,
+            timeout=self.timeout
+        )
+        elapsed = time.perf_counter() - start
+
+        if resp.status_code != 200:
+            try:
+                message = resp.json().get('error', resp.text)
+            except ValueError:
+                message = resp.text
+            raise RuntimeError(f"Replace document failed: {resp.status_code} - {message}")
+
+        data = resp.json()
+        deleted = data.get('deleted', 0)
+        inserted = data.get('inserted', 0)
+
+        return {
+            'deleted': deleted,
+            'inserted': inserted,
+            'elapsed_seconds': elapsed,
+            'rows_per_sec': (deleted + inserted) / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def close(self):
+        """Close pooled connections."""
+        self._transport.close()
@@ -0,0 +1,923 @@
+"""
+CelesteOS Resumable Downloads
+=============================
+Client for the DMG download link that survives dropped satellite links.
+
+The download edge function used to 302 to a 1-hour signed URL; a dropped
+connection meant starting over and spending one of the link's 3
+downloads. This client:
+
+- asks for the ticket as JSON (?format=json): signed URL, published
+  SHA-256 and the per-part digest manifest (<dmg>.parts.json)
+- fetches the file as fixed-size parts over parallel HTTP Range requests
+- verifies each part against the manifest as it completes and records it
+  in a state file next to the download, so a restart fetches only the
+  missing parts (and a part interrupted mid-way continues from its last
+  byte)
+- re-issues an expired signed URL with ?resume=1, which does not count as
+  another download
+
+Service-side, DownloadLinks issues links and claims downloads through
+claim_download() (supabase/migrations/20251203_claim_download.sql), the
+same atomic check-and-count the download function uses.
+
+Optional caching proxy (DownloadCacheProxy) for marinas and shipyards:
+it keeps verified releases on disk keyed by SHA-256 and serves repeat
+downloads, with Range support, from the local network.
+
+Part manifest (written by build_part_manifest / installer/upload_dmg.py):
+    {"size": N, "sha256": "...", "part_size": 8388608, "parts": ["<sha256>", ...]}
+
+Usage:
+    python -m lib.download fetch "https://.../functions/v1/download?token=..." -o CelesteOS.dmg
+        [--segments 4] [--proxy http://cache.local:8788]
+    python -m lib.download manifest CelesteOS-YACHT_001.dmg
+    python -m lib.download serve-cache --dir /var/cache/celesteos --allow-host xxx.supabase.co
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlencode, parse_qs
+from typing import Optional, Dict, Any, List, Callable, Iterable
+
+from .crypto import TokenMint, mint_tokens
+from .transport import Transport, TransportError, backoff_delay
+
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+READ_CHUNK = 256 * 1024
+
+PARTIAL_SUFFIX = '.part'
+STATE_SUFFIX = '.download.json'
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+_CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class DownloadError(Exception):
+    """Download could not be completed or failed verification."""
+    pass
+
+
+class _PartRetry(Exception):
+    """Transient part failure; the part is retried from its current offset."""
+    pass
+
+
+def build_part_manifest(path: Path, part_size: int = DEFAULT_PART_SIZE) -> Dict[str, Any]:
+    """
+    Whole-file and per-part SHA-256 of a file, read once.
+
+    Returns:
+        {'size', 'sha256', 'part_size', 'parts': [hex digest per part]}
+    """
+    whole = hashlib.sha256()
+    parts = []
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            part = hashlib.sha256()
+            remaining = part_size
+            while remaining:
+                chunk = f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                whole.update(chunk)
+                part.update(chunk)
+                remaining -= len(chunk)
+                size += len(chunk)
+            if remaining == part_size:
+                break
+            parts.append(part.hexdigest())
+            if remaining:
+                break
+    return {'size': size, 'sha256': whole.hexdigest(), 'part_size': part_size, 'parts': parts}
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _positive_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+@dataclass
+class DownloadTicket:
+    """Where to fetch a release and what it must hash to."""
+    url: str
+    sha256: Optional[str] = None
+    parts_url: Optional[str] = None
+
+
+class DownloadClient:
+    """Segmented, resumable, verified downloader."""
+
+    def __init__(
+        self,
+        segments: int = 4,
+        part_size: int = DEFAULT_PART_SIZE,
+        part_attempts: int = 8,
+        backoff: float = 1.0,
+        cache_proxy: Optional[str] = None,
+        timeout: float = 60,
+        fill_timeout: float = 3600,
+    ):
+        """
+        Initialize client.
+
+        Args:
+            segments: Parts fetched in parallel
+            part_size: Part size when the release has no manifest
+            part_attempts: Attempts per part before giving up (a dropped
+                connection resumes the part from its last byte)
+            backoff: Base retry backoff in seconds
+            cache_proxy: Base URL of a DownloadCacheProxy to fetch through
+            timeout: Read timeout per request in seconds
+            fill_timeout: How long to wait for the proxy to cache a release
+        """
+        self.segments = segments
+        self.part_size = part_size
+        self.part_attempts = part_attempts
+        self.backoff = backoff
+        self.cache_proxy = cache_proxy.rstrip('/') if cache_proxy else None
+        self.fill_timeout = fill_timeout
+        self._transport = Transport(timeout=(10, timeout), pool_size=segments)
+
+    # ------------------------------------------------------------------
+    # Ticket
+    # ------------------------------------------------------------------
+
+    def ticket(self, download_link: str, resume: bool = False) -> DownloadTicket:
+        """
+        Exchange a download link (…/download?token=…) for a ticket.
+
+        Args:
+            download_link: Link from the purchase email
+            resume: Continue the last counted download (does not use up
+                another of the link's downloads)
+
+        Raises:
+            DownloadError: If the link is invalid, expired or used up
+        """
+        params = {'format': 'json'}
+        if resume:
+            params['resume'] = '1'
+        resp = self._transport.get(download_link, params=params)
+        if resp.status_code != 200:
+            try:
+                message = resp.json().get('error', resp.text[:200])
+            except ValueError:
+                message = resp.text[:200]
+            raise DownloadError(f"Download link rejected ({resp.status_code}): {message}")
+        data = resp.json()
+        return DownloadTicket(url=data['url'], sha256=data.get('sha256'), parts_url=data.get('parts_url'))
+
+    def download(
+        self,
+        download_link: str,
+        dest: Path,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Path:
+        """
+        Download the release behind a download link, resuming an earlier
+        interrupted attempt at `dest` if there is one.
+
+        Returns:
+            dest
+
+        Raises:
+            DownloadError: On rejection, exhausted retries or a digest mismatch
+        """
+        dest = Path(dest)
+        resuming = dest.with_name(dest.name + STATE_SUFFIX).exists()
+        ticket = self.ticket(download_link, resume=resuming)
+        return self.fetch(ticket, dest, refresh=lambda: self.ticket(download_link, resume=True),
+                          progress=progress)
+
+    # ------------------------------------------------------------------
+    # Fetch
+    # ------------------------------------------------------------------
+
+    def fetch(
+        self,
+        ticket: DownloadTicket,
+        dest: Path,
+        refresh: Optional[Callable[[], DownloadTicket]] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Path:
+        """
+        Fetch a ticket's file to `dest`.
+
+        Args:
+            ticket: URL and expected digests
+            dest: Final path; data goes to dest.part until verified
+            refresh: Returns a fresh ticket when the signed URL expires
+            progress: Called with (bytes done, total bytes)
+
+        Raises:
+            DownloadError: On exhausted retries or a digest mismatch
+        """
+        dest = Path(dest)
+        manifest = self._manifest(ticket)
+        if manifest and ticket.sha256 and manifest['sha256'] != ticket.sha256:
+            raise DownloadError("Part manifest does not match the published SHA-256")
+        sha256 = ticket.sha256 or (manifest or {}).get('sha256')
+
+        job = _Fetch(self, ticket, dest, manifest, sha256, refresh, progress)
+        if self.cache_proxy and sha256:
+            job.url = self._via_proxy(ticket, sha256)
+        return job.run()
+
+    def _manifest(self, ticket: DownloadTicket) -> Optional[Dict[str, Any]]:
+        if not ticket.parts_url:
+            return None
+        try:
+            resp = self._transport.get(ticket.parts_url)
+        except TransportError:
+            return None
+        if resp.status_code != 200:
+            return None
+        try:
+            manifest = resp.json()
+        except ValueError:
+            raise DownloadError("Part manifest is not JSON") from None
+        if not isinstance(manifest, dict):
+            raise DownloadError("Malformed part manifest")
+        size, part_size, parts = manifest.get('size'), manifest.get('part_size'), manifest.get('parts')
+        if not (_positive_int(size) and _positive_int(part_size) and isinstance(parts, list)
+                and len(parts) == -(-size // part_size)):
+            raise DownloadError("Malformed part manifest")
+        if not all(isinstance(h, str) and _SHA256_RE.match(h) for h in [manifest.get('sha256'), *parts]):
+            raise DownloadError("Malformed part manifest")
+        return manifest
+
+    def _via_proxy(self, ticket: DownloadTicket, sha256: str) -> str:
+        """Have the proxy cache the release (HEAD blocks until it has), return its URL."""
+        query = {'sha256': sha256, 'url': ticket.url}
+        if ticket.parts_url:
+            query['parts_url'] = ticket.parts_url
+        url = f"{self.cache_proxy}/fetch?{urlencode(query)}"
+        resp = self._transport.request('HEAD', url, timeout=(10, self.fill_timeout))
+        if resp.status_code != 200:
+            raise DownloadError(f"Cache proxy could not fetch the release ({resp.status_code})")
+        return url
+
+    def get_range(self, url: str, start: int, end: int):
+        """Streaming GET of bytes start..end (inclusive)."""
+        return self._transport.get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True)
+
+    def close(self):
+        self._transport.close()
+
+
+class _Fetch:
+    """One fetch() call: part bookkeeping, state file, workers."""
+
+    def __init__(self, client: DownloadClient, ticket: DownloadTicket, dest: Path,
+                 manifest: Optional[Dict[str, Any]], sha256: Optional[str],
+                 refresh: Optional[Callable[[], DownloadTicket]],
+                 progress: Optional[Callable[[int, int], None]]):
+        import requests
+        self._stream_errors = (requests.RequestException, TransportError, OSError)
+
+        self.client = client
+        self.url = ticket.url
+        self.dest = dest
+        self.partial = dest.with_name(dest.name + PARTIAL_SUFFIX)
+        self.state_path = dest.with_name(dest.name + STATE_SUFFIX)
+        self.manifest = manifest
+        self.sha256 = sha256
+        self.refresh = refresh
+        self.progress = progress
+        self.size: Optional[int] = None
+
+        self._lock = threading.Lock()
+        self._url_generation = 0
+        self.done_bytes = 0
+
+    # State file: lets a later run skip parts that were already verified
+
+    def _load_state(self, size: int, part_size: int) -> set:
+        try:
+            state = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return set()
+        if (state.get('size'), state.get('part_size'), state.get('sha256')) != (size, part_size, self.sha256) \
+                or not self.partial.exists():
+            return set()
+        return set(state.get('done', []))
+
+    def _save_state(self, size: int, part_size: int, done: Iterable[int]):
+        tmp = self.state_path.with_name(self.state_path.name + '.tmp')
+        tmp.write_text(json.dumps({
+            'size': size, 'part_size': part_size, 'sha256': self.sha256, 'done': sorted(done),
+        }))
+        os.replace(tmp, self.state_path)
+
+    def run(self) -> Path:
+        size = self.manifest['size'] if self.manifest else self._probe_size()
+        if size is None:
+            return self._single_stream()
+        self.size = size
+
+        part_size = self.manifest['part_size'] if self.manifest else self.client.part_size
+        count = -(-size // part_size) if size else 0
+        done = self._load_state(size, part_size)
+        if not done:
+            with open(self.partial, 'wb') as f:
+                f.truncate(size)
+            self._save_state(size, part_size, done)
+
+        self.done_bytes = sum(min(part_size, size - i * part_size) for i in done)
+        self._report()
+
+        pending = [i for i in range(count) if i not in done]
+        with ThreadPoolExecutor(max_workers=self.client.segments, thread_name_prefix='download') as pool:
+            futures = {pool.submit(self._fetch_part, i, i * part_size,
+                                   min(size, (i + 1) * part_size) - 1): i for i in pending}
+            errors = []
+            for future, index in futures.items():
+                try:
+                    future.result()
+                except DownloadError as e:
+                    errors.append(e)
+                    continue
+                with self._lock:
+                    done.add(index)
+                    self._save_state(size, part_size, done)
+            if errors:
+                raise errors[0]
+
+        # Part digests come from the manifest, which is only as trustworthy
+        # as its own sha256 field; the assembled file must match the
+        # published digest. Without part digests the bad part cannot be
+        # singled out, so either way the partial download is discarded.
+        if self.sha256 and _file_sha256(self.partial) != self.sha256:
+            self._discard()
+            raise DownloadError("SHA-256 mismatch; partial download discarded")
+        return self._finish()
+
+    def _probe_size(self) -> Optional[int]:
+        """Total size from a 1-byte Range request, or None without Range support."""
+        try:
+            resp = self._request(0, 0)
+        except _PartRetry as e:
+            raise DownloadError(f"Server unavailable: {e}") from e
+        try:
+            if resp.status_code == 206:
+                match = _CONTENT_RANGE_RE.match(resp.headers.get('Content-Range', ''))
+                if match:
+                    return int(match.group(3))
+            return None
+        finally:
+            resp.close()
+
+    def _request(self, start: int, end: int):
+        """Range GET, swapping in a fresh signed URL once if the current one expired."""
+        for _ in range(2):
+            url, generation = self.url, self._url_generation
+            resp = self.client.get_range(url, start, end)
+            if resp.status_code in (400, 401, 403) and self.refresh:
+                resp.close()
+                self._refresh(generation)
+                continue
+            if resp.status_code == 429 or resp.status_code >= 500:
+                resp.close()
+                raise _PartRetry(f"status {resp.status_code}")
+            if resp.status_code not in (200, 206):
+                resp.close()
+                raise DownloadError(f"Unexpected status {resp.status_code} for bytes {start}-{end}")
+            return resp
+        raise DownloadError("Signed URL rejected after refresh")
+
+    def _refresh(self, generation: int):
+        with self._lock:
+            # Another part already refreshed it
+            if generation != self._url_generation:
+                return
+            self.url = self.refresh().url
+            self._url_generation += 1
+
+    def _fetch_part(self, index: int, start: int, end: int):
+        expected = self.manifest['parts'][index] if self.manifest else None
+        digest = hashlib.sha256()
+        pos = start
+        attempt = 0
+
+        with open(self.partial, 'r+b') as f:
+            while True:
+                try:
+                    if pos <= end:
+                        resp = self._request(pos, end)
+                        try:
+                            if resp.status_code != 206:
+                                raise DownloadError("Server ignored the Range header")
+                            f.seek(pos)
+                            for chunk in resp.iter_content(READ_CHUNK):
+                                chunk = chunk[:end + 1 - pos]
+                                f.write(chunk)
+                                digest.update(chunk)
+                                pos += len(chunk)
+                                self._advance(len(chunk))
+                                if pos > end:
+                                    break
+                        finally:
+                            resp.close()
+                    if pos <= end:
+                        raise OSError(f"connection closed at byte {pos}")
+                    if expected and digest.hexdigest() != expected:
+                        # Refetch the whole part
+                        self._advance(start - pos)
+                        pos, digest = start, hashlib.sha256()
+                        raise _PartRetry(f"part {index} failed verification")
+                    return
+                except (_PartRetry, *self._stream_errors) as e:
+                    # Keep what arrived: the next request starts at pos
+                    error = e
+                attempt += 1
+                if attempt >= self.client.part_attempts:
+                    raise DownloadError(f"part {index} failed after {attempt} attempts: {error}")
+                time.sleep(backoff_delay(attempt - 1, self.client.backoff))
+
+    def _advance(self, n: int):
+        with self._lock:
+            self.done_bytes += n
+        self._report()
+
+    def _report(self):
+        if self.progress:
+            self.progress(self.done_bytes, self.size or 0)
+
+    def _single_stream(self) -> Path:
+        """Server without Range support: one plain GET, verified at the end."""
+        resp = self.client._transport.get(self.url, stream=True)
+        try:
+            if resp.status_code != 200:
+                raise DownloadError(f"Unexpected status {resp.status_code}")
+            digest = hashlib.sha256()
+            with open(self.partial, 'wb') as f:
+                for chunk in resp.iter_content(READ_CHUNK):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    self._advance(len(chunk))
+        except self._stream_errors as e:
+            raise DownloadError(f"Download interrupted: {e}") from e
+        finally:
+            resp.close()
+        if self.sha256 and digest.hexdigest() != self.sha256:
+            self._discard()
+            raise DownloadError("SHA-256 mismatch")
+        return self._finish()
+
+    def _finish(self) -> Path:
+        os.replace(self.partial, self.dest)
+        self.state_path.unlink(missing_ok=True)
+        return self.dest
+
+    def _discard(self):
+        self.partial.unlink(missing_ok=True)
+        self.state_path.unlink(missing_ok=True)
+
+
+# ============================================================================
+# Download links (service role)
+# ============================================================================
+
+# HTTP status the download function answers each refused claim with
+CLAIM_HTTP_STATUS = {'invalid': 401, 'expired': 410, 'limit_reached': 429}
+
+
+@dataclass
+class DownloadClaim:
+    """Result of claim_download()."""
+    status: str
+    yacht_id: Optional[str] = None
+    yacht_name: Optional[str] = None
+    dmg_sha256: Optional[str] = None
+    download_count: Optional[int] = None
+    max_downloads: Optional[int] = None
+    expires_at: Optional[str] = None
+
+    @property
+    def granted(self) -> bool:
+        """True for a counted download or a resume."""
+        return self.status in ('ok', 'resumed')
+
+
+class DownloadLinks:
+    """Issue download links and claim downloads (service-role key)."""
+
+    def __init__(self, api_endpoint: str, service_key: str, timeout: float = 30, pool_size: int = 10):
+        """
+        Initialize client.
+
+        Args:
+            api_endpoint: Supabase project URL
+            service_key: Service-role key (download_links is not readable by anon)
+            timeout: Read timeout in seconds
+            pool_size: Keep-alive connections
+        """
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self._transport = Transport(headers={
+            'apikey': service_key,
+            'Authorization': f'Bearer {service_key}',
+            'Content-Type': 'application/json',
+        }, timeout=(5, timeout), pool_size=pool_size)
+
+    def _rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        resp = self._transport.post(f"{self.api_endpoint}/rest/v1/rpc/{function}", json=params)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{function} failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def create(self, yacht_id: str, expires_days: int = 7, max_downloads: int = 3) -> Dict[str, Any]:
+        """
+        Issue a download link (generate_download_token()).
+
+        Returns:
+            {'token', 'token_hash', 'download_link', 'expires_at'}
+
+        Raises:
+            RuntimeError: On a non-200 response (e.g. unknown yacht)
+        """
+        rows = self._rpc('generate_download_token', {
+            'p_yacht_id': yacht_id,
+            'p_expires_days': expires_days,
+            'p_max_downloads': max_downloads,
+        })
+        return rows[0]
+
+    def reissue(
+        self,
+        yacht_ids: List[str],
+        expires_days: int = 7,
+        max_downloads: int = 3,
+        mint: Optional[TokenMint] = None,
+        batch_size: int = 1000,
+    ) -> Dict[str, str]:
+        """
+        Issue fresh download links for many yachts (e.g. a fleet-wide release).
+
+        Tokens and their hashes come pre-minted in bulk, and rows go in as
+        multi-row inserts, so cost does not scale with per-link round-trips.
+
+        Args:
+            yacht_ids: Yachts to issue links for
+            expires_days: Link lifetime
+            max_downloads: Downloads per link
+            mint: Token pool to draw from (default: mint exactly what is needed)
+            batch_size: Rows per insert
+
+        Returns:
+            {yacht_id: download link}
+
+        Raises:
+            RuntimeError: On a non-2xx response
+        """
+        minted = mint.take_many(len(yacht_ids)) if mint else mint_tokens(len(yacht_ids))
+        expires_at = (datetime.now(timezone.utc) + timedelta(days=expires_days)).isoformat()
+        rows = [{
+            'yacht_id': yacht_id,
+            'token_hash': token_hash,
+            'expires_at': expires_at,
+            'max_downloads': max_downloads,
+            'is_activation_link': False,
+        } for yacht_id, (_, token_hash) in zip(yacht_ids, minted)]
+
+        for i in range(0, len(rows), batch_size):
+            resp = self._transport.post(
+                f"{self.api_endpoint}/rest/v1/download_links",
+                json=rows[i:i + batch_size],
+                headers={'Prefer': 'return=minimal'},
+            )
+            if resp.status_code >= 300:
+                raise RuntimeError(f"download_links insert failed: {resp.status_code} {resp.text[:300]}")
+
+        base = f"{self.api_endpoint}/functions/v1/download?token="
+        return {yacht_id: base + token for yacht_id, (token, _) in zip(yacht_ids, minted)}
+
+    def claim(self, token: str, ip_address: Optional[str] = None, resume: bool = False) -> DownloadClaim:
+        """
+        Validate a token and count a download in one atomic call.
+
+        Args:
+            token: Token from the download link
+            ip_address: Client IP to record
+            resume: Continue the last counted download within 24 h instead
+                of counting a new one
+
+        Returns:
+            DownloadClaim; status 'ok' or 'resumed' grants the download,
+            'invalid' / 'expired' / 'limit_reached' refuse it
+
+        Raises:
+            RuntimeError: On a non-200 response
+        """
+        rows = self._rpc('claim_download', {
+            'p_token_hash': hashlib.sha256(token.encode('utf-8')).hexdigest(),
+            'p_ip_address': ip_address,
+            'p_resume': resume,
+        })
+        row = rows[0] if rows else {'status': 'invalid'}
+        return DownloadClaim(
+            status=row['status'],
+            yacht_id=row.get('yacht_id'),
+            yacht_name=row.get('yacht_name'),
+            dmg_sha256=row.get('dmg_sha256'),
+            download_count=row.get('download_count'),
+            max_downloads=row.get('max_downloads'),
+            expires_at=row.get('expires_at'),
+        )
+
+    def close(self):
+        self._transport.close()
+
+
+# ============================================================================
+# Caching proxy
+# ============================================================================
+
+class DownloadCacheProxy:
+    """
+    LAN cache for release downloads.
+
+        HEAD /fetch?sha256=…&url=…[&parts_url=…]   cache the release (blocks
+                                                   until cached and verified)
+        GET  /fetch?sha256=…&url=…                 serve it (Range supported)
+
+    Releases are stored as <cache_dir>/<sha256> only after the digest
+    checks out, so a cached file is always complete. Upstream URLs are
+    restricted to allowed_hosts so the proxy cannot be used to fetch
+    arbitrary sites. Least-recently-served releases are evicted past
+    max_bytes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        allowed_hosts: Iterable[str],
+        host: str = '0.0.0.0',
+        port: int = 8788,
+        max_bytes: Optional[int] = None,
+        client: Optional[DownloadClient] = None,
+    ):
+        """
+        Initialize proxy (call start() or use as a context manager).
+
+        Args:
+            cache_dir: Directory for cached releases
+            allowed_hosts: Upstream hostnames the proxy may fetch from
+            host: Bind address
+            port: Bind port (0 = ephemeral)
+            max_bytes: Evict least recently served releases beyond this
+            client: Downloader used to fill the cache
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.allowed_hosts = {h.lower() for h in allowed_hosts}
+        self.max_bytes = max_bytes
+        self.client = client or DownloadClient(segments=8)
+        self.hits = 0
+        self.fills = 0
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+        self._server = _ProxyServer((host, port), _ProxyHandler)
+        self._server.proxy = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}"
+
+    def start(self) -> 'DownloadCacheProxy':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'DownloadCacheProxy':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def ensure(self, sha256: str, url: str, parts_url: Optional[str] = None) -> Path:
+        """
+        Path of the cached release, fetching it first if needed.
+
+        Raises:
+            ValueError: Bad digest or upstream host not allowed
+            DownloadError: Upstream fetch failed or did not verify
+        """
+        if not _SHA256_RE.match(sha256):
+            raise ValueError("sha256 must be 64 lower-case hex characters")
+        for upstream in filter(None, (url, parts_url)):
+            if (urlsplit(upstream).hostname or '').lower() not in self.allowed_hosts:
+                raise ValueError(f"Upstream host not allowed: {urlsplit(upstream).hostname}")
+
+        path = self.cache_dir / sha256
+        if path.exists():
+            self.hits += 1
+            return path
+
+        with self._locks_guard:
+            lock = self._locks.setdefault(sha256, threading.Lock())
+        with lock:
+            if path.exists():
+                self.hits += 1
+                return path
+            fill_dir = self.cache_dir / '.filling'
+            fill_dir.mkdir(exist_ok=True)
+            self.client.fetch(DownloadTicket(url, sha256, parts_url), fill_dir / sha256)
+            os.replace(fill_dir / sha256, path)
+            self.fills += 1
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: Path):
+        if self.max_bytes is None:
+            return
+        files = [p for p in self.cache_dir.iterdir() if p.is_file() and _SHA256_RE.match(p.name)]
+        total = sum(p.stat().st_size for p in files)
+        for p in sorted(files, key=lambda p: p.stat().st_atime):
+            if total <= self.max_bytes:
+                break
+            if p != keep:
+                total -= p.stat().st_size
+                p.unlink(missing_ok=True)
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: '_ProxyServer'
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body: bool):
+        parts = urlsplit(self.path)
+        if parts.path != '/fetch':
+            return self._status(404, 'Not found')
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if 'sha256' not in query or 'url' not in query:
+            return self._status(400, 'sha256 and url are required')
+
+        try:
+            path = self.server.proxy.ensure(query['sha256'], query['url'], query.get('parts_url'))
+        except ValueError as e:
+            return self._status(403, str(e))
+        except DownloadError as e:
+            return self._status(502, str(e))
+
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        status = 200
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range', ''))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', f'"{query["sha256"]}"')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if not send_body:
+            return
+
+        os.utime(path)  # recency for eviction
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                chunk = f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def _status(self, status: int, message: str):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    proxy: DownloadCacheProxy
+
+
+def main():
+    """CLI entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CelesteOS resumable downloads")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    f = sub.add_parser('fetch', help='Download a release from a download link')
+    f.add_argument('link', help='Download link from the purchase email')
+    f.add_argument('-o', '--output', required=True, help='Destination file')
+    f.add_argument('--segments', type=int, default=4, help='Parallel Range requests')
+    f.add_argument('--proxy', help='Fetch through a DownloadCacheProxy')
+
+    m = sub.add_parser('manifest', help='Write <file>.parts.json for a release')
+    m.add_argument('file')
+    m.add_argument('--part-size', type=int, default=DEFAULT_PART_SIZE)
+
+    c = sub.add_parser('serve-cache', help='Run a LAN caching proxy')
+    c.add_argument('--dir', required=True, help='Cache directory')
+    c.add_argument('--allow-host', action='append', required=True, help='Allowed upstream host')
+    c.add_argument('--host', default='0.0.0.0')
+    c.add_argument('--port', type=int, default=8788)
+    c.add_argument('--max-gb', type=float, help='Evict beyond this many GB')
+
+    args = parser.parse_args()
+
+    if args.command == 'manifest':
+        path = Path(args.file)
+        manifest = build_part_manifest(path, args.part_size)
+        out = path.with_name(path.name + '.parts.json')
+        out.write_text(json.dumps(manifest))
+        print(f"✓ {out} ({len(manifest['parts'])} parts, sha256 {manifest['sha256'][:16]}...)")
+
+    elif args.command == 'fetch':
+        client = DownloadClient(segments=args.segments, cache_proxy=args.proxy)
+        last = [0.0]
+
+        def progress(done: int, total: int):
+            now = time.monotonic()
+            if total and now - last[0] >= 1:
+                last[0] = now
+                print(f"  {done / 1e6:.1f} / {total / 1e6:.1f} MB", flush=True)
+
+        try:
+            path = client.download(args.link, Path(args.output), progress=progress)
+        except DownloadError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            print("  Run the same command again to resume.", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            client.close()
+        print(f"✓ Downloaded and verified {path}")
+
+    elif args.command == 'serve-cache':
+        max_bytes = int(args.max_gb * 1e9) if args.max_gb else None
+        proxy = DownloadCacheProxy(Path(args.dir), args.allow_host, args.host, args.port, max_bytes)
+        print(f"Download cache listening on {args.host}:{args.port} (Ctrl-C to stop)")
+        try:
+            proxy.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            proxy.client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+CelesteOS Batched Event Writer
+==============================
+Agent-side counterpart of EventBuffer in supabase/functions/_shared/db.ts.
+
+write() only queues the row; a background thread sends queued rows as one
+multi-row insert when a batch fills or flush_interval seconds after the
+first queued row. High and critical rows wake the writer immediately.
+
+Under overload (queue past high_water) low-severity rows are sampled at
+sample_rate; at max_buffered only high and critical rows are accepted.
+Pending rows are flushed by close(), which also runs at interpreter exit.
+
+Failed inserts: one bad row (e.g. a yacht_id that is not in
+fleet_registry) fails the whole multi-row insert, so a failed batch is
+retried row by row to isolate it. High and critical rows that still fail
+are retried with exponential backoff up to max_attempts; rows that are
+rejected outright or run out of attempts are dead-lettered (counted and
+handed to on_dead_letter) instead of being retried forever.
+
+Usage:
+    writer = BatchedEventWriter(postgrest_sink(endpoint, key, 'audit_log'))
+    writer.write({'yacht_id': 'Y1', 'action': 'agent_started'})
+    writer.write({...}, severity='high')
+"""
+
+import time
+import random
+import atexit
+import threading
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional, Deque, Tuple
+
+from .transport import Transport, TransportError
+
+
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+Row = Dict[str, Any]
+Sink = Callable[[List[Row]], None]
+# (row, severity rank, failed attempts)
+_Item = Tuple[Row, int, int]
+
+
+class EventRejected(TransportError):
+    """The database refused the rows themselves (4xx); retrying cannot help."""
+
+
+def postgrest_sink(api_endpoint: str, api_key: str, table: str, timeout: float = 10) -> Sink:
+    """
+    Sink that inserts a batch with one PostgREST request.
+
+    Args:
+        api_endpoint: Supabase project URL
+        api_key: Key allowed to insert into the table
+        table: Target table (audit_log, security_events, ...)
+
+    Raises (from the returned sink):
+        EventRejected: On a 4xx response (e.g. a foreign key violation)
+        TransportError: On network failure or another non-2xx response
+    """
+    transport = Transport(headers={
+        'apikey': api_key,
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json',
+        'Prefer': 'return=minimal',
+    })
+    url = f"{api_endpoint.rstrip('/')}/rest/v1/{table}"
+
+    def sink(rows: List[Row]):
+        resp = transport.post(url, json=rows, timeout=timeout)
+        if 400 <= resp.status_code < 500:
+            raise EventRejected(f"{table} insert rejected: {resp.status_code} {resp.text[:200]}")
+        if resp.status_code >= 300:
+            raise TransportError(f"{table} insert failed: {resp.status_code} {resp.text[:200]}")
+    return sink
+
+
+class BatchedEventWriter:
+    """Non-blocking, batching writer for append-only event rows."""
+
+    # Consecutive non-rejection failures while isolating a failed batch
+    # that mean the sink is down rather than one row being bad
+    ISOLATION_FAILURES = 3
+
+    def __init__(
+        self,
+        sink: Sink,
+        max_batch: int = 100,
+        flush_interval: float = 1.0,
+        high_water: int = 500,
+        max_buffered: int = 2000,
+        sample_rate: float = 0.1,
+        max_attempts: int = 5,
+        retry_backoff: float = 1.0,
+        max_retry_backoff: float = 60.0,
+        on_dead_letter: Optional[Callable[[Row, Exception], None]] = None,
+    ):
+        """
+        Initialize writer and start its background thread.
+
+        Args:
+            sink: Callable that persists a list of rows (raises on failure)
+            max_batch: Rows per insert
+            flush_interval: Seconds a row may wait before being written
+            high_water: Queue length above which low rows are sampled
+            max_buffered: Queue length above which only high/critical rows are kept
+            sample_rate: Fraction of low rows kept above high_water
+            max_attempts: Writes tried for a high/critical row before it is
+                dead-lettered (low and medium rows get one)
+            retry_backoff: Delay before the first retry, doubling per attempt
+            max_retry_backoff: Cap on the retry delay
+            on_dead_letter: Called with (row, error) for every row given up on
+        """
+        self.sink = sink
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.high_water = high_water
+        self.max_buffered = max_buffered
+        self.sample_rate = sample_rate
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.on_dead_letter = on_dead_letter
+
+        self._queue: Deque[_Item] = deque()
+        # (due, item) for rows waiting out their backoff
+        self._retry: List[Tuple[float, _Item]] = []
+        self._cond = threading.Condition()
+        self._urgent = False
+        self._closed = False
+        self._first_queued: Optional[float] = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+        self.written = 0
+        self.dropped = 0
+        self.sampled = 0
+        self.failed_batches = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+        self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, row: Row, severity: str = 'low') -> bool:
+        """
+        Queue a row.
+
+        Returns:
+            False if the row was dropped or sampled out under overload
+        """
+        rank = SEVERITY_RANK.get(severity, 0)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchedEventWriter is closed")
+            queued = len(self._queue)
+            if queued >= self.max_buffered and rank < SEVERITY_RANK['high']:
+                self.dropped += 1
+                return False
+            if queued >= self.high_water and rank == 0 and random.random() >= self.sample_rate:
+                self.sampled += 1
+                return False
+
+            self._queue.append((row, rank, 0))
+            self._idle.clear()
+            if self._first_queued is None:
+                self._first_queued = time.monotonic()
+            if len(self._queue) >= self.max_batch or rank >= SEVERITY_RANK['high']:
+                self._urgent = True
+            self._cond.notify()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue) + len(self._retry)
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Ask the writer to send everything queued and wait for it.
+
+        Returns:
+            True if the queue drained within timeout
+        """
+        with self._cond:
+            self._urgent = True
+            self._cond.notify()
+        return self._idle.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Flush pending rows and stop the background thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': self.pending,
+            'written': self.written,
+            'dropped': self.dropped,
+            'sampled': self.sampled,
+            'failed_batches': self.failed_batches,
+            'retried': self.retried,
+            'dead_lettered': self.dead_lettered,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self._urgent or self._closed or self._due() or self._retry_due()):
+                    self._cond.wait(self._next_wakeup())
+
+                closing = self._closed
+                self._requeue_retries(closing)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+                # Once woken, drain the whole queue batch by batch
+                if not self._queue:
+                    self._urgent = False
+                    self._first_queued = None
+
+            if batch:
+                self._send(batch)
+
+            with self._cond:
+                if not self._queue and not self._retry:
+                    self._idle.set()
+                    if closing:
+                        return
+                elif closing and not batch:
+                    return
+
+    def _due(self) -> bool:
+        return (self._first_queued is not None
+                and time.monotonic() - self._first_queued >= self.flush_interval)
+
+    def _retry_due(self) -> bool:
+        return bool(self._retry) and self._retry[0][0] <= time.monotonic()
+
+    def _next_wakeup(self) -> Optional[float]:
+        # Called with the lock held
+        wakeups = []
+        if self._first_queued is not None:
+            wakeups.append(self._first_queued + self.flush_interval)
+        if self._retry:
+            wakeups.append(self._retry[0][0])
+        if not wakeups:
+            return None
+        return max(0.0, min(wakeups) - time.monotonic())
+
+    def _requeue_retries(self, everything: bool):
+        # Called with the lock held; rows whose backoff is over go first
+        now = time.monotonic()
+        due = [item for at, item in self._retry if everything or at <= now]
+        if due:
+            self._retry = [(at, item) for at, item in self._retry if not (everything or at <= now)]
+            self._queue.extendleft(reversed(due))
+
+    def _send(self, batch: List[_Item]):
+        try:
+            self.sink([row for row, _, _ in batch])
+            self.written += len(batch)
+            return
+        except Exception as exc:
+            self.failed_batches += 1
+            error = exc
+
+        if len(batch) == 1:
+            self._failed(batch[0], error)
+            return
+
+        # One bad row fails the whole insert: retry row by row to isolate it.
+        # Repeated failures that are not rejections mean the sink is down, so
+        # stop there and treat the rest of the batch as failed.
+        streak = 0
+        for i, item in enumerate(batch):
+            if streak >= self.ISOLATION_FAILURES:
+                for rest in batch[i:]:
+                    self._failed(rest, error)
+                return
+            try:
+                self.sink([item[0]])
+                self.written += 1
+                streak = 0
+            except EventRejected as exc:
+                self._failed(item, exc, retryable=False)
+            except Exception as exc:
+                streak += 1
+                error = exc
+                self._failed(item, exc)
+
+    def _failed(self, item: _Item, error: Exception, retryable: bool = True):
+        row, rank, attempts = item
+        attempts += 1
+        if (retryable and rank >= SEVERITY_RANK['high']
+                and attempts < self.max_attempts and not self._closed):
+            delay = min(self.retry_backoff * 2 ** (attempts - 1), self.max_retry_backoff)
+            with self._cond:
+                self._retry.append((time.monotonic() + delay, (row, rank, attempts)))
+                self._retry.sort(key=lambda entry: entry[0])
+                self.retried += 1
+            return
+        self.dead_lettered += 1
+        if self.on_dead_letter is not None:
+            try:
+                self.on_dead_letter(row, error)
+            except Exception:
+                pass
@@ -0,0 +1,101 @@
+"""
+CelesteOS Installation Events
+=============================
+Structured event stream for the installation lifecycle.
+
+InstallationOrchestrator emits an InstallEvent for every phase boundary and
+state transition. Consumers subscribe callbacks:
+- headless mode writes them to stdout as JSON lines (one object per line)
+- the GUI maps them onto InstallProgress updates
+- CI harnesses parse the JSON lines to assert on phase timings
+
+Event types:
+    phase_start   A phase began (initialize, register, activation, verify)
+    phase_end     A phase finished; carries duration and result
+    phase_error   A phase raised; carries duration and the error
+    state         State machine transition; carries from/to states
+    poll          One activation poll; carries elapsed seconds
+    result        Installation finished; carries success and total duration
+
+Emitting with no subscribers is a single attribute check, so hundreds of
+orchestrators per host cost nothing unless someone is listening.
+"""
+
+import sys
+import json
+import time
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, Callable, List, TextIO
+
+
+@dataclass(frozen=True)
+class InstallEvent:
+    """One installation lifecycle event."""
+    event: str
+    state: str
+    yacht_id: str
+    phase: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    message: str = ""
+    details: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Dict form, omitting empty optional fields."""
+        data = asdict(self)
+        return {k: v for k, v in data.items() if v not in (None, "", {})}
+
+    def to_json(self) -> str:
+        """Single-line JSON encoding."""
+        return json.dumps(self.as_dict(), separators=(',', ':'), default=str)
+
+
+EventCallback = Callable[[InstallEvent], None]
+
+
+class InstallEventStream:
+    """Fan-out of InstallEvents to subscribers."""
+
+    def __init__(self):
+        self._subscribers: List[EventCallback] = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """True if anyone is subscribed (emitters skip work otherwise)."""
+        return bool(self._subscribers)
+
+    def subscribe(self, callback: EventCallback) -> Callable[[], None]:
+        """
+        Register a callback.
+
+        Returns:
+            Function that removes the subscription
+        """
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not callback]
+        return unsubscribe
+
+    def emit(self, event: InstallEvent):
+        """Deliver an event to every subscriber (copy-on-write, lock-free read)."""
+        for callback in self._subscribers:
+            callback(event)
+
+
+class JsonLinesWriter:
+    """Subscriber that writes each event as one JSON line."""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def __call__(self, event: InstallEvent):
+        line = event.to_json() + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
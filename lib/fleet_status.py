@@ -0,0 +1,126 @@
+"""
+CelesteOS Fleet Status
+======================
+Read helper for the precomputed fleet_status table
+(supabase/migrations/20251129_fleet_status.sql).
+
+Every call is a single indexed read of fleet_status (or the
+fleet_status_summary() RPC); nothing here aggregates fleet_registry,
+download_links or audit_log.
+
+Usage:
+    fleet = FleetStatusClient(SUPABASE_URL, SERVICE_ROLE_KEY)
+    fleet.summary()                     # yachts per status
+    fleet.get('YACHT_001')
+    fleet.list(status='pending_activation')
+    fleet.unverified_since(hours=24)    # operational, no recent verify
+    fleet.with_security_events()
+"""
+
+import time
+from typing import Optional, Dict, Any, List
+
+from .transport import Transport
+
+
+STATUSES = ('unregistered', 'pending_activation', 'activated', 'operational')
+
+
+class FleetStatusClient:
+    """Queries fleet_status through PostgREST (service-role key)."""
+
+    def __init__(self, api_endpoint: str, service_key: str, timeout: float = 30):
+        """
+        Initialize client.
+
+        Args:
+            api_endpoint: Supabase project URL
+            service_key: Service-role key (fleet_status is not readable by anon)
+            timeout: Read timeout in seconds
+        """
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self._transport = Transport(headers={
+            'apikey': service_key,
+            'Authorization': f'Bearer {service_key}',
+            'Content-Type': 'application/json',
+        }, timeout=(5, timeout))
+
+    def _select(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        resp = self._transport.get(f"{self.api_endpoint}/rest/v1/fleet_status", params=params)
+        if resp.status_code != 200:
+            raise RuntimeError(f"fleet_status query failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def get(self, yacht_id: str) -> Optional[Dict[str, Any]]:
+        """Status row for one yacht, or None."""
+        rows = self._select({'yacht_id': f'eq.{yacht_id}', 'select': '*'})
+        return rows[0] if rows else None
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        order: str = 'yacht_id.asc',
+    ) -> List[Dict[str, Any]]:
+        """
+        Page through yachts, optionally filtered by status.
+
+        Raises:
+            ValueError: If status is not a known status
+        """
+        params = {'select': '*', 'order': order, 'limit': str(limit), 'offset': str(offset)}
+        if status is not None:
+            if status not in STATUSES:
+                raise ValueError(f"Unknown status: {status}")
+            params['status'] = f'eq.{status}'
+        return self._select(params)
+
+    def unverified_since(self, hours: float = 24, limit: int = 100) -> List[Dict[str, Any]]:
+        """Operational yachts with no successful verification in `hours`."""
+        cutoff = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - hours * 3600))
+        return self._select({
+            'select': '*',
+            'status': 'eq.operational',
+            'or': f'(last_verified_at.is.null,last_verified_at.lt.{cutoff})',
+            'order': 'last_verified_at.asc.nullsfirst',
+            'limit': str(limit),
+        })
+
+    def with_security_events(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Yachts with unresolved security events, most first."""
+        return self._select({
+            'select': '*',
+            'open_security_events': 'gt.0',
+            'order': 'open_security_events.desc',
+            'limit': str(limit),
+        })
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Yacht counts per status.
+
+        Returns:
+            {'statuses': {status: {'yachts': n, 'with_open_security_events': m}},
+             'total': n, 'last_refresh_at': iso-timestamp or None}
+        """
+        resp = self._transport.post(f"{self.api_endpoint}/rest/v1/rpc/fleet_status_summary", json={})
+        if resp.status_code != 200:
+            raise RuntimeError(f"fleet_status_summary failed: {resp.status_code} {resp.text[:300]}")
+
+        rows = resp.json() or []
+        statuses = {
+            row['status']: {
+                'yachts': row['yachts'],
+                'with_open_security_events': row['with_open_security_events'],
+            }
+            for row in rows
+        }
+        return {
+            'statuses': statuses,
+            'total': sum(s['yachts'] for s in statuses.values()),
+            'last_refresh_at': rows[0]['last_refresh_at'] if rows else None,
+        }
+
+    def close(self):
+        self._transport.close()
@@ -0,0 +1,591 @@
+"""
+CelesteOS Indexing Workers
+==========================
+Durable replacement for the synchronous Index_docs webhook call
+(supabase/migrations/20251202_indexing_queue.sql).
+
+Ingestion enqueues one indexing_jobs row per document. Workers lease
+jobs in batches with claim_indexing_jobs() (FOR UPDATE SKIP LOCKED, so
+any number of worker processes share the queue) and run the same
+pipeline Index_docs ran:
+
+    extract (celeste-file-type service) -> chunk (1000 chars, 200 overlap)
+    -> embed (text-embedding-3-small, batched) -> insert (search_document_chunks)
+    -> doc_metadata.indexed = true
+
+A failed job is rescheduled with exponential backoff; after max_attempts
+it moves to indexing_jobs_dead. Every step is idempotent per document, so
+a retried or re-leased job never duplicates chunks.
+
+Usage:
+    export SUPABASE_URL=https://xxx.supabase.co
+    export SUPABASE_SERVICE_ROLE_KEY=...
+    export OPENAI_API_KEY=...
+    python -m lib.indexing work [--concurrency 4] [--batch-size 4]
+    python -m lib.indexing metrics
+    python -m lib.indexing retry-dead [--id 17 --id 42]
+"""
+
+import os
+import sys
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List, Callable, Sequence, TYPE_CHECKING
+
+from .instrumentation import span
+from .transport import Transport, TransportError
+
+if TYPE_CHECKING:
+    from .blob_store import BlobStore
+
+
+EXTRACT_URL = 'https://celeste-file-type.onrender.com/extract'
+EMBEDDING_URL = 'https://api.openai.com/v1/embeddings'
+EMBEDDING_MODEL = 'text-embedding-3-small'
+
+Job = Dict[str, Any]
+
+
+def split_text(
+    text: str,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    separators: Sequence[str] = ('\n\n', '\n', ' ', ''),
+) -> List[str]:
+    """
+    Recursive character splitting, as the Index_docs Text Splitter node did.
+
+    Splits on the coarsest separator that yields pieces under chunk_size,
+    recursing into oversized pieces with the next separator, then merges
+    neighbouring pieces into chunks of at most chunk_size characters with
+    up to `overlap` characters carried over between chunks.
+    """
+    sep = separators[-1]
+    rest: Sequence[str] = ()
+    for i, candidate in enumerate(separators):
+        if candidate == '' or candidate in text:
+            sep, rest = candidate, separators[i + 1:]
+            break
+
+    pieces = text.split(sep) if sep else list(text)
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+
+    def flush():
+        joined = sep.join(current).strip()
+        if joined:
+            chunks.append(joined)
+
+    for piece in pieces:
+        if len(piece) > chunk_size:
+            if current:
+                flush()
+                current, length = [], 0
+            chunks.extend(split_text(piece, chunk_size, overlap, rest) if rest else [piece])
+            continue
+
+        extra = len(piece) + (len(sep) if current else 0)
+        if current and length + extra > chunk_size:
+            flush()
+            # Carry trailing pieces forward as overlap
+            while current and (length > overlap or length + len(piece) + len(sep) > chunk_size):
+                length -= len(current.pop(0)) + (len(sep) if current else 0)
+            extra = len(piece) + (len(sep) if current else 0)
+        current.append(piece)
+        length += extra
+
+    if current:
+        flush()
+    return chunks
+
+
+class IndexingQueue:
+    """indexing_jobs queue over PostgREST RPC (service-role key)."""
+
+    def __init__(self, api_endpoint: str, service_key: str, timeout: float = 30):
+        """
+        Initialize client.
+
+        Args:
+            api_endpoint: Supabase project URL
+            service_key: Service-role key (queue functions are not granted to anon)
+            timeout: Read timeout in seconds
+        """
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self._transport = Transport(headers={
+            'apikey': service_key,
+            'Authorization': f'Bearer {service_key}',
+            'Content-Type': 'application/json',
+        }, timeout=(5, timeout))
+
+    def _rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        resp = self._transport.post(f"{self.api_endpoint}/rest/v1/rpc/{function}", json=params)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{function} failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def enqueue(self, jobs: List[Job], max_attempts: int = 5) -> int:
+        """
+        Queue documents for indexing with one call.
+
+        Args:
+            jobs: [{'document_id', 'yacht_id', 'storage_path', 'sha256'?, 'payload'?}]
+                payload carries filename, content_type, doc_type, system_tag
+            max_attempts: Attempts before a job is dead-lettered
+
+        Returns:
+            Jobs queued (documents already pending are skipped)
+        """
+        if not jobs:
+            return 0
+        return int(self._rpc('enqueue_indexing_jobs', {
+            'p_jobs': jobs, 'p_max_attempts': max_attempts,
+        }) or 0)
+
+    def claim(self, worker: str, limit: int, lease_seconds: int = 600) -> List[Job]:
+        """Lease up to `limit` jobs to `worker`."""
+        return self._rpc('claim_indexing_jobs', {
+            'p_worker': worker, 'p_limit': limit, 'p_lease_seconds': lease_seconds,
+        }) or []
+
+    def complete(self, ids: List[int], worker: str) -> int:
+        """Mark leased jobs done; returns how many this worker still held."""
+        if not ids:
+            return 0
+        return int(self._rpc('complete_indexing_jobs', {'p_ids': ids, 'p_worker': worker}) or 0)
+
+    def fail(self, job_id: int, worker: str, error: str, base_delay: int = 30) -> Optional[str]:
+        """
+        Record a failed attempt.
+
+        Returns:
+            'retry' (rescheduled with backoff), 'dead' (dead-lettered), or
+            None if the lease was lost
+        """
+        return self._rpc('fail_indexing_job', {
+            'p_id': job_id, 'p_worker': worker, 'p_error': error,
+            'p_base_delay_seconds': base_delay,
+        })
+
+    def retry_dead(self, ids: Optional[List[int]] = None) -> int:
+        """Requeue dead-lettered jobs (all when ids is None)."""
+        return int(self._rpc('retry_dead_indexing_jobs', {'p_ids': ids}) or 0)
+
+    def dead(self, limit: int = 50) -> List[Job]:
+        """Most recently dead-lettered jobs."""
+        resp = self._transport.get(f"{self.api_endpoint}/rest/v1/indexing_jobs_dead", params={
+            'select': 'id,yacht_id,storage_path,attempts,last_error,died_at',
+            'order': 'died_at.desc',
+            'limit': str(limit),
+        })
+        if resp.status_code != 200:
+            raise RuntimeError(f"indexing_jobs_dead query failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def metrics(self, lease_seconds: int = 600) -> Dict[str, Any]:
+        """
+        Queue depth and lag.
+
+        Args:
+            lease_seconds: Lease the workers claim with; running jobs held
+                longer count as expired_leases
+
+        Returns:
+            {'ready', 'scheduled', 'running', 'expired_leases', 'dead',
+             'done_last_hour', 'failed_attempts_last_hour', 'lag_seconds',
+             'avg_wait_seconds_last_hour', 'avg_run_seconds_last_hour'}
+        """
+        rows = self._rpc('indexing_queue_metrics', {'p_lease_seconds': lease_seconds}) or []
+        return rows[0] if rows else {}
+
+    def close(self):
+        self._transport.close()
+
+
+class DocumentIndexer:
+    """Runs one indexing job: extract -> chunk -> embed -> insert."""
+
+    def __init__(
+        self,
+        api_endpoint: str,
+        service_key: str,
+        openai_api_key: str,
+        extract_url: str = EXTRACT_URL,
+        chunk_size: int = 1000,
+        overlap: int = 200,
+        embed_batch: int = 96,
+        blob_store: Optional['BlobStore'] = None,
+        pool_size: int = 10,
+    ):
+        """
+        Initialize indexer.
+
+        Args:
+            api_endpoint: Supabase project URL
+            service_key: Service-role key
+            openai_api_key: Key for the embeddings API
+            extract_url: Text extraction service
+            chunk_size: Characters per chunk
+            overlap: Characters shared by consecutive chunks
+            embed_batch: Chunks per embeddings request
+            blob_store: When set, jobs carrying a sha256 store their chunks
+                once per blob (lib.blob_store) instead of per document
+            pool_size: Keep-alive connections per service (match worker concurrency)
+        """
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self.extract_url = extract_url
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.embed_batch = embed_batch
+        self.blob_store = blob_store
+
+        self._db = Transport(headers={
+            'apikey': service_key,
+            'Authorization': f'Bearer {service_key}',
+            'Content-Type': 'application/json',
+        }, timeout=(5, 60), pool_size=pool_size)
+        # Extraction of a large PDF can take minutes (Index_docs allowed 120 s)
+        self._extract = Transport(headers={'Content-Type': 'application/json'},
+                                  timeout=(5, 180), pool_size=pool_size)
+        self._openai = Transport(headers={
+            'Authorization': f'Bearer {openai_api_key}',
+            'Content-Type': 'application/json',
+        }, timeout=(5, 60), pool_size=pool_size)
+
+    def __call__(self, job: Job) -> int:
+        """
+        Index one job.
+
+        Returns:
+            Number of chunks stored
+
+        Raises:
+            RuntimeError, TransportError: On any failed step (the job is retried)
+        """
+        # Fail before paying for extraction and embeddings
+        self._require_blob_store(job)
+        with span('indexing.extract'):
+            text = self.extract(job)
+        with span('indexing.chunk'):
+            chunks = split_text(text, self.chunk_size, self.overlap)
+        with span('indexing.embed', chunks=len(chunks)):
+            embeddings = self.embed(chunks)
+        with span('indexing.insert', chunks=len(chunks)):
+            self.store(job, chunks, embeddings)
+        return len(chunks)
+
+    def extract(self, job: Job) -> str:
+        """Document text from the extraction service."""
+        payload = job.get('payload') or {}
+        resp = self._extract.post(self.extract_url, json={
+            'storage_path': job['storage_path'],
+            'content_type': payload.get('content_type'),
+            'filename': payload.get('filename'),
+            'yacht_id': job['yacht_id'],
+            'document_id': job.get('document_id'),
+            'doc_type': payload.get('doc_type'),
+            'system_tag': payload.get('system_tag'),
+        })
+        if resp.status_code != 200:
+            raise RuntimeError(f"extract: {resp.status_code} {resp.text[:200]}")
+        return resp.json().get('text') or ''
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings for `texts`, embed_batch inputs per request."""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.embed_batch):
+            batch = texts[start:start + self.embed_batch]
+            resp = self._openai.post(EMBEDDING_URL, json={'model': EMBEDDING_MODEL, 'input': batch})
+            if resp.status_code != 200:
+                raise RuntimeError(f"embed: {resp.status_code} {resp.text[:200]}")
+            data = sorted(resp.json()['data'], key=lambda d: d['index'])
+            vectors.extend(d['embedding'] for d in data)
+        return vectors
+
+    def store(self, job: Job, chunks: List[str], embeddings: List[List[float]]):
+        """
+        Replace the document's chunks and mark it indexed.
+
+        Existing chunks for the document are deleted first, so a retried
+        job leaves exactly one copy.
+        """
+        self._require_blob_store(job)
+        payload = job.get('payload') or {}
+        document_id = job.get('document_id')
+
+        if job.get('sha256'):
+            self.blob_store.store_chunks(job['sha256'], [
+                {'chunk_index': i, 'chunk_text': text, 'embedding': vector}
+                for i, (text, vector) in enumerate(zip(chunks, embeddings))
+            ])
+        else:
+            url = f"{self.api_endpoint}/rest/v1/search_document_chunks"
+            if document_id:
+                resp = self._db.request('DELETE', url, params={'metadata->>document_id': f'eq.{document_id}'})
+                if resp.status_code >= 300:
+                    raise RuntimeError(f"insert: clearing old chunks failed: {resp.status_code}")
+            metadata = {
+                'yacht_id': job['yacht_id'],
+                'document_id': document_id,
+                'filename': payload.get('filename'),
+                'content_type': payload.get('content_type'),
+                'doc_type': payload.get('doc_type'),
+                'system_tag': payload.get('system_tag'),
+            }
+            rows = [
+                {'content': text, 'metadata': {**metadata, 'chunk_index': i}, 'embedding': vector}
+                for i, (text, vector) in enumerate(zip(chunks, embeddings))
+            ]
+            if rows:
+                resp = self._db.post(url, json=rows, headers={'Prefer': 'return=minimal'})
+                if resp.status_code >= 300:
+                    raise RuntimeError(f"insert: {resp.status_code} {resp.text[:200]}")
+
+        if document_id:
+            resp = self._db.request(
+                'PATCH', f"{self.api_endpoint}/rest/v1/doc_metadata",
+                params={'id': f'eq.{document_id}'},
+                json={'indexed': True},
+                headers={'Prefer': 'return=minimal'},
+            )
+            if resp.status_code >= 300:
+                raise RuntimeError(f"mark indexed: {resp.status_code} {resp.text[:200]}")
+
+    def _require_blob_store(self, job: Job):
+        """
+        Refuse jobs that belong to the fleet blob store on a worker without one.
+
+        Stored per document they would leave orphan chunks and the blob
+        unindexed, and requeue_unindexed_blobs() would enqueue it again on
+        every ingest. The job is retried, then dead-lettered.
+        """
+        if job.get('sha256') and self.blob_store is None:
+            raise RuntimeError("blob job needs a worker started with --shared-blobs")
+
+    def close(self):
+        self._db.close()
+        self._extract.close()
+        self._openai.close()
+
+
+class IndexingWorkerPool:
+    """Claims jobs in batches and runs them on a thread pool."""
+
+    def __init__(
+        self,
+        queue: IndexingQueue,
+        handler: Callable[[Job], Any],
+        concurrency: int = 4,
+        batch_size: Optional[int] = None,
+        lease_seconds: int = 600,
+        poll_interval: float = 2.0,
+        max_poll_interval: float = 30.0,
+        retry_base_delay: int = 30,
+        worker_id: Optional[str] = None,
+        log: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Initialize pool.
+
+        Args:
+            queue: Queue to claim from
+            handler: Runs one job; raising marks the attempt failed
+            concurrency: Jobs processed at once
+            batch_size: Claim once at least this many slots are free
+                (default: concurrency, i.e. claim a full batch per call)
+            lease_seconds: Lease per claimed job; must exceed the slowest job
+            poll_interval: Delay before polling an empty queue again (doubles
+                up to max_poll_interval while the queue stays empty)
+            retry_base_delay: Backoff base in seconds for failed jobs
+            worker_id: Lease holder name (default: host:pid)
+            log: Receives one line per notable event (claim errors, dead jobs)
+        """
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.batch_size = min(batch_size or concurrency, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.log = log or (lambda line: None)
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.claimed = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+        self.lost = 0
+        self.in_flight = 0
+
+    def stop(self):
+        """Stop claiming; run() returns after in-flight jobs finish."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'worker_id': self.worker_id,
+                'in_flight': self.in_flight,
+                'claimed': self.claimed,
+                'succeeded': self.succeeded,
+                'retried': self.retried,
+                'dead': self.dead,
+                'lost_leases': self.lost,
+            }
+
+    def run(self, stop_when_idle: bool = False):
+        """
+        Process jobs until stop() (or until the queue is empty, if
+        stop_when_idle).
+        """
+        pending: Dict[Future, Job] = {}
+        idle_delay = self.poll_interval
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='indexer') as pool:
+            while True:
+                free = self.concurrency - len(pending)
+                if not self._stop.is_set() and (free >= self.batch_size or not pending):
+                    jobs = self._claim(free)
+                    for job in jobs:
+                        pending[pool.submit(self.handler, job)] = job
+                    with self._lock:
+                        self.claimed += len(jobs)
+                        self.in_flight = len(pending)
+
+                    if jobs:
+                        idle_delay = self.poll_interval
+                    elif not pending:
+                        if stop_when_idle:
+                            break
+                        self._stop.wait(idle_delay)
+                        idle_delay = min(idle_delay * 2, self.max_poll_interval)
+                        continue
+
+                if not pending:
+                    if self._stop.is_set():
+                        break
+                    continue
+
+                done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                self._settle({f: pending.pop(f) for f in done})
+                with self._lock:
+                    self.in_flight = len(pending)
+
+    def _claim(self, limit: int) -> List[Job]:
+        try:
+            return self.queue.claim(self.worker_id, limit, self.lease_seconds)
+        except (RuntimeError, TransportError) as e:
+            self.log(f"claim failed: {e}")
+            return []
+
+    def _settle(self, finished: Dict[Future, Job]):
+        """Report finished jobs: successes in one call, failures one by one."""
+        ok: List[int] = []
+        for future, job in finished.items():
+            error = future.exception()
+            if error is None:
+                ok.append(job['id'])
+                continue
+            try:
+                outcome = self.queue.fail(job['id'], self.worker_id,
+                                          f"{type(error).__name__}: {error}", self.retry_base_delay)
+            except (RuntimeError, TransportError) as e:
+                # The lease expires and the job is retried anyway
+                self.log(f"job {job['id']}: could not record failure: {e}")
+                continue
+            with self._lock:
+                if outcome == 'dead':
+                    self.dead += 1
+                elif outcome == 'retry':
+                    self.retried += 1
+                else:
+                    self.lost += 1
+            if outcome == 'dead':
+                self.log(f"job {job['id']} dead-lettered ({job['storage_path']}): {error}")
+
+        if ok:
+            try:
+                held = self.queue.complete(ok, self.worker_id)
+            except (RuntimeError, TransportError) as e:
+                self.log(f"complete failed for {len(ok)} jobs: {e}")
+                return
+            with self._lock:
+                self.succeeded += held
+                self.lost += len(ok) - held
+
+
+def _env(*names: str) -> List[str]:
+    values = [os.environ.get(name) for name in names]
+    if not all(values):
+        print(f"✗ {', '.join(names)} must be set", file=sys.stderr)
+        sys.exit(2)
+    return values
+
+
+def main():
+    """CLI entry point."""
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(description="CelesteOS indexing queue")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    w = sub.add_parser('work', help='Run an indexing worker pool')
+    w.add_argument('--concurrency', type=int, default=4)
+    w.add_argument('--batch-size', type=int, help='Claim when this many slots are free')
+    w.add_argument('--lease', type=int, default=600, help='Lease seconds per job')
+    w.add_argument('--drain', action='store_true', help='Exit once the queue is empty')
+    w.add_argument('--shared-blobs', action='store_true',
+                   help='Store chunks once per blob for jobs with a sha256')
+
+    m = sub.add_parser('metrics', help='Print queue depth and lag')
+    m.add_argument('--lease', type=int, default=600, help='Lease seconds the workers use')
+
+    r = sub.add_parser('retry-dead', help='Requeue dead-lettered jobs')
+    r.add_argument('--id', type=int, action='append', help='Job id (default: all)')
+
+    args = parser.parse_args()
+    url, key = _env('SUPABASE_URL', 'SUPABASE_SERVICE_ROLE_KEY')
+    queue = IndexingQueue(url, key)
+
+    try:
+        if args.command == 'metrics':
+            for name, value in queue.metrics(args.lease).items():
+                print(f"  {name:<28}{value}")
+
+        elif args.command == 'retry-dead':
+            print(f"✓ {queue.retry_dead(args.id)} jobs requeued")
+
+        elif args.command == 'work':
+            (openai_key,) = _env('OPENAI_API_KEY')
+            blob_store = None
+            if args.shared_blobs:
+                from .blob_store import BlobStore
+                blob_store = BlobStore(url, key)
+            indexer = DocumentIndexer(url, key, openai_key, blob_store=blob_store,
+                                      pool_size=args.concurrency)
+            pool = IndexingWorkerPool(queue, indexer, concurrency=args.concurrency,
+                                      batch_size=args.batch_size, lease_seconds=args.lease,
+                                      log=lambda line: print(f"  {line}", flush=True))
+            signal.signal(signal.SIGTERM, lambda *_: pool.stop())
+            print(f"✓ Worker {pool.worker_id} started (concurrency {args.concurrency})")
+            try:
+                pool.run(stop_when_idle=args.drain)
+            except KeyboardInterrupt:
+                pool.stop()
+            finally:
+                indexer.close()
+                if blob_store is not None:
+                    blob_store.close()
+            print(f"✓ Worker stopped: {pool.stats()}")
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,687 @@
+"""
+CelesteOS NAS Ingestion
+=======================
+Bulk replacement for the one-webhook-per-file Ingestion_Docs workflow.
+
+The workflow paid four round trips per file (duplicate SELECT by filename,
+storage upload, single-row INSERT, indexing webhook), serially. This
+client walks the yacht NAS and works in batches:
+
+1. Hash   - sha256 of each file, streamed, on a thread pool
+2. Dedupe - one doc_metadata_existing_hashes() call per batch
+            (sha256 = ANY(...), see 20251130_doc_metadata_batch_ingest.sql);
+            identical files within the batch are uploaded once
+3. Upload - new files sent to storage concurrently over pooled connections
+4. Insert - one multi-row doc_metadata INSERT per batch
+5. Index  - one enqueue_indexing_jobs() call per batch (lib.indexing
+            workers pick the jobs up), or the index-documents webhook
+            for each inserted row when no queue is given
+
+Rows, storage paths and the indexing payload match what the workflow
+produced, so Index_docs and search are unchanged; sha256 is now filled in.
+
+With a BlobStore (lib.blob_store) uploads are content-addressed across
+the fleet: a manual another yacht already uploaded is only referenced,
+and only blobs new to the fleet are sent for indexing. With an indexing
+queue as well, each run ends by re-enqueueing uploaded blobs that are
+still unindexed (their claimer's enqueue failed or it crashed).
+
+Usage:
+    export SUPABASE_URL=https://xxx.supabase.co
+    export SUPABASE_SERVICE_ROLE_KEY=...
+    python -m lib.ingestion /Volumes/NAS --yacht-id <uuid> [--workers 8] [--dry-run]
+"""
+
+import os
+import sys
+import time
+import hashlib
+import mimetypes
+from itertools import islice
+from urllib.parse import quote
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple, Callable, TYPE_CHECKING
+
+from .instrumentation import span
+from .transport import Transport, TransportError
+
+if TYPE_CHECKING:
+    from .blob_store import BlobStore
+    from .indexing import IndexingQueue
+
+
+INDEX_WEBHOOK = 'https://api.celeste7.ai/webhook/index-documents'
+
+HASH_CHUNK = 1024 * 1024
+
+
+@dataclass
+class NasFile:
+    """One file found on the NAS."""
+    local_path: str
+    filename: str
+    directories: List[str]
+    size_bytes: int
+    content_type: str
+    sha256: Optional[str] = None
+
+    @property
+    def system_path(self) -> str:
+        return '/'.join(self.directories)
+
+
+@dataclass
+class IngestReport:
+    """Counters for one ingest() run."""
+    scanned: int = 0
+    duplicates: int = 0
+    uploaded: int = 0
+    shared: int = 0
+    inserted: int = 0
+    indexed: int = 0
+    requeued: int = 0
+    bytes_uploaded: int = 0
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.scanned / self.seconds if self.seconds else 0.0
+
+
+def hash_file(path: str) -> str:
+    """sha256 of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+class NasIngestionClient:
+    """Batched NAS -> storage + doc_metadata ingestion (service-role key)."""
+
+    def __init__(
+        self,
+        api_endpoint: str,
+        service_key: str,
+        yacht_id: str,
+        bucket: str = 'documents',
+        workers: int = 8,
+        batch_size: int = 200,
+        index_webhook: Optional[str] = INDEX_WEBHOOK,
+        timeout: float = 300,
+        blob_store: Optional['BlobStore'] = None,
+        index_queue: Optional['IndexingQueue'] = None,
+    ):
+        """
+        Initialize client.
+
+        Args:
+            api_endpoint: Supabase project URL
+            service_key: Service-role key (storage writes and doc_metadata inserts)
+            yacht_id: Yacht UUID the documents belong to
+            bucket: Storage bucket
+            workers: Concurrent hashes / uploads / indexing calls
+            batch_size: Files per duplicate query and per INSERT
+            index_webhook: Indexing webhook URL, or None to skip indexing
+            timeout: Read timeout in seconds for uploads
+            blob_store: Fleet blob store; when set, files another yacht
+                already uploaded are referenced instead of uploaded and
+                indexed again
+            index_queue: Indexing queue; when set, documents are enqueued
+                for lib.indexing workers instead of sent to index_webhook
+        """
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self.yacht_id = yacht_id
+        self.bucket = bucket
+        self.workers = workers
+        self.batch_size = batch_size
+        self.index_webhook = index_webhook
+        self.blob_store = blob_store
+        self.index_queue = index_queue
+
+        self._transport = Transport(headers={
+            'apikey': service_key,
+            'Authorization': f'Bearer {service_key}',
+        }, timeout=(5, timeout), pool_size=workers)
+        self._webhook = Transport(headers={'Content-Type': 'application/json'},
+                                  timeout=(5, 30), pool_size=workers)
+
+    # ------------------------------------------------------------------
+    # Steps
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def scan(root: str, extensions: Optional[Iterable[str]] = None) -> Iterator[NasFile]:
+        """
+        Walk `root` and yield every regular, non-hidden file.
+
+        Args:
+            root: NAS mount point
+            extensions: Lower-case extensions to keep (e.g. {'pdf', 'docx'});
+                None keeps everything
+        """
+        keep = {e.lower().lstrip('.') for e in extensions} if extensions else None
+        root = os.path.abspath(root)
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            rel = os.path.relpath(dirpath, root)
+            directories = [] if rel == '.' else rel.split(os.sep)
+
+            for name in sorted(filenames):
+                if name.startswith('.'):
+                    continue
+                if keep is not None and os.path.splitext(name)[1].lower().lstrip('.') not in keep:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    size = os.stat(path).st_size
+                except OSError:
+                    continue
+                yield NasFile(
+                    local_path=path,
+                    filename=name,
+                    directories=directories,
+                    size_bytes=size,
+                    content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                )
+
+    def existing_hashes(self, hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        doc_metadata rows of this yacht whose sha256 is in `hashes`.
+
+        Returns:
+            {sha256: row}
+
+        Raises:
+            RuntimeError: On a non-200 response
+        """
+        if not hashes:
+            return {}
+        resp = self._transport.post(
+            f"{self.api_endpoint}/rest/v1/rpc/doc_metadata_existing_hashes",
+            params={'select': 'id,yacht_id,filename,content_type,storage_path,doc_type,system_type,sha256,indexed'},
+            json={'p_yacht_id': self.yacht_id, 'p_hashes': hashes},
+        )
+        if resp.status_code != 200:
+            raise RuntimeError(f"Duplicate check failed: {resp.status_code} {resp.text[:300]}")
+        return {row['sha256']: row for row in resp.json() or []}
+
+    def object_path(self, nas_file: NasFile) -> str:
+        """Path inside the bucket: {yacht_id}/{system_path}/{filename}."""
+        return '/'.join([self.yacht_id, *nas_file.directories, nas_file.filename])
+
+    def upload(self, nas_file: NasFile) -> str:
+        """
+        Upload one file (streamed from disk).
+
+        Returns:
+            storage_path as recorded in doc_metadata ("documents/...")
+
+        Raises:
+            RuntimeError: On a non-2xx response
+            TransportError: On network failure
+        """
+        path = self.object_path(nas_file)
+        with open(nas_file.local_path, 'rb') as body:
+            resp = self._transport.post(
+                f"{self.api_endpoint}/storage/v1/object/{self.bucket}/{quote(path)}",
+                data=body,
+                headers={
+                    'Content-Type': nas_file.content_type,
+                    # A retry after a failed INSERT overwrites its orphaned object
+                    'x-upsert': 'true',
+                },
+            )
+        if resp.status_code >= 300:
+            raise RuntimeError(f"Upload failed: {resp.status_code} {resp.text[:200]}")
+        try:
+            return resp.json()['Key']
+        except (ValueError, KeyError):
+            return f"{self.bucket}/{path}"
+
+    def metadata_row(
+        self,
+        nas_file: NasFile,
+        storage_path: str,
+        doc_type: str = 'general',
+        system_type: str = 'general',
+    ) -> Dict[str, Any]:
+        """doc_metadata row in the shape the ingestion workflow wrote."""
+        directories = nas_file.directories
+        return {
+            'yacht_id': self.yacht_id,
+            'source': 'nas',
+            'original_path': nas_file.local_path,
+            'filename': nas_file.filename,
+            'content_type': nas_file.content_type,
+            'size_bytes': nas_file.size_bytes,
+            'sha256': nas_file.sha256,
+            'storage_path': storage_path,
+            'system_path': nas_file.system_path,
+            'indexed': False,
+            'metadata': {
+                'directories': directories,
+                'upload_timestamp': datetime.now(timezone.utc).isoformat(),
+                'file_extension': nas_file.filename.rsplit('.', 1)[-1],
+                'department': directories[0] if directories else None,
+                'local_path': nas_file.local_path,
+            },
+            'doc_type': doc_type,
+            'system_type': system_type,
+        }
+
+    def insert_metadata(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert doc_metadata rows with one multi-row INSERT.
+
+        Returns:
+            Inserted rows (id plus the fields the indexing webhook needs)
+
+        Raises:
+            RuntimeError: On a non-201 response (no rows are inserted)
+        """
+        if not rows:
+            return []
+        resp = self._transport.post(
+            f"{self.api_endpoint}/rest/v1/doc_metadata",
+            params={'select': 'id,yacht_id,filename,content_type,storage_path,doc_type,system_type,sha256'},
+            json=rows,
+            headers={'Content-Type': 'application/json', 'Prefer': 'return=representation'},
+        )
+        if resp.status_code != 201:
+            raise RuntimeError(f"doc_metadata insert failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def indexing_job(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """indexing_jobs entry for an inserted doc_metadata row."""
+        return {
+            'document_id': row['id'],
+            'yacht_id': row['yacht_id'],
+            'storage_path': row['storage_path'],
+            'sha256': row['sha256'] if self.blob_store is not None else None,
+            'payload': {
+                'filename': row['filename'],
+                'content_type': row['content_type'],
+                'doc_type': row['doc_type'],
+                'system_tag': row['system_type'],
+            },
+        }
+
+    def blob_indexing_job(self, blob: Dict[str, Any]) -> Dict[str, Any]:
+        """indexing_jobs entry for a document_blobs row (no doc_metadata row of its own)."""
+        return {
+            'document_id': None,
+            'yacht_id': self.yacht_id,
+            'storage_path': f"{self.blob_store.bucket}/{blob['storage_path']}",
+            'sha256': blob['sha256'],
+            'payload': {
+                'filename': blob['sha256'],
+                'content_type': blob['content_type'],
+                'doc_type': 'general',
+                'system_tag': 'general',
+            },
+        }
+
+    def requeue_unindexed_blobs(self, limit: int = 1000) -> int:
+        """
+        Enqueue uploaded blobs that nothing is indexing.
+
+        A blob is sent for indexing only by the caller that claimed it; if
+        that enqueue failed, every other yacht just references the blob and
+        it would stay unindexed. Blobs that already have a pending job are
+        skipped by enqueue_indexing_jobs(), so this is safe to run anytime.
+        mark_document_blob_indexed() flags the doc_metadata rows of every
+        yacht once the worker is done.
+
+        Returns:
+            Jobs queued
+
+        Raises:
+            RuntimeError: On a non-2xx response
+            TransportError: On network failure
+        """
+        if self.blob_store is None or self.index_queue is None:
+            return 0
+        blobs = self.blob_store.unindexed(limit)
+        return self.index_queue.enqueue([self.blob_indexing_job(blob) for blob in blobs])
+
+    def trigger_indexing(self, row: Dict[str, Any]):
+        """
+        Hand one inserted document to the Index_docs workflow.
+
+        Raises:
+            RuntimeError: On a non-2xx response
+            TransportError: On network failure
+        """
+        resp = self._webhook.post(self.index_webhook, json={
+            'filename': row['filename'],
+            'content_type': row['content_type'],
+            'storage_path': row['storage_path'],
+            'document_id': row['id'],
+            'yacht_id': row['yacht_id'],
+            'system_tag': row['system_type'],
+            'doc_type': row['doc_type'],
+            'sha256': row['sha256'],
+        })
+        if resp.status_code >= 300:
+            raise RuntimeError(f"Indexing trigger failed: {resp.status_code}")
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+
+    def ingest(
+        self,
+        root: str,
+        extensions: Optional[Iterable[str]] = None,
+        classify: Optional[Callable[[NasFile], Tuple[str, str]]] = None,
+        dry_run: bool = False,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        """
+        Ingest every new file under `root`.
+
+        A failure affects only its own file (hash/upload/index) or batch
+        (duplicate check/insert); it is recorded in report.failed and the
+        run continues. Re-running is safe: anything already inserted is a
+        duplicate the second time, and with an index queue a duplicate
+        that is still not indexed (its enqueue failed) is enqueued again.
+
+        Args:
+            root: NAS mount point
+            extensions: Extensions to keep (None = all)
+            classify: Maps a file to (doc_type, system_type);
+                default ('general', 'general') as the workflow used
+            dry_run: Hash and check duplicates only; nothing is written
+            progress: Called with the running report after each batch
+
+        Returns:
+            IngestReport
+        """
+        report = IngestReport()
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ingest') as pool:
+            for batch in _batched(self.scan(root, extensions), self.batch_size):
+                report.scanned += len(batch)
+                with span('ingest.batch', files=len(batch)):
+                    self._ingest_batch(pool, batch, report, classify, dry_run)
+                report.seconds = time.perf_counter() - start
+                if progress:
+                    progress(report)
+
+        if not dry_run:
+            try:
+                report.requeued = self.requeue_unindexed_blobs()
+            except (RuntimeError, TransportError) as e:
+                report.failed.append(('document_blobs', f"requeue: {e}"))
+
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def _ingest_batch(
+        self,
+        pool: ThreadPoolExecutor,
+        batch: List[NasFile],
+        report: IngestReport,
+        classify: Optional[Callable[[NasFile], Tuple[str, str]]],
+        dry_run: bool,
+    ):
+        # 1. Hash
+        by_hash: Dict[str, NasFile] = {}
+        for nas_file, error in pool.map(self._hash_one, batch):
+            if error:
+                report.failed.append((nas_file.local_path, error))
+            elif nas_file.sha256 in by_hash:
+                report.duplicates += 1
+            else:
+                by_hash[nas_file.sha256] = nas_file
+
+        # 2. Dedupe against the cloud
+        try:
+            existing = self.existing_hashes(list(by_hash))
+        except (RuntimeError, TransportError) as e:
+            report.failed.extend((f.local_path, str(e)) for f in by_hash.values())
+            return
+        report.duplicates += len(existing)
+        new_files = [f for h, f in by_hash.items() if h not in existing]
+        if dry_run:
+            report.uploaded += len(new_files)
+            return
+        # Inserted by an earlier run whose enqueue failed. Queue mode only:
+        # enqueue_indexing_jobs() skips pending jobs and the worker replaces
+        # chunks and sets indexed. Index_docs never sets indexed and appends
+        # chunks, so the webhook would re-index every document on every run.
+        pending = []
+        if self.index_queue is not None:
+            pending = [row for row in existing.values() if not row.get('indexed')]
+
+        # 3. Upload (with a blob store, only files new to the whole fleet)
+        if self.blob_store is not None:
+            uploaded = self._upload_shared(pool, new_files, report)
+        else:
+            uploaded = self._upload_own(pool, new_files, report)
+
+        rows = []
+        to_index = set()
+        for nas_file, storage_path, indexed, needs_index in uploaded:
+            doc_type, system_type = classify(nas_file) if classify else ('general', 'general')
+            row = self.metadata_row(nas_file, storage_path, doc_type, system_type)
+            row['indexed'] = indexed
+            rows.append(row)
+            if needs_index:
+                to_index.add(nas_file.sha256)
+
+        # 4. Insert
+        try:
+            inserted = self.insert_metadata(rows)
+        except (RuntimeError, TransportError) as e:
+            report.failed.extend((row['original_path'], str(e)) for row in rows)
+            inserted = []
+        report.inserted += len(inserted)
+
+        # 5. Index
+        pending.extend(row for row in inserted if row['sha256'] in to_index)
+        if self.index_queue is not None and pending:
+            try:
+                self.index_queue.enqueue([self.indexing_job(row) for row in pending])
+                report.indexed += len(pending)
+            except (RuntimeError, TransportError) as e:
+                report.failed.extend((row['storage_path'], f"enqueue: {e}") for row in pending)
+        elif self.index_webhook:
+            for row, error in pool.map(self._index_one, pending):
+                if error:
+                    report.failed.append((row['storage_path'], error))
+                else:
+                    report.indexed += 1
+
+    def _upload_own(
+        self,
+        pool: ThreadPoolExecutor,
+        files: List[NasFile],
+        report: IngestReport,
+    ) -> List[Tuple[NasFile, str, bool, bool]]:
+        """Upload every file under the yacht's own prefix; all need indexing."""
+        done = []
+        for nas_file, storage_path, error in pool.map(self._upload_one, files):
+            if error:
+                report.failed.append((nas_file.local_path, error))
+                continue
+            report.uploaded += 1
+            report.bytes_uploaded += nas_file.size_bytes
+            done.append((nas_file, storage_path, False, True))
+        return done
+
+    def _upload_shared(
+        self,
+        pool: ThreadPoolExecutor,
+        files: List[NasFile],
+        report: IngestReport,
+    ) -> List[Tuple[NasFile, str, bool, bool]]:
+        """
+        Upload through the fleet blob store.
+
+        Only blobs this call claimed are uploaded and sent for indexing;
+        the rest already exist (or are being uploaded by another yacht)
+        and just get a reference row.
+        """
+        store = self.blob_store
+        try:
+            claims = store.claim([
+                {'sha256': f.sha256, 'size_bytes': f.size_bytes, 'content_type': f.content_type}
+                for f in files
+            ])
+        except (RuntimeError, TransportError) as e:
+            report.failed.extend((f.local_path, str(e)) for f in files)
+            return []
+
+        def upload(nas_file: NasFile):
+            try:
+                store.upload(nas_file.local_path, claims[nas_file.sha256]['storage_path'],
+                             nas_file.content_type)
+                return nas_file, None
+            except (OSError, RuntimeError, TransportError) as e:
+                return nas_file, f"upload: {e}"
+
+        claimed = [f for f in files if claims[f.sha256]['needs_upload']]
+        failed = set()
+        for nas_file, error in pool.map(upload, claimed):
+            if error:
+                report.failed.append((nas_file.local_path, error))
+                failed.add(nas_file.sha256)
+            else:
+                report.uploaded += 1
+                report.bytes_uploaded += nas_file.size_bytes
+
+        done = []
+        for nas_file in files:
+            if nas_file.sha256 in failed:
+                continue
+            claim = claims[nas_file.sha256]
+            if not claim['needs_upload']:
+                report.shared += 1
+            done.append((nas_file, f"{store.bucket}/{claim['storage_path']}",
+                         bool(claim['indexed']), claim['needs_upload']))
+
+        try:
+            store.mark_uploaded([f.sha256 for f in claimed if f.sha256 not in failed])
+            store.attach([{
+                'yacht_id': self.yacht_id,
+                'sha256': nas_file.sha256,
+                'file_path': nas_file.local_path,
+                'metadata': {'directories': nas_file.directories},
+            } for nas_file, *_ in done])
+        except (RuntimeError, TransportError) as e:
+            report.failed.extend((f.local_path, str(e)) for f, *_ in done)
+            return []
+        return done
+
+    def _hash_one(self, nas_file: NasFile) -> Tuple[NasFile, Optional[str]]:
+        try:
+            nas_file.sha256 = hash_file(nas_file.local_path)
+            return nas_file, None
+        except OSError as e:
+            return nas_file, f"hash: {e}"
+
+    def _upload_one(self, nas_file: NasFile) -> Tuple[NasFile, Optional[str], Optional[str]]:
+        try:
+            return nas_file, self.upload(nas_file), None
+        except (OSError, RuntimeError, TransportError) as e:
+            return nas_file, None, f"upload: {e}"
+
+    def _index_one(self, row: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        try:
+            self.trigger_indexing(row)
+            return row, None
+        except (RuntimeError, TransportError) as e:
+            return row, f"index: {e}"
+
+    def close(self):
+        self._transport.close()
+        self._webhook.close()
+
+
+def main():
+    """CLI entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest NAS documents into CelesteOS Cloud")
+    parser.add_argument('root', help='NAS mount point')
+    parser.add_argument('--yacht-id', required=True, help='Yacht UUID')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--ext', help='Comma-separated extensions to keep (default: all)')
+    parser.add_argument('--no-index', action='store_true', help='Do not trigger indexing')
+    parser.add_argument('--index-via', choices=('queue', 'webhook'), default='queue',
+                        help='Enqueue indexing jobs (default) or call the Index_docs webhook')
+    parser.add_argument('--dry-run', action='store_true', help='Hash and check duplicates only')
+    parser.add_argument('--shared-blobs', action='store_true',
+                        help='Store content once fleet-wide (lib.blob_store)')
+    args = parser.parse_args()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not key:
+        print("✗ SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set", file=sys.stderr)
+        sys.exit(2)
+
+    blob_store = None
+    if args.shared_blobs:
+        from .blob_store import BlobStore
+        blob_store = BlobStore(url, key, pool_size=args.workers)
+
+    index_queue = None
+    if not args.no_index and args.index_via == 'queue':
+        from .indexing import IndexingQueue
+        index_queue = IndexingQueue(url, key)
+
+    client = NasIngestionClient(
+        url, key, args.yacht_id,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        index_webhook=INDEX_WEBHOOK if not args.no_index and args.index_via == 'webhook' else None,
+        blob_store=blob_store,
+        index_queue=index_queue,
+    )
+
+    def progress(report: IngestReport):
+        print(f"  {report.scanned} scanned, {report.uploaded} new, "
+              f"{report.duplicates} duplicate, {len(report.failed)} failed "
+              f"({report.files_per_second:.0f} files/s)")
+
+    try:
+        report = client.ingest(
+            args.root,
+            extensions=args.ext.split(',') if args.ext else None,
+            dry_run=args.dry_run,
+            progress=progress,
+        )
+    finally:
+        client.close()
+        if blob_store is not None:
+            blob_store.close()
+        if index_queue is not None:
+            index_queue.close()
+
+    verb = 'would upload' if args.dry_run else 'uploaded'
+    print(f"✓ {report.scanned} files in {report.seconds:.1f}s: {verb} {report.uploaded} "
+          f"({report.bytes_uploaded / 1e6:.1f} MB), {report.shared} shared, {report.duplicates} duplicates, "
+          f"{report.inserted} inserted, {report.indexed} indexed, {report.requeued} blobs requeued")
+    for path, error in report.failed:
+        print(f"  ✗ {path}: {error}")
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,9 @@ Transitions:
         -> State becomes PENDING_ACTIVATION
 
     PENDING_ACTIVATION: Waiting for owner to click email link
-        -> Poll POST /check-activation
+        -> Long-poll POST /check-activation (server holds the request
+           until activation, up to ACTIVATION_LONG_POLL seconds; plain
+           polling every ACTIVATION_POLL_INTERVAL if it does not)
         -> Returns 'pending' until owner activates
         -> Once activated, returns shared_secret ONE TIME
         -> Store in Keychain
@@ -25,18 +27,28 @@ Transitions:
 
     OPERATIONAL: Fully operational
         -> Normal operation, periodic health checks
+
+Every phase and state transition is published on the orchestrator's
+InstallEventStream (see lib.events). run_headless() streams those events
+as JSON lines for automated provisioning and CI.
 """
 
 import os
 import json
+import sys
 import time
-import requests
+import functools
+import threading
 from pathlib import Path
 from enum import Enum
-from typing import Optional, Dict, Any, Tuple
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, Tuple, Callable
+from dataclasses import dataclass, field
 
 from .crypto import CryptoIdentity, compute_yacht_hash
+from .transport import Transport, TransportError
+from .secret_store import SecretBackend, CachedSecretStore, default_backend
+from .events import InstallEvent, InstallEventStream, JsonLinesWriter
+from .instrumentation import span
 
 
 class InstallState(Enum):
@@ -48,19 +60,38 @@ class InstallState(Enum):
     ERROR = "error"
 
 
-@dataclass
+# Process-wide manifest cache: path -> (mtime_ns, size, config)
+_manifest_cache: Dict[Path, Tuple[int, int, 'InstallConfig']] = {}
+_manifest_path: Optional[Path] = None
+_manifest_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
 class InstallConfig:
-    """Installation configuration embedded in DMG."""
+    """
+    Installation configuration embedded in DMG.
+
+    Immutable: the manifest is signed into the binary, so a loaded config
+    never changes. The integrity check runs once at construction and its
+    result is kept for the lifetime of the object.
+    """
     yacht_id: str
     yacht_id_hash: str
     api_endpoint: str  # Supabase for check-activation, verify-credentials
     n8n_endpoint: str = "https://api.celeste7.ai/webhook"  # n8n for registration
     version: str = "1.0.0"
     build_timestamp: int = 0
+    _integrity_ok: bool = field(init=False, repr=False, compare=False)
 
-    @classmethod
-    def load_embedded(cls) -> 'InstallConfig':
-        """Load config embedded in application bundle."""
+    def __post_init__(self):
+        object.__setattr__(
+            self, '_integrity_ok',
+            compute_yacht_hash(self.yacht_id) == self.yacht_id_hash
+        )
+
+    @staticmethod
+    def locate_manifest() -> Path:
+        """Find the manifest embedded in the application bundle."""
         import sys
 
         # Determine if running in PyInstaller bundle
@@ -78,11 +109,54 @@ class InstallConfig:
                 # Development fallback
                 bundle_path = Path.home() / '.celesteos' / 'install_manifest.json'
 
-        if not bundle_path.exists():
+        return bundle_path
+
+    @classmethod
+    def load_embedded(cls) -> 'InstallConfig':
+        """
+        Load config embedded in application bundle.
+
+        The manifest location is probed once per process; later calls only
+        stat the file and return the cached config while it is unchanged.
+        """
+        global _manifest_path
+
+        with _manifest_lock:
+            path = _manifest_path
+
+        if path is None or not path.exists():
+            path = cls.locate_manifest()
+            with _manifest_lock:
+                _manifest_path = path
+
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, bundle_path: Path) -> 'InstallConfig':
+        """
+        Load a manifest file, cached by (path, mtime, size).
+
+        Args:
+            bundle_path: Path to install_manifest.json
+
+        Raises:
+            FileNotFoundError: If the manifest does not exist
+            ValueError: If the manifest is malformed
+        """
+        bundle_path = Path(bundle_path)
+
+        try:
+            st = bundle_path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(
                 f"Installation manifest not found at {bundle_path}. "
                 "This binary was not properly built or the manifest is missing."
-            )
+            ) from None
+
+        with _manifest_lock:
+            cached = _manifest_cache.get(bundle_path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
 
         try:
             with open(bundle_path) as f:
@@ -96,7 +170,7 @@ class InstallConfig:
         if missing:
             raise ValueError(f"Manifest missing required fields: {missing}")
 
-        return cls(
+        config = cls(
             yacht_id=data['yacht_id'],
             yacht_id_hash=data['yacht_id_hash'],
             api_endpoint=data['api_endpoint'],
@@ -105,22 +179,48 @@ class InstallConfig:
             build_timestamp=data.get('build_timestamp', 0)
         )
 
+        with _manifest_lock:
+            _manifest_cache[bundle_path] = (st.st_mtime_ns, st.st_size, config)
+        return config
+
+    @staticmethod
+    def clear_cache():
+        """Forget cached manifests and the probed manifest location."""
+        global _manifest_path
+        with _manifest_lock:
+            _manifest_cache.clear()
+            _manifest_path = None
+
     def verify_integrity(self) -> bool:
-        """Verify manifest hasn't been tampered with."""
-        expected_hash = compute_yacht_hash(self.yacht_id)
-        return expected_hash == self.yacht_id_hash
+        """Verify manifest hasn't been tampered with (computed once at load)."""
+        return self._integrity_ok
 
 
 class KeychainStore:
     """
-    macOS Keychain integration for secure secret storage.
+    Secure storage for the shared_secret.
 
-    Uses security(1) command for Keychain access.
-    In production, use pyobjc-framework-Security for native API.
+    Delegates to a pluggable SecretBackend (see lib.secret_store). The
+    default is the native macOS Keychain API behind a short-lived
+    in-process cache, so repeated reads do not fork/exec security(1).
     """
 
     SERVICE_NAME = "com.celeste7.celesteos"
 
+    _backend: Optional[SecretBackend] = None
+
+    @classmethod
+    def get_backend(cls) -> SecretBackend:
+        """Return the active backend, creating the default on first use."""
+        if cls._backend is None:
+            cls._backend = CachedSecretStore(default_backend())
+        return cls._backend
+
+    @classmethod
+    def set_backend(cls, backend: Optional[SecretBackend]):
+        """Replace the backend (None restores the platform default)."""
+        cls._backend = backend
+
     @classmethod
     def store_secret(cls, yacht_id: str, shared_secret: str) -> bool:
         """
@@ -133,27 +233,8 @@ class KeychainStore:
         Returns:
             True if successful
         """
-        import subprocess
-
-        # Delete existing entry if present
-        subprocess.run(
-            ['security', 'delete-generic-password', '-s', cls.SERVICE_NAME, '-a', yacht_id],
-            capture_output=True
-        )
-
-        # Add new entry
-        result = subprocess.run(
-            [
-                'security', 'add-generic-password',
-                '-s', cls.SERVICE_NAME,
-                '-a', yacht_id,
-                '-w', shared_secret,
-                '-U'  # Update if exists
-            ],
-            capture_output=True
-        )
-
-        return result.returncode == 0
+        with span('keychain.store'):
+            return cls.get_backend().store(cls.SERVICE_NAME, yacht_id, shared_secret)
 
     @classmethod
     def retrieve_secret(cls, yacht_id: str) -> Optional[str]:
@@ -166,28 +247,61 @@ class KeychainStore:
         Returns:
             shared_secret or None if not found
         """
-        import subprocess
-
-        result = subprocess.run(
-            ['security', 'find-generic-password', '-s', cls.SERVICE_NAME, '-a', yacht_id, '-w'],
-            capture_output=True,
-            text=True
-        )
-
-        if result.returncode == 0:
-            return result.stdout.strip()
-        return None
+        with span('keychain.retrieve') as timing:
+            secret = cls.get_backend().retrieve(cls.SERVICE_NAME, yacht_id)
+            timing.set(found=secret is not None)
+            return secret
 
     @classmethod
     def delete_secret(cls, yacht_id: str) -> bool:
         """Delete secret from Keychain."""
-        import subprocess
+        with span('keychain.delete'):
+            return cls.get_backend().delete(cls.SERVICE_NAME, yacht_id)
 
-        result = subprocess.run(
-            ['security', 'delete-generic-password', '-s', cls.SERVICE_NAME, '-a', yacht_id],
-            capture_output=True
-        )
-        return result.returncode == 0
+
+def _event_value(value: Any) -> Any:
+    """JSON-friendly form of a phase result."""
+    if isinstance(value, InstallState):
+        return value.value
+    if isinstance(value, tuple):
+        return [_event_value(v) for v in value]
+    return value
+
+
+def _phase(name: str):
+    """
+    Emit phase_start / phase_end / phase_error events around a method.
+
+    Also times the phase as an `installer.<name>` span when
+    instrumentation is enabled.
+    """
+    span_name = f'installer.{name}'
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with span(span_name, yacht_id=self.config.yacht_id):
+                return _run_phase(self, name, method, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def _run_phase(orchestrator, name: str, method, args, kwargs):
+    """Call a phase method, emitting events only if someone is listening."""
+    if not orchestrator.events.active:
+        return method(orchestrator, *args, **kwargs)
+
+    orchestrator._emit('phase_start', phase=name)
+    start = time.monotonic()
+    try:
+        result = method(orchestrator, *args, **kwargs)
+    except Exception as e:
+        orchestrator._emit('phase_error', phase=name, duration=time.monotonic() - start,
+                           message=str(e), details={'error': type(e).__name__})
+        raise
+    orchestrator._emit('phase_end', phase=name, duration=time.monotonic() - start,
+                       details={'result': _event_value(result)})
+    return result
 
 
 class InstallationOrchestrator:
@@ -199,18 +313,46 @@ class InstallationOrchestrator:
 
     # Polling configuration
     ACTIVATION_POLL_INTERVAL = 5  # seconds
+    ACTIVATION_LONG_POLL = 55  # seconds the server may hold a poll (0 = plain polling)
+    ACTIVATION_MAX_BACKOFF = 60  # seconds between polls after repeated failures
     ACTIVATION_TIMEOUT = 3600  # 1 hour max wait
 
-    def __init__(self, config: InstallConfig):
+    def __init__(self, config: InstallConfig, events: Optional[InstallEventStream] = None):
         self.config = config
-        self.state = InstallState.UNREGISTERED
+        self.events = events or InstallEventStream()
+        self._state = InstallState.UNREGISTERED
         self._crypto: Optional[CryptoIdentity] = None
-        self._session = requests.Session()
-        self._session.headers.update({
+        # None until the first long-poll answers; False falls back to polling
+        self.long_poll_supported: Optional[bool] = None
+        # Consecutive polls that got no answer (network error or non-200)
+        self._poll_failures = 0
+        self._transport = Transport(headers={
             'Content-Type': 'application/json',
             'User-Agent': f'CelesteOS-Installer/{config.version}'
         })
 
+    @property
+    def state(self) -> InstallState:
+        """Current installation state."""
+        return self._state
+
+    @state.setter
+    def state(self, new_state: InstallState):
+        old_state = self._state
+        self._state = new_state
+        if new_state is not old_state and self.events.active:
+            self._emit('state', details={'from': old_state.value, 'to': new_state.value})
+
+    def _emit(self, event: str, **kwargs):
+        """Publish an InstallEvent for this orchestrator."""
+        self.events.emit(InstallEvent(
+            event=event,
+            state=self._state.value,
+            yacht_id=self.config.yacht_id,
+            **kwargs
+        ))
+
+    @_phase('initialize')
     def initialize(self) -> InstallState:
         """
         Initialize installation state.
@@ -248,6 +390,7 @@ class InstallationOrchestrator:
 
         return self.state
 
+    @_phase('register')
     def register(self) -> Tuple[bool, str]:
         """
         Register yacht with cloud.
@@ -268,7 +411,7 @@ class InstallationOrchestrator:
 
         try:
             # Use n8n endpoint for registration (sends activation email via Outlook)
-            resp = self._session.post(
+            resp = self._transport.post(
                 f"{self.config.n8n_endpoint}/register",
                 json=payload,
                 timeout=30
@@ -285,13 +428,21 @@ class InstallationOrchestrator:
             error = resp.json().get('message', resp.json().get('error', 'Unknown error'))
             return False, f"Registration failed: {error}"
 
-        except requests.RequestException as e:
+        except (TransportError, ValueError) as e:
+            # ValueError: a non-JSON body (proxy error page, captive portal)
             return False, f"Network error: {e}"
 
-    def poll_activation(self) -> Tuple[InstallState, Optional[str]]:
+    def poll_activation(self, wait: float = 0) -> Tuple[InstallState, Optional[str]]:
         """
         Poll for activation status.
 
+        Args:
+            wait: Seconds the server may hold a pending request waiting for
+                activation (long-poll); 0 answers immediately. A pending
+                reply without 'waited' (a server without long-poll support)
+                sets long_poll_supported to False. A failed poll is
+                transient: it is counted and wait_for_activation backs off.
+
         Returns:
             (new_state, shared_secret if activated)
         """
@@ -301,21 +452,28 @@ class InstallationOrchestrator:
         payload = {
             'yacht_id': self.config.yacht_id
         }
+        if wait > 0:
+            payload['wait'] = wait
 
         try:
-            resp = self._session.post(
+            resp = self._transport.post(
                 f"{self.config.api_endpoint}/functions/v1/check-activation",
                 json=payload,
-                timeout=30
+                timeout=30 + wait
             )
 
             if resp.status_code != 200:
+                self._poll_failures += 1
                 return self.state, None
 
             data = resp.json()
+            self._poll_failures = 0
             status = data.get('status')
 
             if status == 'pending':
+                if wait > 0:
+                    # Older deployments ignore wait and omit waited
+                    self.long_poll_supported = 'waited' in data
                 return InstallState.PENDING_ACTIVATION, None
 
             elif status == 'active':
@@ -340,15 +498,23 @@ class InstallationOrchestrator:
                 self.state = InstallState.ERROR
                 return InstallState.ERROR, None
 
-        except requests.RequestException:
-            pass
+        except (TransportError, ValueError):
+            # ValueError: a non-JSON body, e.g. a proxy error page
+            self._poll_failures += 1
 
         return self.state, None
 
+    @_phase('activation')
     def wait_for_activation(self, callback=None) -> bool:
         """
         Block until activation completes or timeout.
 
+        Long-polls while the server supports it, so activation is picked up
+        the moment it happens with one request per ACTIVATION_LONG_POLL
+        seconds; otherwise polls every ACTIVATION_POLL_INTERVAL seconds.
+        Failed polls are retried after an exponential backoff (capped at
+        ACTIVATION_MAX_BACKOFF), long-polling again once the server answers.
+
         Args:
             callback: Optional function called each poll with (elapsed_seconds, state)
 
@@ -358,7 +524,14 @@ class InstallationOrchestrator:
         start = time.time()
 
         while time.time() - start < self.ACTIVATION_TIMEOUT:
-            state, secret = self.poll_activation()
+            wait = 0
+            if self.ACTIVATION_LONG_POLL > 0 and self.long_poll_supported is not False:
+                wait = min(self.ACTIVATION_LONG_POLL, self.ACTIVATION_TIMEOUT - (time.time() - start))
+            state, secret = self.poll_activation(wait)
+
+            if self.events.active:
+                self._emit('poll', details={'elapsed': round(time.time() - start, 3),
+                                            'long_poll': bool(wait)})
 
             if callback:
                 callback(time.time() - start, state)
@@ -369,10 +542,16 @@ class InstallationOrchestrator:
             if state == InstallState.ERROR:
                 return False
 
-            time.sleep(self.ACTIVATION_POLL_INTERVAL)
+            # A held long-poll already waited; anything else waits here
+            if self._poll_failures:
+                time.sleep(min(self.ACTIVATION_POLL_INTERVAL * 2 ** (self._poll_failures - 1),
+                               self.ACTIVATION_MAX_BACKOFF))
+            elif not (wait and self.long_poll_supported):
+                time.sleep(self.ACTIVATION_POLL_INTERVAL)
 
         return False
 
+    @_phase('verify')
     def _verify_credentials(self) -> bool:
         """Verify stored credentials are still valid."""
         if not self._crypto or not self._crypto.has_secret:
@@ -383,7 +562,7 @@ class InstallationOrchestrator:
             payload = {'action': 'verify'}
             headers = self._crypto.sign_request(payload)
 
-            resp = self._session.post(
+            resp = self._transport.post(
                 f"{self.config.api_endpoint}/functions/v1/verify-credentials",
                 json=payload,
                 headers=headers,
@@ -392,7 +571,7 @@ class InstallationOrchestrator:
 
             return resp.status_code == 200
 
-        except requests.RequestException:
+        except TransportError:
             return False
 
     def get_signed_headers(self, payload: Dict[str, Any]) -> Dict[str, str]:
@@ -463,5 +642,68 @@ def run_installation():
         return False
 
 
+def run_headless(
+    config: Optional[InstallConfig] = None,
+    emit: Optional[Callable[[InstallEvent], None]] = None,
+) -> bool:
+    """
+    Run installation without a display, emitting structured events.
+
+    Args:
+        config: Installation config (default: embedded manifest)
+        emit: Event subscriber (default: JSON lines on stdout)
+
+    Returns:
+        True if the yacht ends up ACTIVE or OPERATIONAL
+    """
+    events = InstallEventStream()
+    events.subscribe(emit or JsonLinesWriter())
+    start = time.monotonic()
+
+    def finish(ok: bool, state: InstallState, message: str = "") -> bool:
+        events.emit(InstallEvent(
+            event='result',
+            state=state.value,
+            yacht_id=config.yacht_id if config else "",
+            duration=time.monotonic() - start,
+            message=message,
+            details={'success': ok},
+        ))
+        return ok
+
+    try:
+        config = config or InstallConfig.load_embedded()
+    except (FileNotFoundError, ValueError) as e:
+        return finish(False, InstallState.ERROR, str(e))
+
+    try:
+        orchestrator = InstallationOrchestrator(config, events=events)
+        state = orchestrator.initialize()
+
+        if state == InstallState.OPERATIONAL:
+            return finish(True, state, "Already activated and operational")
+
+        if state == InstallState.UNREGISTERED:
+            success, message = orchestrator.register()
+            if not success:
+                return finish(False, orchestrator.state, message)
+
+        if orchestrator.state == InstallState.PENDING_ACTIVATION:
+            activated = orchestrator.wait_for_activation()
+            return finish(activated, orchestrator.state,
+                          "Activation successful" if activated else "Activation failed or timed out")
+
+        return finish(False, orchestrator.state, "Unexpected state")
+
+    except SecurityError as e:
+        return finish(False, InstallState.ERROR, str(e))
+    except BaseException as e:
+        # Consumers wait for the result line: emit it, then fail loudly
+        finish(False, InstallState.ERROR, f"{type(e).__name__}: {e}")
+        raise
+
+
 if __name__ == '__main__':
+    if '--headless' in sys.argv[1:]:
+        sys.exit(0 if run_headless() else 1)
     run_installation()
@@ -5,14 +5,30 @@ Simple GUI for installation progress feedback.
 
 Uses Tkinter (built into Python) for cross-platform compatibility.
 Shows installation status, progress, and handles user interaction.
+
+Tkinter is imported when the first InstallerWindow is created, so code that
+only needs InstallProgress / InstallUIState does not load Tcl/Tk.
 """
 
-import tkinter as tk
-from tkinter import ttk, messagebox
-from typing import Callable, Optional
+from typing import Callable, Optional, Deque, List, Tuple
+from collections import deque
 from enum import Enum
 from dataclasses import dataclass
 import threading
+import time
+
+from .events import InstallEvent, InstallEventStream
+
+# Bound by _load_tkinter() on first InstallerWindow
+tk = ttk = messagebox = None
+
+
+def _load_tkinter():
+    global tk, ttk, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as _ttk, messagebox as _messagebox
+        tk, ttk, messagebox = tkinter, _ttk, _messagebox
 
 
 class InstallUIState(Enum):
@@ -36,6 +52,99 @@ class InstallProgress:
     elapsed_seconds: int = 0
 
 
+# Installer phase -> (UI state, progress fraction)
+_PHASE_PROGRESS = {
+    'initialize': (InstallUIState.INITIALIZING, 0.1),
+    'register': (InstallUIState.REGISTERING, 0.3),
+    'activation': (InstallUIState.WAITING_ACTIVATION, 0.5),
+    'verify': (InstallUIState.VERIFYING, 0.9),
+}
+
+
+def progress_from_event(event: InstallEvent) -> Optional[InstallProgress]:
+    """
+    Translate an orchestrator InstallEvent into a UI update.
+
+    Returns None for events the window does not display.
+    """
+    stamp = time.strftime('%H:%M:%S', time.localtime(event.timestamp))
+
+    if event.event in ('phase_start', 'phase_end'):
+        ui_state, fraction = _PHASE_PROGRESS.get(event.phase, (InstallUIState.INITIALIZING, 0.0))
+        if event.event == 'phase_start':
+            details = f"[{stamp}] {event.phase} started"
+        else:
+            details = f"[{stamp}] {event.phase} finished in {event.duration:.2f}s"
+        return InstallProgress(ui_state, ui_state.value, fraction, details)
+
+    if event.event == 'poll':
+        return InstallProgress(
+            InstallUIState.WAITING_ACTIVATION,
+            InstallUIState.WAITING_ACTIVATION.value,
+            0.5,
+            elapsed_seconds=int(event.details.get('elapsed', 0)),
+        )
+
+    if event.event == 'phase_error':
+        return InstallProgress(InstallUIState.ERROR, "Installation failed", 0.0,
+                               f"[{stamp}] {event.phase}: {event.message}")
+
+    if event.event == 'result':
+        if event.details.get('success'):
+            return InstallProgress(InstallUIState.COMPLETE, InstallUIState.COMPLETE.value, 1.0,
+                                   f"[{stamp}] {event.message}")
+        return InstallProgress(InstallUIState.ERROR, "Installation failed", 0.0,
+                               f"[{stamp}] {event.message}")
+
+    return None
+
+
+class ProgressChannel:
+    """
+    Thread-safe, coalescing hand-off from installer thread to UI thread.
+
+    The installer may publish far faster than the UI can draw (e.g. the
+    per-poll ticks of wait_for_activation). Only the latest progress state
+    is kept; detail lines go into a bounded ring buffer. The UI drains the
+    channel at a fixed frame rate, so the Tk event queue sees at most one
+    update per frame no matter how fast updates arrive.
+    """
+
+    def __init__(self, max_details: int = 200):
+        """
+        Args:
+            max_details: Detail lines retained between drains (oldest dropped)
+        """
+        self._lock = threading.Lock()
+        self._latest: Optional[InstallProgress] = None
+        self._details: Deque[str] = deque(maxlen=max_details)
+        self.published = 0
+        self.dropped_details = 0
+
+    def publish(self, progress: InstallProgress):
+        """Record a progress update (called from any thread)."""
+        with self._lock:
+            self._latest = progress
+            self.published += 1
+            if progress.details:
+                if len(self._details) == self._details.maxlen:
+                    self.dropped_details += 1
+                self._details.append(progress.details)
+
+    def drain(self) -> Tuple[Optional[InstallProgress], List[str]]:
+        """
+        Take the latest state and detail lines published since the last drain.
+
+        Returns:
+            (latest progress or None if nothing new, new detail lines)
+        """
+        with self._lock:
+            latest, self._latest = self._latest, None
+            details = list(self._details)
+            self._details.clear()
+        return latest, details
+
+
 class InstallerWindow:
     """
     Main installation window.
@@ -48,11 +157,18 @@ class InstallerWindow:
     - Action buttons
     """
 
+    # UI refresh rate when attached to a ProgressChannel (~20 fps)
+    FRAME_INTERVAL_MS = 50
+
+    # Lines kept in the details box; older lines are trimmed from the top
+    MAX_DETAIL_LINES = 500
+
     def __init__(self, yacht_id: str, yacht_name: str, buyer_email: str):
         self.yacht_id = yacht_id
         self.yacht_name = yacht_name
         self.buyer_email = buyer_email
 
+        _load_tkinter()
         self.root = tk.Tk()
         self.root.title("CelesteOS Installation")
         self.root.geometry("500x350")
@@ -68,6 +184,7 @@ class InstallerWindow:
 
         self._setup_ui()
         self._current_state = InstallUIState.INITIALIZING
+        self._channel: Optional[ProgressChannel] = None
 
     def _setup_ui(self):
         """Setup UI components."""
@@ -138,8 +255,39 @@ class InstallerWindow:
         )
         self.action_button.grid(row=6, column=0, columnspan=2)
 
+    def attach(self, channel: ProgressChannel):
+        """Drain a ProgressChannel once per frame until the window closes."""
+        self._channel = channel
+        self.root.after(self.FRAME_INTERVAL_MS, self._pump)
+
+    def _pump(self):
+        """Apply the latest coalesced state, then reschedule."""
+        progress, details = self._channel.drain()
+        if progress is not None:
+            self._apply_progress(progress, details)
+        elif details:
+            self._append_details(details)
+        self.root.after(self.FRAME_INTERVAL_MS, self._pump)
+
     def update_progress(self, progress: InstallProgress):
         """Update UI with new progress information."""
+        self._apply_progress(progress, [progress.details] if progress.details else [])
+
+    def _append_details(self, lines: List[str]):
+        """Append lines to the details box, keeping at most MAX_DETAIL_LINES."""
+        self.details_text.config(state=tk.NORMAL)
+        self.details_text.insert(tk.END, "".join(f"{line}\n" for line in lines))
+
+        line_count = int(self.details_text.index('end-1c').split('.')[0]) - 1
+        excess = line_count - self.MAX_DETAIL_LINES
+        if excess > 0:
+            self.details_text.delete('1.0', f'{excess + 1}.0')
+
+        self.details_text.see(tk.END)
+        self.details_text.config(state=tk.DISABLED)
+
+    def _apply_progress(self, progress: InstallProgress, details: List[str]):
+        """Render one progress state plus any accumulated detail lines."""
         self._current_state = progress.state
 
         # Update status label
@@ -156,11 +304,8 @@ class InstallerWindow:
                 self.progress_bar.start(10)
 
         # Update details
-        if progress.details:
-            self.details_text.config(state=tk.NORMAL)
-            self.details_text.insert(tk.END, f"{progress.details}\n")
-            self.details_text.see(tk.END)
-            self.details_text.config(state=tk.DISABLED)
+        if details:
+            self._append_details(details)
 
         # Show email during activation wait
         if progress.state == InstallUIState.WAITING_ACTIVATION:
@@ -216,6 +361,7 @@ class InstallerUI:
         self.yacht_name = yacht_name
         self.buyer_email = buyer_email
         self.window: Optional[InstallerWindow] = None
+        self.channel = ProgressChannel()
 
     def start(self, install_func: Callable):
         """
@@ -230,6 +376,7 @@ class InstallerUI:
             self.yacht_name,
             self.buyer_email
         )
+        self.window.attach(self.channel)
 
         # Start installation in background thread
         install_thread = threading.Thread(
@@ -242,11 +389,24 @@ class InstallerUI:
         # Run UI (blocks)
         self.window.run()
 
+    def follow(self, events: InstallEventStream) -> Callable[[], None]:
+        """
+        Drive the window from an orchestrator's event stream.
+
+        Returns:
+            Function that stops following
+        """
+        def on_event(event: InstallEvent):
+            progress = progress_from_event(event)
+            if progress is not None:
+                self.channel.publish(progress)
+
+        return events.subscribe(on_event)
+
     def _run_installation(self, install_func: Callable):
         """Run installation function with progress callback."""
-        def progress_callback(progress: InstallProgress):
-            if self.window:
-                self.window.root.after(0, self.window.update_progress, progress)
+        # Coalesced: the window drains the channel at its own frame rate
+        progress_callback = self.channel.publish
 
         try:
             install_func(progress_callback)
@@ -261,8 +421,6 @@ class InstallerUI:
 
 # Example usage
 if __name__ == "__main__":
-    import time
-
     def mock_installation(progress_callback):
         """Mock installation for testing."""
         steps = [
@@ -0,0 +1,294 @@
+"""
+CelesteOS Timing Instrumentation
+================================
+Opt-in spans and latency histograms for the installer, verifier and crypto
+hot paths.
+
+Instrumented:
+- installer.<phase>      InstallationOrchestrator phases
+- http.request           every Transport call, with connect / TTFB / total
+- keychain.<op>          KeychainStore store / retrieve / delete
+- crypto.sign_request    CryptoIdentity.sign_request
+- crypto.sign_body       CryptoIdentity.sign_body
+- crypto.registry_sign_body  IdentityRegistry.sign_body
+
+Enable with CELESTEOS_TRACE=1 in the environment or enable() at runtime.
+When disabled, span() returns a shared no-op context manager and traced()
+wrappers cost a single flag check before calling through.
+
+Export:
+- histograms()   per-name count / sum / min / max / p50 / p90 / p99 (ms)
+                 plus the raw bucket counts
+- export_otlp()  OpenTelemetry OTLP/JSON (resourceSpans) payload, ready to
+                 POST to a collector's /v1/traces endpoint
+"""
+
+import os
+import time
+import bisect
+import secrets
+import functools
+import threading
+import contextvars
+from collections import deque
+from typing import Optional, Dict, Any, List, Deque
+
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (
+    0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50,
+    100, 250, 500, 1000, 2500, 5000, 10000, float('inf'),
+)
+
+
+class _State:
+    enabled = os.environ.get('CELESTEOS_TRACE', '') not in ('', '0')
+
+
+_state = _State()
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar(
+    'celesteos_span', default=None
+)
+
+
+def enable():
+    """Start recording spans and histograms."""
+    _state.enabled = True
+
+
+def disable():
+    """Stop recording (already-recorded data is kept)."""
+    _state.enabled = False
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds)."""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.min = min(self.min, value_ms)
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (capped at max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total, 4),
+            'min_ms': round(self.min, 4) if self.count else 0.0,
+            'max_ms': round(self.max, 4),
+            'p50_ms': self.percentile(0.50),
+            'p90_ms': self.percentile(0.90),
+            'p99_ms': self.percentile(0.99),
+            'buckets': {str(b): n for b, n in zip(BUCKETS_MS, self.counts) if n},
+        }
+
+
+class Span:
+    """One timed operation."""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'error', '_token', '_t0')
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = 0
+        self.end_ns = 0
+
+    def set(self, **attributes: Any):
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._t0)
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _recorder.finish(self)
+        return False
+
+
+class _NoopSpan:
+    """Returned by span() while disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Recorder:
+    """Bounded store of finished spans plus per-name histograms."""
+
+    def __init__(self, max_spans: int = 10000):
+        self._lock = threading.Lock()
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self.histograms: Dict[str, Histogram] = {}
+
+    def finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            self._record(span.name, span.duration_ms)
+
+    def record(self, name: str, value_ms: float):
+        with self._lock:
+            self._record(name, value_ms)
+
+    def _record(self, name: str, value_ms: float):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.record(value_ms)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.histograms.clear()
+
+
+_recorder = _Recorder()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Time a block.
+
+    Usage:
+        with span('keychain.retrieve', backend='native') as s:
+            ...
+            s.set(hit=True)
+    """
+    if not _state.enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name: str, value_ms: float):
+    """Record a measurement into a histogram without creating a span."""
+    if _state.enabled:
+        _recorder.record(name, value_ms)
+
+
+def histograms() -> Dict[str, Dict[str, Any]]:
+    """Summaries of every histogram."""
+    with _recorder._lock:
+        return {name: h.summary() for name, h in sorted(_recorder.histograms.items())}
+
+
+def finished_spans() -> List[Span]:
+    """Snapshot of retained finished spans (oldest first)."""
+    with _recorder._lock:
+        return list(_recorder.spans)
+
+
+def reset():
+    """Drop recorded spans and histograms."""
+    _recorder.reset()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def export_otlp(service_name: str = 'celesteos-installer') -> Dict[str, Any]:
+    """
+    Finished spans as an OTLP/JSON ExportTraceServiceRequest.
+
+    Status code 2 (ERROR) is set on spans that raised.
+    """
+    spans = []
+    for s in finished_spans():
+        item = {
+            'traceId': s.trace_id,
+            'spanId': s.span_id,
+            'name': s.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(s.start_ns),
+            'endTimeUnixNano': str(s.end_ns),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in s.attributes.items()],
+            'status': {'code': 2, 'message': s.error} if s.error else {'code': 1},
+        }
+        if s.parent_id:
+            item['parentSpanId'] = s.parent_id
+        spans.append(item)
+
+    return {
+        'resourceSpans': [{
+            'resource': {
+                'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}],
+            },
+            'scopeSpans': [{
+                'scope': {'name': 'lib.instrumentation'},
+                'spans': spans,
+            }],
+        }],
+    }
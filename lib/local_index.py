@@ -0,0 +1,401 @@
+"""
+CelesteOS Local Vector Index
+============================
+On-yacht copy of yacht_documents embeddings for offline retrieval.
+
+At sea the satellite link is often down, yet every search otherwise goes to
+yacht_documents in the cloud. The agent keeps a local index that answers
+top-k queries from disk and catches up incrementally whenever the link is up.
+
+On-disk layout (one directory per yacht):
+    state.json   - dim, row count, sync cursor (updated_at, id)
+    vectors.f32  - row-major float32 matrix, rows unit-normalized
+    ids.i64      - yacht_documents.id per row
+    alive.u8     - 1 = live row, 0 = superseded or deleted
+    offsets.i64  - byte offset of each row's record in chunks.jsonl
+    chunks.jsonl - file_path, file_hash, chunk_index, chunk_text per row
+
+Startup only memory-maps these files; nothing is read until a query touches
+it. Search is exact (flat) cosine similarity: a single matrix-vector product
+over the mapped matrix, which answers top-k over tens of thousands of chunks
+in milliseconds.
+
+Sync:
+    Rows are pulled in (updated_at, id) order after the stored cursor.
+    A re-indexed row tombstones its previous position and is appended, so
+    files are only ever appended to. compact() rewrites them without
+    tombstones.
+
+Crash safety:
+    state.json is the commit point. upsert() appends and fsyncs the data
+    files, then replaces state.json (temp file + os.replace). Opening the
+    index truncates every file to what state.json records, so a batch
+    cut short by a crash is dropped and re-fetched from the cursor.
+    compact() commits an empty state with a reset cursor before deleting
+    the old files; a crash mid-compaction costs a full re-sync, never an
+    index that cannot be opened.
+
+Requires numpy.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable, Iterable, Tuple
+
+# numpy is imported on first LocalVectorIndex construction (see _load_numpy)
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("LocalVectorIndex requires numpy") from None
+        np = numpy
+
+
+# fetch(cursor, limit) -> rows ordered by (updated_at, id), each with
+# id, updated_at, file_path, file_hash, chunk_index, chunk_text, embedding
+RowFetcher = Callable[[Tuple[Optional[str], int], int], List[Dict[str, Any]]]
+
+
+class LocalVectorIndex:
+    """Memory-mapped flat vector index for one yacht."""
+
+    STATE_FILE = 'state.json'
+    # Array files and bytes per row (vectors.f32: per element, times dim)
+    ARRAY_FILES = (('vectors.f32', 4), ('ids.i64', 8), ('offsets.i64', 8), ('alive.u8', 1))
+
+    def __init__(self, path: Path, dim: int = 1536):
+        """
+        Open (or create) an index directory.
+
+        Args:
+            path: Index directory (e.g. ~/.celesteos/index/YACHT_001)
+            dim: Embedding dimension (text-embedding-3-small = 1536)
+        """
+        _load_numpy()
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        state = self._read_state()
+        self.dim = state.get('dim', dim)
+        self.count = state.get('count', 0)
+        self.cursor: Tuple[Optional[str], int] = (
+            state.get('cursor_updated_at'),
+            state.get('cursor_id', 0),
+        )
+
+        self._vectors = None
+        self._ids = None
+        self._alive = None
+        self._offsets = None
+        self._positions: Optional[Dict[int, int]] = None
+        self._truncate(state.get('chunks_bytes'))
+        self._map()
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        embedding: List[float],
+        k: int = 10,
+        min_similarity: float = 0.0,
+        with_text: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-k cosine similarity search.
+
+        Args:
+            embedding: Query embedding
+            k: Number of results
+            min_similarity: Drop results below this cosine similarity
+            with_text: Include chunk metadata and text from chunks.jsonl
+
+        Returns:
+            Results ordered by descending similarity, each with
+            id, similarity and (if with_text) the chunk record
+        """
+        if self.count == 0:
+            return []
+
+        # A copy: the caller's array is never normalized in place
+        query = np.array(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query /= norm
+
+        scores = self._vectors @ query
+        scores[self._alive == 0] = -np.inf
+
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for pos in top:
+            score = float(scores[pos])
+            if score == -np.inf or score < min_similarity:
+                break
+            result = {'id': int(self._ids[pos]), 'similarity': score}
+            if with_text:
+                result.update(self._record(int(pos)))
+            results.append(result)
+        return results
+
+    @property
+    def live_count(self) -> int:
+        """Number of live (non-tombstoned) rows."""
+        if self.count == 0:
+            return 0
+        return int(self._alive.sum())
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def sync(self, fetch: RowFetcher, batch_size: int = 500) -> int:
+        """
+        Pull rows changed since the stored cursor.
+
+        Args:
+            fetch: Row source, see RowFetcher
+            batch_size: Rows requested per fetch call
+
+        Returns:
+            Number of rows applied
+        """
+        applied = 0
+        while True:
+            rows = fetch(self.cursor, batch_size)
+            if not rows:
+                break
+            self.upsert(rows)
+            applied += len(rows)
+            last = rows[-1]
+            self.cursor = (last['updated_at'], int(last['id']))
+            self._write_state()
+            if len(rows) < batch_size:
+                break
+        return applied
+
+    def upsert(self, rows: Iterable[Dict[str, Any]]):
+        """Append rows, tombstoning any previous copy of the same id."""
+        rows = list(rows)
+        if not rows:
+            return
+
+        matrix = np.empty((len(rows), self.dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            embedding = row['embedding']
+            if isinstance(embedding, str):
+                # PostgREST returns pgvector columns as '[...]' text
+                embedding = json.loads(embedding)
+            matrix[i] = embedding
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        self.remove(int(row['id']) for row in rows)
+
+        ids = np.array([int(row['id']) for row in rows], dtype=np.int64)
+        offsets = np.empty(len(rows), dtype=np.int64)
+
+        chunks_path = self.path / 'chunks.jsonl'
+        with open(chunks_path, 'ab') as f:
+            for i, row in enumerate(rows):
+                offsets[i] = f.tell()
+                record = {
+                    'file_path': row.get('file_path'),
+                    'file_hash': row.get('file_hash'),
+                    'chunk_index': row.get('chunk_index'),
+                    'chunk_text': row.get('chunk_text'),
+                }
+                f.write(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._append('vectors.f32', matrix)
+        self._append('ids.i64', ids)
+        self._append('offsets.i64', offsets)
+        self._append('alive.u8', np.ones(len(rows), dtype=np.uint8))
+
+        positions = self._position_map()
+        for i, row_id in enumerate(ids):
+            positions[int(row_id)] = self.count + i
+
+        self.count += len(rows)
+        self._write_state()
+        self._map()
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Tombstone rows by yacht_documents.id. Returns rows removed."""
+        positions = self._position_map()
+        removed = 0
+        for row_id in ids:
+            pos = positions.pop(row_id, None)
+            if pos is not None:
+                self._alive[pos] = 0
+                removed += 1
+        if removed:
+            self._alive.flush()
+        return removed
+
+    def retain(self, live_ids: Iterable[int]) -> int:
+        """
+        Tombstone every row whose id is not in live_ids.
+
+        Deletions in the cloud leave no updated_at trail, so the agent
+        periodically reconciles against the current id list.
+        """
+        keep = set(live_ids)
+        return self.remove([i for i in self._position_map() if i not in keep])
+
+    def compact(self):
+        """Rewrite index files without tombstoned rows."""
+        if self.count == 0:
+            return
+
+        live = np.flatnonzero(self._alive)
+        records = [self._record(int(pos)) for pos in live]
+        vectors = np.array(self._vectors[live])
+        ids = np.array(self._ids[live])
+
+        # Commit an empty index with the cursor reset before deleting
+        # anything: a crash from here until upsert() writes the compacted
+        # state leaves an index that opens empty and re-syncs from scratch
+        cursor = self.cursor
+        self._close()
+        self.count = 0
+        self.cursor = (None, 0)
+        self._write_state()
+        for name in ('vectors.f32', 'ids.i64', 'offsets.i64', 'alive.u8', 'chunks.jsonl'):
+            (self.path / name).unlink(missing_ok=True)
+        self.cursor = cursor
+        self._positions = {}
+        self._map()
+
+        self.upsert(
+            dict(record, id=int(row_id), embedding=vector)
+            for record, row_id, vector in zip(records, ids, vectors)
+        )
+
+    # ------------------------------------------------------------------
+    # Storage helpers
+    # ------------------------------------------------------------------
+
+    def _read_state(self) -> Dict[str, Any]:
+        state_path = self.path / self.STATE_FILE
+        if not state_path.exists():
+            return {}
+        with open(state_path) as f:
+            return json.load(f)
+
+    def _write_state(self):
+        state_path = self.path / self.STATE_FILE
+        tmp_path = state_path.with_suffix('.tmp')
+        chunks_path = self.path / 'chunks.jsonl'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'dim': self.dim,
+                'count': self.count,
+                'chunks_bytes': chunks_path.stat().st_size if chunks_path.exists() else 0,
+                'cursor_updated_at': self.cursor[0],
+                'cursor_id': self.cursor[1],
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, state_path)
+
+    def _append(self, name: str, array):
+        with open(self.path / name, 'ab') as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate(self, chunks_bytes: Optional[int]):
+        """Cut every file back to what state.json commits (drops a torn append)."""
+        sizes = [(name, self.count * width * (self.dim if name == 'vectors.f32' else 1))
+                 for name, width in self.ARRAY_FILES]
+        if chunks_bytes is not None:
+            sizes.append(('chunks.jsonl', chunks_bytes))
+        for name, size in sizes:
+            file_path = self.path / name
+            if file_path.exists() and file_path.stat().st_size > size:
+                os.truncate(file_path, size)
+
+    def _map(self):
+        """Memory-map the first self.count rows of every array file."""
+        self._close()
+        if self.count == 0:
+            return
+        self._vectors = np.memmap(self.path / 'vectors.f32', dtype=np.float32, mode='r',
+                                  shape=(self.count, self.dim))
+        self._ids = np.memmap(self.path / 'ids.i64', dtype=np.int64, mode='r',
+                              shape=(self.count,))
+        self._offsets = np.memmap(self.path / 'offsets.i64', dtype=np.int64, mode='r',
+                                  shape=(self.count,))
+        self._alive = np.memmap(self.path / 'alive.u8', dtype=np.uint8, mode='r+',
+                                shape=(self.count,))
+
+    def _close(self):
+        if self._alive is not None:
+            self._alive.flush()
+        self._vectors = self._ids = self._offsets = self._alive = None
+
+    def _position_map(self) -> Dict[int, int]:
+        """id -> row position for live rows (built on first write, not at startup)."""
+        if self._positions is None:
+            self._positions = {}
+            if self.count:
+                for pos in np.flatnonzero(self._alive):
+                    self._positions[int(self._ids[pos])] = int(pos)
+        return self._positions
+
+    def _record(self, pos: int) -> Dict[str, Any]:
+        with open(self.path / 'chunks.jsonl', 'rb') as f:
+            f.seek(int(self._offsets[pos]))
+            return json.loads(f.readline())
+
+
+def supabase_fetcher(api_endpoint: str, api_key: str, yacht_id: str) -> RowFetcher:
+    """
+    Build a RowFetcher reading yacht_documents through PostgREST.
+
+    Uses keyset pagination on (updated_at, id) so rows sharing an
+    updated_at value are never skipped across page boundaries.
+    """
+    from .transport import Transport
+
+    transport = Transport(headers={
+        'apikey': api_key,
+        'Authorization': f'Bearer {api_key}',
+    }, timeout=(5, 60))
+    url = f"{api_endpoint.rstrip('/')}/rest/v1/yacht_documents"
+
+    def fetch(cursor: Tuple[Optional[str], int], limit: int) -> List[Dict[str, Any]]:
+        updated_at, last_id = cursor
+        params = {
+            'select': 'id,updated_at,file_path,file_hash,chunk_index,chunk_text,embedding',
+            'yacht_id': f'eq.{yacht_id}',
+            'embedding': 'not.is.null',
+            'order': 'updated_at.asc,id.asc',
+            'limit': str(limit),
+        }
+        if updated_at is not None:
+            params['or'] = (
+                f'(updated_at.gt.{updated_at},'
+                f'and(updated_at.eq.{updated_at},id.gt.{last_id}))'
+            )
+        resp = transport.get(url, params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    return fetch
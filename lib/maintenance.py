@@ -0,0 +1,180 @@
+"""
+CelesteOS Database Maintenance
+==============================
+Scheduled housekeeping for the Cloud HQ database, run through PostgREST
+RPC with the service-role key.
+
+Tasks:
+- partitions: create monthly audit_log / security_events partitions for
+  the current month and the next N (run daily; idempotent)
+- retention:  drop event partitions older than the retention window
+- fleet-status: refresh the precomputed fleet_status table (incremental
+  by default; --full recomputes every yacht)
+- indexing-jobs: delete finished indexing jobs past --keep-days and
+  dead-letter jobs abandoned on their final attempt
+
+Usage:
+    export SUPABASE_URL=https://xxx.supabase.co
+    export SUPABASE_SERVICE_ROLE_KEY=...
+    python -m lib.maintenance partitions [--months-ahead 3]
+    python -m lib.maintenance retention [--audit-keep-months 12] [--security-keep-months 24]
+    python -m lib.maintenance fleet-status [--full]
+    python -m lib.maintenance indexing-jobs [--keep-days 7]
+"""
+
+import os
+import sys
+from typing import Dict, Any, List
+
+from .transport import Transport
+
+
+class MaintenanceClient:
+    """Calls maintenance functions over PostgREST RPC."""
+
+    def __init__(self, api_endpoint: str, service_key: str, timeout: float = 120):
+        """
+        Initialize client.
+
+        Args:
+            api_endpoint: Supabase project URL
+            service_key: Service-role key (maintenance RPCs are not granted to anon)
+            timeout: Read timeout in seconds (partition moves can take a while)
+        """
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self._transport = Transport(headers={
+            'apikey': service_key,
+            'Authorization': f'Bearer {service_key}',
+            'Content-Type': 'application/json',
+        }, timeout=(5, timeout))
+
+    def rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        """
+        Call a database function.
+
+        Returns:
+            Decoded JSON: a list of rows for set-returning functions, a bare
+            value for scalar ones
+
+        Raises:
+            RuntimeError: On a non-200 response
+            TransportError: On network failure
+        """
+        resp = self._transport.post(f"{self.api_endpoint}/rest/v1/rpc/{function}", json=params)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{function} failed: {resp.status_code} {resp.text[:300]}")
+        return resp.json()
+
+    def create_event_partitions(self, months_ahead: int = 3) -> List[Dict[str, Any]]:
+        """
+        Ensure monthly event partitions exist through `months_ahead`.
+
+        Returns:
+            [{'partition_name': ..., 'created': bool}, ...]
+        """
+        return self.rpc('create_event_partitions', {'p_months_ahead': months_ahead}) or []
+
+    def drop_expired_event_partitions(
+        self,
+        audit_keep_months: int = 12,
+        security_keep_months: int = 24
+    ) -> List[str]:
+        """
+        Drop event partitions past retention.
+
+        Returns:
+            Names of dropped partitions
+        """
+        rows = self.rpc('drop_expired_event_partitions', {
+            'p_audit_keep_months': audit_keep_months,
+            'p_security_keep_months': security_keep_months,
+        })
+        return [row['partition_name'] for row in rows or []]
+
+    def refresh_fleet_status(self, full: bool = False) -> int:
+        """
+        Refresh fleet_status.
+
+        Args:
+            full: Recompute every yacht instead of only those touched since
+                the last refresh
+
+        Returns:
+            Number of yachts recomputed
+        """
+        return int(self.rpc('refresh_fleet_status', {'p_full': full}) or 0)
+
+    def prune_indexing_jobs(self, keep_days: int = 7) -> int:
+        """
+        Prune the indexing queue.
+
+        Returns:
+            Number of finished jobs deleted
+        """
+        return int(self.rpc('prune_indexing_jobs', {'p_keep_days': keep_days}) or 0)
+
+    def close(self):
+        self._transport.close()
+
+
+def _client_from_env() -> MaintenanceClient:
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not key:
+        print("✗ SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set", file=sys.stderr)
+        sys.exit(2)
+    return MaintenanceClient(url, key)
+
+
+def main():
+    """CLI entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CelesteOS database maintenance")
+    sub = parser.add_subparsers(dest='task', required=True)
+
+    p = sub.add_parser('partitions', help='Create upcoming monthly event partitions')
+    p.add_argument('--months-ahead', type=int, default=3)
+
+    r = sub.add_parser('retention', help='Drop event partitions past retention')
+    r.add_argument('--audit-keep-months', type=int, default=12)
+    r.add_argument('--security-keep-months', type=int, default=24)
+
+    f = sub.add_parser('fleet-status', help='Refresh the fleet_status table')
+    f.add_argument('--full', action='store_true', help='Recompute every yacht')
+
+    j = sub.add_parser('indexing-jobs', help='Prune finished indexing jobs')
+    j.add_argument('--keep-days', type=int, default=7)
+
+    args = parser.parse_args()
+    client = _client_from_env()
+
+    try:
+        if args.task == 'partitions':
+            rows = client.create_event_partitions(args.months_ahead)
+            created = [r['partition_name'] for r in rows if r.get('created')]
+            print(f"✓ {len(rows)} partitions checked, {len(created)} created")
+            for name in created:
+                print(f"  + {name}")
+
+        elif args.task == 'retention':
+            dropped = client.drop_expired_event_partitions(
+                args.audit_keep_months, args.security_keep_months
+            )
+            print(f"✓ {len(dropped)} partitions dropped")
+            for name in dropped:
+                print(f"  - {name}")
+
+        elif args.task == 'fleet-status':
+            count = client.refresh_fleet_status(args.full)
+            print(f"✓ fleet_status refreshed ({count} yachts recomputed)")
+
+        elif args.task == 'indexing-jobs':
+            count = client.prune_indexing_jobs(args.keep_days)
+            print(f"✓ {count} finished indexing jobs pruned")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+"""
+CelesteOS Query Result Cache
+============================
+Per-yacht cache for repeated crew questions.
+
+Crews ask the same things over and over ("generator start procedure",
+"watermaker flush"). Each question normally pays one embedding call plus an
+HNSW search over yacht_documents. This cache short-circuits both:
+
+Lookup order:
+1. Exact match on normalized query text  -> skips embedding AND search
+2. Near-duplicate embedding (cosine >= threshold) -> skips search
+3. Miss -> embed + search, result stored
+
+Near-duplicate matching keeps each partition's unit embeddings in one
+float32 matrix, so a lookup is a single matrix-vector product however many
+entries are cached.
+
+Invalidation:
+    Every entry is tagged with the yacht's documents_version, a fingerprint
+    of (file_hash, updated_at) over yacht_documents. When a lookup arrives
+    with a different version, the whole yacht partition is dropped, so a
+    re-indexed manual can never serve stale chunks.
+
+    Computing the version costs a query of its own. Pass a callable as
+    `version` and the cache calls it at most once per version_ttl seconds
+    per yacht; a passed string is used as-is, and then keeping it cheap is
+    the caller's job. Either way a change becomes visible within
+    version_ttl, or immediately through invalidate().
+
+Eviction:
+    Entries expire after ttl seconds; each yacht partition is LRU-bounded
+    to max_entries.
+
+Requires numpy.
+"""
+
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable, Iterable, Tuple, Union
+
+# numpy is imported on first QueryCache construction (see _load_numpy)
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("QueryCache requires numpy") from None
+        np = numpy
+
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCT = re.compile(r'[\s?!.]+$')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text for exact matching (case, whitespace, trailing punctuation)."""
+    text = _WHITESPACE.sub(' ', query.strip().lower())
+    return _TRAILING_PUNCT.sub('', text)
+
+
+def documents_version(rows: Iterable[Tuple[str, str]]) -> str:
+    """
+    Fingerprint a yacht's document set.
+
+    Args:
+        rows: (file_hash, updated_at) pairs, e.g. from
+              SELECT DISTINCT file_hash, max(updated_at) ... GROUP BY file_hash
+
+    Returns:
+        SHA256 hex digest; changes whenever any document is added,
+        removed or re-indexed.
+    """
+    digest = hashlib.sha256()
+    for file_hash, updated_at in sorted((str(h), str(u)) for h, u in rows):
+        digest.update(f"{file_hash}:{updated_at}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _unit(vector: List[float]):
+    """Return vector as float32 scaled to unit length (cosine becomes a dot product)."""
+    unit = np.array(vector, dtype=np.float32)
+    norm = np.linalg.norm(unit)
+    if norm:
+        unit /= norm
+    return unit
+
+
+@dataclass
+class _Entry:
+    """Cached search result."""
+    query: str
+    results: Any
+    created_at: float
+    embed_seconds: float
+    search_seconds: float
+
+
+@dataclass
+class _YachtPartition:
+    """
+    All cached entries for one yacht.
+
+    Unit embeddings live in rows of `matrix`; `rows` maps an entry key to
+    its row and `keys` maps a row back to its key (None = free row).
+    """
+    version: str
+    entries: 'OrderedDict[str, _Entry]' = field(default_factory=OrderedDict)
+    matrix: Any = None
+    rows: Dict[str, int] = field(default_factory=dict)
+    keys: List[Optional[str]] = field(default_factory=list)
+    free: List[int] = field(default_factory=list)
+
+    def remove(self, key: str):
+        """Drop an entry and free its embedding row."""
+        self.entries.pop(key, None)
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.keys[row] = None
+            self.free.append(row)
+
+    def add_embedding(self, key: str, unit, max_rows: int):
+        """Store `key`'s unit embedding, growing the matrix by doubling up to max_rows."""
+        if self.matrix is None:
+            self.matrix = np.zeros((min(16, max_rows), len(unit)), dtype=np.float32)
+        elif self.matrix.shape[1] != len(unit):
+            # Another embedding model; this entry is only found by exact match
+            return
+        if not self.free:
+            used = len(self.keys)
+            if used == len(self.matrix):
+                grown = np.zeros((min(2 * used, max_rows), self.matrix.shape[1]), dtype=np.float32)
+                grown[:used] = self.matrix
+                self.matrix = grown
+            self.keys.append(None)
+            self.free.append(used)
+        row = self.free.pop()
+        self.matrix[row] = unit
+        self.keys[row] = key
+        self.rows[key] = row
+
+    def best_match(self, unit, threshold: float) -> Optional[str]:
+        """Key of the most similar embedding scoring at least threshold, if any."""
+        if not self.rows or self.matrix.shape[1] != len(unit):
+            return None
+        used = len(self.keys)
+        scores = self.matrix[:used] @ unit
+        for row in self.free:
+            scores[row] = -np.inf
+        row = int(np.argmax(scores))
+        if scores[row] < threshold:
+            return None
+        return self.keys[row]
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters and latency saved."""
+    exact_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+    latency_saved_seconds: float = 0.0
+
+    @property
+    def lookups(self) -> int:
+        return self.exact_hits + self.similar_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        if not self.lookups:
+            return 0.0
+        return (self.exact_hits + self.similar_hits) / self.lookups
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'lookups': self.lookups,
+            'exact_hits': self.exact_hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+            'latency_saved_seconds': round(self.latency_saved_seconds, 3),
+        }
+
+
+class QueryCache:
+    """Per-yacht semantic query cache with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        max_entries: int = 512,
+        similarity_threshold: float = 0.97,
+        version_ttl: float = 60,
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            ttl: Seconds an entry stays valid
+            max_entries: LRU bound per yacht
+            similarity_threshold: Minimum cosine similarity for a near-duplicate hit
+            version_ttl: Seconds a documents_version from a version callable
+                is reused before it is fetched again
+        """
+        _load_numpy()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.version_ttl = version_ttl
+        self.stats = CacheStats()
+        self._partitions: Dict[str, _YachtPartition] = {}
+        # yacht_id -> (version, fetched at) for version callables
+        self._versions: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_search(
+        self,
+        yacht_id: str,
+        query: str,
+        version: Union[str, Callable[[], str]],
+        embed: Callable[[str], List[float]],
+        search: Callable[[List[float]], Any],
+    ) -> Any:
+        """
+        Return cached results or run embed + search.
+
+        Args:
+            yacht_id: Yacht whose documents are searched
+            query: Raw crew question
+            version: Current documents_version() for the yacht, or a
+                function returning it (called at most once per version_ttl)
+            embed: Function mapping query text to an embedding
+            search: Function mapping an embedding to search results
+
+        Returns:
+            Search results (cached or fresh)
+        """
+        key = normalize_query(query)
+        if callable(version):
+            version = self._current_version(yacht_id, version)
+
+        with self._lock:
+            entry = self._get_exact(yacht_id, key, version)
+            if entry is not None:
+                self.stats.exact_hits += 1
+                self.stats.latency_saved_seconds += entry.embed_seconds + entry.search_seconds
+                return entry.results
+
+        start = time.perf_counter()
+        embedding = embed(query)
+        embed_seconds = time.perf_counter() - start
+        unit = _unit(embedding)
+
+        with self._lock:
+            entry = self._get_similar(yacht_id, unit, version)
+            if entry is not None:
+                self.stats.similar_hits += 1
+                self.stats.latency_saved_seconds += entry.search_seconds
+                return entry.results
+
+        start = time.perf_counter()
+        results = search(embedding)
+        search_seconds = time.perf_counter() - start
+
+        with self._lock:
+            self.stats.misses += 1
+            self._store(yacht_id, key, version, unit, _Entry(
+                query=key,
+                results=results,
+                created_at=time.monotonic(),
+                embed_seconds=embed_seconds,
+                search_seconds=search_seconds,
+            ))
+
+        return results
+
+    def invalidate(self, yacht_id: str):
+        """Drop every cached entry for a yacht."""
+        with self._lock:
+            self._versions.pop(yacht_id, None)
+            if self._partitions.pop(yacht_id, None) is not None:
+                self.stats.invalidations += 1
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._partitions.clear()
+            self._versions.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(p.entries) for p in self._partitions.values())
+
+    def _current_version(self, yacht_id: str, fetch: Callable[[], str]) -> str:
+        with self._lock:
+            cached = self._versions.get(yacht_id)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.version_ttl:
+            return cached[0]
+        # Fetched outside the lock: it is a database round trip
+        version = fetch()
+        with self._lock:
+            self._versions[yacht_id] = (version, now)
+        return version
+
+    # Internal helpers (caller holds self._lock)
+
+    def _partition(self, yacht_id: str, version: str) -> _YachtPartition:
+        partition = self._partitions.get(yacht_id)
+        if partition is None or partition.version != version:
+            if partition is not None:
+                self.stats.invalidations += 1
+            partition = _YachtPartition(version=version)
+            self._partitions[yacht_id] = partition
+        return partition
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created_at > self.ttl
+
+    def _get_exact(self, yacht_id: str, key: str, version: str) -> Optional[_Entry]:
+        partition = self._partition(yacht_id, version)
+        entry = partition.entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            partition.remove(key)
+            self.stats.evictions += 1
+            return None
+        partition.entries.move_to_end(key)
+        return entry
+
+    def _get_similar(
+        self,
+        yacht_id: str,
+        unit,
+        version: str,
+    ) -> Optional[_Entry]:
+        partition = self._partition(yacht_id, version)
+
+        # Entries are in LRU order, not age order, so check every one
+        expired = [key for key, entry in partition.entries.items() if self._expired(entry)]
+        for key in expired:
+            partition.remove(key)
+        self.stats.evictions += len(expired)
+
+        best_key = partition.best_match(unit, self.similarity_threshold)
+        if best_key is None:
+            return None
+        partition.entries.move_to_end(best_key)
+        return partition.entries[best_key]
+
+    def _store(self, yacht_id: str, key: str, version: str, unit, entry: _Entry):
+        partition = self._partition(yacht_id, version)
+        partition.remove(key)
+        partition.entries[key] = entry
+        # One row over max_entries: the oldest entry is evicted right after
+        partition.add_embedding(key, unit, self.max_entries + 1)
+        while len(partition.entries) > self.max_entries:
+            partition.remove(next(iter(partition.entries)))
+            self.stats.evictions += 1
@@ -0,0 +1,321 @@
+"""
+CelesteOS Secret Storage Backends
+=================================
+Pluggable storage for the yacht's shared_secret.
+
+Backends:
+- NativeKeychainBackend: macOS Security framework via pyobjc
+  (SecItemAdd / SecItemCopyMatching), no process spawn
+- SecurityCLIBackend:    macOS security(1) command (fallback when pyobjc
+  is not bundled); one fork/exec per call
+- EncryptedFileBackend:  encrypted JSON file, for Linux development and CI
+
+CachedSecretStore wraps any backend with a short-lived in-process cache,
+so repeated credential reads cost a dict lookup instead of a Keychain
+round-trip. Writes and deletes go through to the backend immediately.
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+
+
+class SecretBackend(ABC):
+    """Interface for secret storage keyed by (service, account)."""
+
+    @abstractmethod
+    def store(self, service: str, account: str, secret: str) -> bool:
+        """Store or replace a secret. Returns True on success."""
+
+    @abstractmethod
+    def retrieve(self, service: str, account: str) -> Optional[str]:
+        """Return the secret, or None if not found."""
+
+    @abstractmethod
+    def delete(self, service: str, account: str) -> bool:
+        """Delete a secret. Returns True if it existed and was removed."""
+
+
+class SecurityCLIBackend(SecretBackend):
+    """macOS Keychain through the security(1) command."""
+
+    def store(self, service: str, account: str, secret: str) -> bool:
+        import subprocess
+
+        # -U updates an existing item in place, so no separate delete is needed
+        result = subprocess.run(
+            [
+                'security', 'add-generic-password',
+                '-s', service,
+                '-a', account,
+                '-w', secret,
+                '-U'
+            ],
+            capture_output=True
+        )
+        return result.returncode == 0
+
+    def retrieve(self, service: str, account: str) -> Optional[str]:
+        import subprocess
+
+        result = subprocess.run(
+            ['security', 'find-generic-password', '-s', service, '-a', account, '-w'],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+        return None
+
+    def delete(self, service: str, account: str) -> bool:
+        import subprocess
+
+        result = subprocess.run(
+            ['security', 'delete-generic-password', '-s', service, '-a', account],
+            capture_output=True
+        )
+        return result.returncode == 0
+
+
+class NativeKeychainBackend(SecretBackend):
+    """
+    macOS Keychain through the Security framework.
+
+    Requires pyobjc-framework-Security.
+    """
+
+    # OSStatus codes from SecBase.h
+    ERR_SEC_SUCCESS = 0
+    ERR_SEC_DUPLICATE_ITEM = -25299
+    ERR_SEC_ITEM_NOT_FOUND = -25300
+
+    def __init__(self):
+        import Security
+
+        self._sec = Security
+
+    def _query(self, service: str, account: str) -> Dict:
+        sec = self._sec
+        return {
+            sec.kSecClass: sec.kSecClassGenericPassword,
+            sec.kSecAttrService: service,
+            sec.kSecAttrAccount: account,
+        }
+
+    def store(self, service: str, account: str, secret: str) -> bool:
+        sec = self._sec
+        data = secret.encode('utf-8')
+
+        attrs = self._query(service, account)
+        attrs[sec.kSecValueData] = data
+        status, _ = sec.SecItemAdd(attrs, None)
+
+        if status == self.ERR_SEC_DUPLICATE_ITEM:
+            status = sec.SecItemUpdate(
+                self._query(service, account),
+                {sec.kSecValueData: data}
+            )
+
+        return status == self.ERR_SEC_SUCCESS
+
+    def retrieve(self, service: str, account: str) -> Optional[str]:
+        sec = self._sec
+        query = self._query(service, account)
+        query[sec.kSecReturnData] = True
+        query[sec.kSecMatchLimit] = sec.kSecMatchLimitOne
+
+        status, data = sec.SecItemCopyMatching(query, None)
+        if status != self.ERR_SEC_SUCCESS or data is None:
+            return None
+        return bytes(data).decode('utf-8')
+
+    def delete(self, service: str, account: str) -> bool:
+        status = self._sec.SecItemDelete(self._query(service, account))
+        return status == self.ERR_SEC_SUCCESS
+
+
+class EncryptedFileBackend(SecretBackend):
+    """
+    Secrets in an encrypted JSON file (Linux development and CI).
+
+    Each value is encrypted with an HMAC-SHA256 counter-mode keystream and
+    authenticated with a separate HMAC-SHA256 tag (encrypt-then-MAC), using
+    only the standard library. The 256-bit key comes from the
+    CELESTEOS_SECRET_KEY environment variable (hex) or a 0600 key file
+    created next to the store.
+
+    Not a substitute for the Keychain on production yachts.
+    """
+
+    NONCE_SIZE = 16
+    TAG_SIZE = 32
+
+    def __init__(self, path: Optional[Path] = None, key: Optional[bytes] = None):
+        """
+        Initialize file backend.
+
+        Args:
+            path: Store location (default ~/.celesteos/secrets.json)
+            key: 32-byte master key (default: env var or key file)
+        """
+        self.path = Path(path) if path else Path.home() / '.celesteos' / 'secrets.json'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        master = key or self._load_key()
+        self._enc_key = hmac.new(master, b'celesteos-enc', hashlib.sha256).digest()
+        self._mac_key = hmac.new(master, b'celesteos-mac', hashlib.sha256).digest()
+        self._lock = threading.Lock()
+
+    def store(self, service: str, account: str, secret: str) -> bool:
+        with self._lock:
+            data = self._read()
+            data.setdefault(service, {})[account] = self._encrypt(secret.encode('utf-8'))
+            self._write(data)
+        return True
+
+    def retrieve(self, service: str, account: str) -> Optional[str]:
+        with self._lock:
+            token = self._read().get(service, {}).get(account)
+        if token is None:
+            return None
+        plaintext = self._decrypt(token)
+        return plaintext.decode('utf-8') if plaintext is not None else None
+
+    def delete(self, service: str, account: str) -> bool:
+        with self._lock:
+            data = self._read()
+            if account not in data.get(service, {}):
+                return False
+            del data[service][account]
+            self._write(data)
+        return True
+
+    def _load_key(self) -> bytes:
+        env_key = os.environ.get('CELESTEOS_SECRET_KEY')
+        if env_key:
+            return bytes.fromhex(env_key)
+
+        key_path = self.path.with_suffix('.key')
+        if key_path.exists():
+            return bytes.fromhex(key_path.read_text().strip())
+
+        key = secrets.token_bytes(32)
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(key.hex())
+        return key
+
+    def _keystream(self, nonce: bytes, length: int) -> bytes:
+        blocks = []
+        for counter in range((length + 31) // 32):
+            blocks.append(hmac.new(
+                self._enc_key,
+                nonce + counter.to_bytes(8, 'big'),
+                hashlib.sha256
+            ).digest())
+        return b''.join(blocks)[:length]
+
+    def _encrypt(self, plaintext: bytes) -> str:
+        nonce = secrets.token_bytes(self.NONCE_SIZE)
+        stream = self._keystream(nonce, len(plaintext))
+        ciphertext = bytes(a ^ b for a, b in zip(plaintext, stream))
+        tag = hmac.new(self._mac_key, nonce + ciphertext, hashlib.sha256).digest()
+        return base64.b64encode(nonce + ciphertext + tag).decode('ascii')
+
+    def _decrypt(self, token: str) -> Optional[bytes]:
+        raw = base64.b64decode(token)
+        nonce = raw[:self.NONCE_SIZE]
+        ciphertext = raw[self.NONCE_SIZE:-self.TAG_SIZE]
+        tag = raw[-self.TAG_SIZE:]
+        expected = hmac.new(self._mac_key, nonce + ciphertext, hashlib.sha256).digest()
+        if not hmac.compare_digest(tag, expected):
+            return None
+        stream = self._keystream(nonce, len(ciphertext))
+        return bytes(a ^ b for a, b in zip(ciphertext, stream))
+
+    def _read(self) -> Dict[str, Dict[str, str]]:
+        if not self.path.exists():
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _write(self, data: Dict[str, Dict[str, str]]):
+        tmp_path = self.path.with_suffix('.tmp')
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+class CachedSecretStore(SecretBackend):
+    """Short-lived in-process cache in front of another backend."""
+
+    def __init__(self, backend: SecretBackend, ttl: float = 60):
+        """
+        Args:
+            backend: Backend holding the authoritative copy
+            ttl: Seconds a retrieved secret is served from memory
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def store(self, service: str, account: str, secret: str) -> bool:
+        ok = self.backend.store(service, account, secret)
+        with self._lock:
+            if ok:
+                self._cache[(service, account)] = (secret, time.monotonic() + self.ttl)
+            else:
+                self._cache.pop((service, account), None)
+        return ok
+
+    def retrieve(self, service: str, account: str) -> Optional[str]:
+        key = (service, account)
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and hit[1] > time.monotonic():
+                return hit[0]
+
+        # Misses are not cached: a secret stored by another process
+        # must become visible on the next read.
+        secret = self.backend.retrieve(service, account)
+        with self._lock:
+            if secret is not None:
+                self._cache[key] = (secret, time.monotonic() + self.ttl)
+            else:
+                self._cache.pop(key, None)
+        return secret
+
+    def delete(self, service: str, account: str) -> bool:
+        with self._lock:
+            self._cache.pop((service, account), None)
+        return self.backend.delete(service, account)
+
+    def clear(self):
+        """Drop all cached secrets."""
+        with self._lock:
+            self._cache.clear()
+
+
+def default_backend() -> SecretBackend:
+    """
+    Pick the best backend for this platform.
+
+    macOS: native Security framework, falling back to security(1)
+    Other: encrypted file under ~/.celesteos
+    """
+    if sys.platform == 'darwin':
+        try:
+            return NativeKeychainBackend()
+        except ImportError:
+            return SecurityCLIBackend()
+    return EncryptedFileBackend()
@@ -0,0 +1,375 @@
+"""
+CelesteOS HTTP Transport
+========================
+Single HTTP layer shared by the installer, verifier and uploader.
+
+Provides:
+- Pooled keep-alive connections (one pool per transport, reused across calls)
+- Default (connect, read) timeouts on every call
+- Retry with exponential backoff:
+    * connection failures are retried for every method (nothing was sent)
+    * read failures and 429/5xx responses are retried only for
+      idempotent methods (GET, HEAD, PUT, DELETE, OPTIONS)
+  POST is never replayed after the request reached the server, so
+  one-time operations such as check-activation are safe.
+- Sync face (Transport) on requests/urllib3
+- Async face (AsyncTransport) on httpx, with optional HTTP/2
+
+All network failures surface as TransportError, so callers do not depend
+on the underlying HTTP library. requests, httpx and asyncio are imported
+when a transport is constructed, not when this module is imported, so the
+installer and CLI start without paying for them.
+
+With instrumentation enabled (lib.instrumentation) every call is recorded
+as an `http.request` span carrying connect, time-to-first-byte and total
+milliseconds; connect is 0 when a pooled connection was reused.
+"""
+
+import time
+import random
+import functools
+import threading
+from urllib.parse import urlsplit
+from typing import Optional, Dict, Any, Tuple, Union, TYPE_CHECKING
+
+from .instrumentation import is_enabled, span, record
+
+if TYPE_CHECKING:
+    import requests
+
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class TransportError(Exception):
+    """Network-level failure after retries were exhausted."""
+    pass
+
+
+def backoff_delay(attempt: int, backoff: float, retry_after: Optional[str] = None) -> float:
+    """
+    Delay before retry number `attempt` (0-based).
+
+    Honors a numeric Retry-After header, otherwise exponential backoff
+    with full jitter.
+    """
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, backoff * (2 ** attempt))
+
+
+# Seconds spent in the most recent connect() on this thread (None = reused)
+_connect_timing = threading.local()
+
+
+@functools.lru_cache(maxsize=None)
+def _timed_pool_classes() -> Dict[str, type]:
+    """urllib3 pool classes whose connections record connect() duration."""
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedHTTPConnection(HTTPConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            _connect_timing.seconds = time.perf_counter() - start
+
+    class TimedHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            _connect_timing.seconds = time.perf_counter() - start
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    return {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+def _span_url(url: str) -> str:
+    """URL without query string (tokens and keys stay out of traces)."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def _record_http(timing, status: int, connect: Optional[float], ttfb: float, total: float):
+    connect_ms = (connect or 0.0) * 1000
+    timing.set(**{
+        'http.status_code': status,
+        'http.connect_ms': round(connect_ms, 3),
+        'http.ttfb_ms': round(ttfb * 1000, 3),
+        'http.total_ms': round(total * 1000, 3),
+        'http.connection_reused': connect is None,
+    })
+    if connect is not None:
+        record('http.connect', connect_ms)
+    record('http.ttfb', ttfb * 1000)
+
+
+class Transport:
+    """Synchronous pooled HTTP transport."""
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = (5, 30),
+        pool_size: int = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+    ):
+        """
+        Initialize transport.
+
+        Args:
+            headers: Default headers sent with every request
+            timeout: Default (connect, read) timeout in seconds
+            pool_size: Keep-alive connections kept per host
+            retries: Maximum retries per request
+            backoff: Base backoff in seconds (doubles per attempt)
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self._request_exception = requests.RequestException
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            allowed_methods=IDEMPOTENT_METHODS,
+            status_forcelist=RETRY_STATUSES,
+            backoff_factor=backoff,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        class TimedAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = _timed_pool_classes()
+
+        adapter = TimedAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+
+        self._session = requests.Session()
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        if headers:
+            self._session.headers.update(headers)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Default headers (mutable)."""
+        return self._session.headers
+
+    def request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        """
+        Send a request.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            **kwargs: Passed to requests (json, data, headers, params, timeout, stream)
+
+        Raises:
+            TransportError: On network failure after retries
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if is_enabled():
+            return self._timed_request(method, url, **kwargs)
+        try:
+            return self._session.request(method, url, **kwargs)
+        except self._request_exception as e:
+            raise TransportError(str(e)) from e
+
+    def _timed_request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        """request() wrapped in an http.request span."""
+        with span('http.request', **{'http.method': method, 'http.url': _span_url(url)}) as timing:
+            _connect_timing.seconds = None
+            start = time.perf_counter()
+            try:
+                resp = self._session.request(method, url, **kwargs)
+            except self._request_exception as e:
+                raise TransportError(str(e)) from e
+            # requests sets elapsed once response headers are parsed
+            _record_http(timing, resp.status_code, _connect_timing.seconds,
+                         resp.elapsed.total_seconds(), time.perf_counter() - start)
+            return resp
+
+    def get(self, url: str, **kwargs) -> 'requests.Response':
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> 'requests.Response':
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """Close pooled connections."""
+        self._session.close()
+
+    def __enter__(self) -> 'Transport':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _AsyncTrace:
+    """httpcore trace hook collecting connect and response-header timestamps."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.connect_started: Optional[float] = None
+        self.connect: Optional[float] = None
+        self.ttfb = 0.0
+
+    async def __call__(self, event: str, info: Dict[str, Any]):
+        now = time.perf_counter()
+        if event == 'connection.connect_tcp.started':
+            self.connect_started = now
+        elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+            if self.connect_started is not None:
+                self.connect = now - self.connect_started
+        elif event.endswith('receive_response_headers.complete'):
+            self.ttfb = now - self.start
+
+    def record(self, timing, status: int):
+        _record_http(timing, status, self.connect, self.ttfb, time.perf_counter() - self.start)
+
+
+class AsyncTransport:
+    """
+    Asynchronous pooled HTTP transport.
+
+    Requires httpx; HTTP/2 additionally requires the h2 package
+    (pip install 'httpx[http2]').
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = (5, 30),
+        pool_size: int = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+        http2: bool = False,
+    ):
+        """
+        Initialize transport.
+
+        Args:
+            headers: Default headers sent with every request
+            timeout: Default (connect, read) timeout in seconds
+            pool_size: Maximum concurrent connections
+            retries: Maximum retries per request
+            backoff: Base backoff in seconds (doubles per attempt)
+            http2: Negotiate HTTP/2 when the server supports it
+        """
+        import httpx
+
+        self._httpx = httpx
+        self.retries = retries
+        self.backoff = backoff
+
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout_cfg = httpx.Timeout(read, connect=connect)
+        else:
+            timeout_cfg = httpx.Timeout(timeout)
+
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout_cfg,
+            # Connection-level retries (request not yet sent) for every method
+            transport=httpx.AsyncHTTPTransport(
+                retries=retries,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                ),
+            ),
+        )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        idempotent: Optional[bool] = None,
+        **kwargs: Any
+    ):
+        """
+        Send a request.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            idempotent: Override method-based retry eligibility
+            **kwargs: Passed to httpx (json, content, headers, params, timeout)
+
+        Raises:
+            TransportError: On network failure after retries
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = self.retries + 1 if idempotent else 1
+
+        if is_enabled():
+            with span('http.request', **{'http.method': method, 'http.url': _span_url(url)}) as timing:
+                trace = _AsyncTrace()
+                kwargs['extensions'] = {**kwargs.get('extensions', {}), 'trace': trace}
+                resp = await self._send(method, url, attempts, **kwargs)
+                trace.record(timing, resp.status_code)
+                return resp
+        return await self._send(method, url, attempts, **kwargs)
+
+    async def _send(self, method: str, url: str, attempts: int, **kwargs: Any):
+        """Retry loop shared by traced and untraced requests."""
+        import asyncio
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                resp = await self._client.request(method, url, **kwargs)
+            except self._httpx.HTTPError as e:
+                if last:
+                    raise TransportError(str(e)) from e
+                await asyncio.sleep(backoff_delay(attempt, self.backoff))
+                continue
+
+            if resp.status_code in RETRY_STATUSES and not last:
+                await asyncio.sleep(
+                    backoff_delay(attempt, self.backoff, resp.headers.get('Retry-After'))
+                )
+                continue
+            return resp
+
+    async def get(self, url: str, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        """Close pooled connections."""
+        await self._client.aclose()
+
+    async def __aenter__(self) -> 'AsyncTransport':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -5,12 +5,13 @@ End-to-end verification of installation security.
 
 Verifies:
 1. Manifest integrity (yacht_id_hash matches yacht_id)
-2. Credential retrieval security (one-time only)
+2. Credential retrieval security (one-time only, also under N parallel polls)
 3. HMAC signature verification (timestamp, payload)
 4. Response signature verification (optional)
 
 Usage:
     python -m lib.verify --yacht-id YACHT_001 --api-endpoint https://xxx.supabase.co
+    python -m lib.verify --yacht-id YACHT_002 --concurrent-polls 32   # fresh, just-activated yacht
 """
 
 import sys
@@ -18,11 +19,16 @@ import json
 import time
 import hashlib
 import hmac
-import requests
-from typing import Optional, Dict, Any, Tuple
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass
 
 from .crypto import CryptoIdentity, compute_yacht_hash
+from .transport import Transport, TransportError
+from . import instrumentation
+from .instrumentation import traced
 
 
 @dataclass
@@ -34,6 +40,21 @@ class VerificationResult:
     details: Optional[Dict[str, Any]] = None
 
 
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank min/p50/p90/p99/max and mean of a list of seconds, in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(n - 1, max(0, int(q * n + 0.5) - 1))] * 1000, 3)
+
+    return {'min_ms': round(ordered[0] * 1000, 3), 'p50_ms': pick(0.50), 'p90_ms': pick(0.90),
+            'p99_ms': pick(0.99), 'max_ms': round(ordered[-1] * 1000, 3),
+            'mean_ms': round(sum(ordered) / n * 1000, 3), 'count': n}
+
+
 class InstallationVerifier:
     """
     Comprehensive verification of installation security.
@@ -43,7 +64,9 @@ class InstallationVerifier:
         self.api_endpoint = api_endpoint.rstrip('/')
         self.timeout = timeout
         self.results: list[VerificationResult] = []
+        self._transport = Transport(timeout=timeout)
 
+    @traced('verify.manifest_integrity')
     def verify_manifest_integrity(self, yacht_id: str, yacht_id_hash: str) -> VerificationResult:
         """Verify manifest hasn't been tampered with."""
         expected = compute_yacht_hash(yacht_id)
@@ -61,10 +84,11 @@ class InstallationVerifier:
         self.results.append(result)
         return result
 
+    @traced('verify.registration')
     def verify_registration(self, yacht_id: str, yacht_id_hash: str) -> VerificationResult:
         """Test registration endpoint."""
         try:
-            resp = requests.post(
+            resp = self._transport.post(
                 f"{self.api_endpoint}/functions/v1/register",
                 json={"yacht_id": yacht_id, "yacht_id_hash": yacht_id_hash},
                 timeout=self.timeout
@@ -93,7 +117,7 @@ class InstallationVerifier:
                     details=resp.json() if resp.text else None
                 )
 
-        except requests.RequestException as e:
+        except (TransportError, ValueError) as e:
             result = VerificationResult(
                 name="Registration Endpoint",
                 passed=False,
@@ -103,11 +127,12 @@ class InstallationVerifier:
         self.results.append(result)
         return result
 
+    @traced('verify.one_time_retrieval')
     def verify_one_time_retrieval(self, yacht_id: str) -> VerificationResult:
         """Verify credentials can only be retrieved once."""
         try:
             # First retrieval
-            resp1 = requests.post(
+            resp1 = self._transport.post(
                 f"{self.api_endpoint}/functions/v1/check-activation",
                 json={"yacht_id": yacht_id},
                 timeout=self.timeout
@@ -117,7 +142,7 @@ class InstallationVerifier:
             first_has_secret = "shared_secret" in resp1.json() if resp1.status_code == 200 else False
 
             # Second retrieval
-            resp2 = requests.post(
+            resp2 = self._transport.post(
                 f"{self.api_endpoint}/functions/v1/check-activation",
                 json={"yacht_id": yacht_id},
                 timeout=self.timeout
@@ -161,7 +186,7 @@ class InstallationVerifier:
                     }
                 )
 
-        except requests.RequestException as e:
+        except (TransportError, ValueError) as e:
             result = VerificationResult(
                 name="One-Time Retrieval Security",
                 passed=False,
@@ -171,6 +196,71 @@ class InstallationVerifier:
         self.results.append(result)
         return result
 
+    @traced('verify.concurrent_retrieval')
+    def verify_concurrent_retrieval(self, yacht_id: str, polls: int = 16) -> VerificationResult:
+        """
+        Verify parallel polls cannot both receive the secret.
+
+        Releases `polls` check-activation requests at once (what a retrying
+        agent does after a timeout) and passes only if exactly one of them
+        carries shared_secret. Consumes the one-time secret, so point it at
+        a freshly activated yacht whose credentials were never retrieved.
+        """
+        name = "Concurrent One-Time Retrieval"
+        barrier = threading.Barrier(polls)
+        transport = Transport(timeout=self.timeout, pool_size=polls)
+
+        def poll() -> Tuple[str, bool, float]:
+            barrier.wait()
+            start = time.perf_counter()
+            try:
+                resp = transport.post(
+                    f"{self.api_endpoint}/functions/v1/check-activation",
+                    json={"yacht_id": yacht_id},
+                    timeout=self.timeout
+                )
+            except TransportError:
+                return "network_error", False, time.perf_counter() - start
+            elapsed = time.perf_counter() - start
+            if resp.status_code != 200:
+                return f"http_{resp.status_code}", False, elapsed
+            try:
+                data = resp.json()
+            except ValueError:
+                # A proxy error page, say; recorded so the secret count still reports
+                return "bad_json", False, elapsed
+            if not isinstance(data, dict):
+                return "bad_json", False, elapsed
+            return data.get("status", "unknown"), bool(data.get("shared_secret")), elapsed
+
+        try:
+            with ThreadPoolExecutor(max_workers=polls) as pool:
+                outcomes = [f.result() for f in [pool.submit(poll) for _ in range(polls)]]
+        finally:
+            transport.close()
+
+        secrets = sum(1 for _, has_secret, _ in outcomes if has_secret)
+        details = {
+            "polls": polls,
+            "secrets_returned": secrets,
+            "statuses": dict(Counter(status for status, _, _ in outcomes)),
+            "latency": latency_stats([elapsed for _, _, elapsed in outcomes]),
+        }
+
+        if secrets == 1:
+            message = f"Exactly one of {polls} parallel polls received the secret"
+        elif secrets > 1:
+            message = f"CRITICAL: Secret returned to {secrets} of {polls} parallel polls!"
+            details["security_violation"] = True
+        else:
+            message = (f"No poll received the secret ({details['statuses']}); "
+                       "needs an activated yacht whose credentials were never retrieved")
+
+        result = VerificationResult(name=name, passed=secrets == 1, message=message, details=details)
+        self.results.append(result)
+        return result
+
+    @traced('verify.hmac_signature')
     def verify_hmac_signature(
         self,
         yacht_id: str,
@@ -182,7 +272,7 @@ class InstallationVerifier:
             crypto = CryptoIdentity(yacht_id, shared_secret)
             headers = crypto.sign_request(payload)
 
-            resp = requests.post(
+            resp = self._transport.post(
                 f"{self.api_endpoint}/functions/v1/verify-credentials",
                 json=payload,
                 headers=headers,
@@ -214,6 +304,7 @@ class InstallationVerifier:
         self.results.append(result)
         return result
 
+    @traced('verify.invalid_signature_rejected')
     def verify_invalid_signature_rejected(
         self,
         yacht_id: str,
@@ -229,7 +320,7 @@ class InstallationVerifier:
             # Corrupt the signature
             headers["X-Signature"] = "0" * 64
 
-            resp = requests.post(
+            resp = self._transport.post(
                 f"{self.api_endpoint}/functions/v1/verify-credentials",
                 json=payload,
                 headers=headers,
@@ -261,6 +352,7 @@ class InstallationVerifier:
         self.results.append(result)
         return result
 
+    @traced('verify.timestamp_drift_rejected')
     def verify_timestamp_drift_rejected(
         self,
         yacht_id: str,
@@ -275,7 +367,7 @@ class InstallationVerifier:
             old_timestamp = int(time.time()) - 600
             headers = crypto.sign_request(payload, timestamp=old_timestamp)
 
-            resp = requests.post(
+            resp = self._transport.post(
                 f"{self.api_endpoint}/functions/v1/verify-credentials",
                 json=payload,
                 headers=headers,
@@ -311,11 +403,16 @@ class InstallationVerifier:
         self,
         yacht_id: str,
         yacht_id_hash: str,
-        shared_secret: Optional[str] = None
+        shared_secret: Optional[str] = None,
+        concurrent_polls: int = 0
     ) -> Tuple[int, int]:
         """
         Run all verification checks.
 
+        Args:
+            concurrent_polls: If > 0, check one-time retrieval with this many
+                parallel polls instead of two sequential ones
+
         Returns:
             (passed_count, total_count)
         """
@@ -329,7 +426,10 @@ class InstallationVerifier:
         # Basic checks
         self.verify_manifest_integrity(yacht_id, yacht_id_hash)
         self.verify_registration(yacht_id, yacht_id_hash)
-        self.verify_one_time_retrieval(yacht_id)
+        if concurrent_polls > 0:
+            self.verify_concurrent_retrieval(yacht_id, concurrent_polls)
+        else:
+            self.verify_one_time_retrieval(yacht_id)
 
         # Signature verification (requires shared_secret)
         if shared_secret:
@@ -348,6 +448,10 @@ class InstallationVerifier:
             icon = "✓" if r.passed else "✗"
             print(f"  {icon} [{status}] {r.name}")
             print(f"           {r.message}")
+            if r.details and "latency" in r.details:
+                lat = r.details["latency"]
+                print(f"           latency p50 {lat['p50_ms']:.1f} ms, p90 {lat['p90_ms']:.1f} ms, "
+                      f"max {lat['max_ms']:.1f} ms over {lat['count']} polls")
             if r.passed:
                 passed += 1
 
@@ -370,18 +474,34 @@ def run_verification():
     parser.add_argument("--shared-secret", help="Shared secret for signature tests")
     parser.add_argument("--api-endpoint", default="https://qvzmkaamzaqxpzbewjxe.supabase.co",
                         help="Supabase API endpoint")
+    parser.add_argument("--concurrent-polls", type=int, default=0, metavar="N",
+                        help="Check one-time retrieval with N parallel polls (consumes the secret)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Record timings and write OTLP/JSON spans plus histograms to FILE")
 
     args = parser.parse_args()
 
+    if args.trace:
+        instrumentation.enable()
+
     yacht_id_hash = args.yacht_id_hash or compute_yacht_hash(args.yacht_id)
 
     verifier = InstallationVerifier(args.api_endpoint)
     passed, total = verifier.run_all(
         args.yacht_id,
         yacht_id_hash,
-        args.shared_secret
+        args.shared_secret,
+        args.concurrent_polls
     )
 
+    if args.trace:
+        with open(args.trace, 'w') as f:
+            json.dump({
+                'histograms': instrumentation.histograms(),
+                **instrumentation.export_otlp('celesteos-verify'),
+            }, f, indent=2)
+        print(f"Trace written to {args.trace}")
+
     sys.exit(0 if passed == total else 1)
 
 
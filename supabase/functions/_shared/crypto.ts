@@ -108,6 +108,47 @@ export async function verifyRequestSignature(
   return { valid: true };
 }
 
+/**
+ * Verify HMAC-SHA256 signature over the exact request body bytes.
+ *
+ * Used by endpoints carrying large or nested payloads (chunk batches), where
+ * re-serializing the parsed body would not reproduce the client's canonical
+ * JSON. The client sends the same bytes it signed, so no canonicalization
+ * happens server-side.
+ *
+ * @param sharedSecret - Yacht's shared_secret from database
+ * @param rawBody - Request body exactly as received
+ * @param signature - X-Signature header value
+ * @param timestamp - X-Timestamp header value
+ * @param maxDrift - Maximum allowed timestamp drift in seconds (default: 300 = 5 minutes)
+ */
+export async function verifyRawRequestSignature(
+  sharedSecret: string,
+  rawBody: string,
+  signature: string,
+  timestamp: string,
+  maxDrift: number = 300
+): Promise<{ valid: boolean; error?: string }> {
+  const ts = parseInt(timestamp, 10);
+  if (isNaN(ts)) {
+    return { valid: false, error: "Invalid timestamp format" };
+  }
+
+  const now = Math.floor(Date.now() / 1000);
+  if (Math.abs(now - ts) > maxDrift) {
+    return { valid: false, error: "Timestamp outside acceptable window" };
+  }
+
+  // Same canonical framing as signResponse: timestamp:body
+  const expected = await signResponse(sharedSecret, rawBody, ts);
+
+  if (!constantTimeCompare(signature.toLowerCase(), expected.toLowerCase())) {
+    return { valid: false, error: "Invalid signature" };
+  }
+
+  return { valid: true };
+}
+
 /**
  * Sign a response payload for client verification.
  */
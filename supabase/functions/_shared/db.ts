@@ -101,29 +101,349 @@ export const FleetRegistry = {
   },
 
   /**
-   * Mark credentials as retrieved (one-time operation).
+   * Claim the shared secret (one-time operation).
+   *
+   * Flips credentials_retrieved and returns the secret in one conditional
+   * UPDATE (claim_activation_secret, 20251204), so concurrent polls cannot
+   * both receive it. status: active | pending | already_retrieved | not_found;
+   * shared_secret is set only for active.
    */
-  async markCredentialsRetrieved(yachtId: string) {
+  async claimCredentials(yachtId: string): Promise<{
+    status: "active" | "pending" | "already_retrieved" | "not_found";
+    shared_secret: string | null;
+    retrieved_at: string | null;
+  }> {
     const db = getServiceClient();
-    const { error } = await db
-      .from("fleet_registry")
-      .update({
-        credentials_retrieved: true,
-        credentials_retrieved_at: new Date().toISOString(),
-        updated_at: new Date().toISOString(),
-      })
-      .eq("yacht_id", yachtId);
+    const { data, error } = await db.rpc("claim_activation_secret", {
+      p_yacht_id: yachtId,
+    });
 
     if (error) throw error;
+    return data?.[0] ?? { status: "not_found", shared_secret: null, retrieved_at: null };
   },
 };
 
+/**
+ * Wake-up signal from /activate to held /check-activation long-polls.
+ *
+ * A Realtime broadcast on channel "activation:<yacht_id>" carrying only
+ * the yacht_id: no table is published, so shared_secret never leaves the
+ * database this way. The signal only says "re-check now"; the secret is
+ * still handed out by claim_activation_secret().
+ */
+const SUBSCRIBE_TIMEOUT_MS = 3000;
+
+export interface ActivationListener {
+  /** True when the channel subscribed; false means no wake-ups will arrive. */
+  live: boolean;
+  /** Resolves true on a wake-up, false after `ms` or when `signal` aborts. */
+  next(ms: number, signal?: AbortSignal): Promise<boolean>;
+  close(): Promise<void>;
+}
+
+export const ActivationSignal = {
+  channelName(yachtId: string): string {
+    return `activation:${yachtId}`;
+  },
+
+  /**
+   * Wake every check-activation request holding this yacht.
+   */
+  async notify(yachtId: string) {
+    const db = getServiceClient();
+    const channel = db.channel(ActivationSignal.channelName(yachtId));
+    try {
+      // Not subscribed, so supabase-js sends it over the REST broadcast endpoint
+      await channel.send({ type: "broadcast", event: "activated", payload: { yacht_id: yachtId } });
+    } finally {
+      await db.removeChannel(channel);
+    }
+  },
+
+  /**
+   * Subscribe to this yacht's wake-ups. Subscribe before the first claim,
+   * so an activation in between is not missed.
+   */
+  async listen(yachtId: string): Promise<ActivationListener> {
+    const db = getServiceClient();
+    let pending = false;
+    let wake: (() => void) | null = null;
+
+    const channel = db
+      .channel(ActivationSignal.channelName(yachtId))
+      .on("broadcast", { event: "activated" }, () => {
+        pending = true;
+        wake?.();
+      });
+
+    const live = await new Promise<boolean>((resolve) => {
+      const timer = setTimeout(() => resolve(false), SUBSCRIBE_TIMEOUT_MS);
+      channel.subscribe((status) => {
+        if (status === "SUBSCRIBED") {
+          clearTimeout(timer);
+          resolve(true);
+        } else if (status === "CHANNEL_ERROR" || status === "TIMED_OUT" || status === "CLOSED") {
+          clearTimeout(timer);
+          resolve(false);
+        }
+      });
+    });
+
+    return {
+      live,
+      next(ms: number, signal?: AbortSignal): Promise<boolean> {
+        if (pending) {
+          pending = false;
+          return Promise.resolve(true);
+        }
+        return new Promise((resolve) => {
+          const done = (woken: boolean) => {
+            clearTimeout(timer);
+            signal?.removeEventListener("abort", aborted);
+            wake = null;
+            pending = false;
+            resolve(woken);
+          };
+          const aborted = () => done(false);
+          const timer = setTimeout(() => done(false), ms);
+          wake = () => done(true);
+          signal?.addEventListener("abort", aborted, { once: true });
+        });
+      },
+      async close() {
+        await db.removeChannel(channel);
+      },
+    };
+  },
+};
+
+type Severity = "low" | "medium" | "high" | "critical";
+
+const SEVERITY_RANK: Record<Severity, number> = {
+  low: 0,
+  medium: 1,
+  high: 2,
+  critical: 3,
+};
+
+/**
+ * Buffered, batched inserts for append-only event tables.
+ *
+ * log() only queues the row, so request handlers never wait on the
+ * database. Rows are written as one multi-row insert when the batch is
+ * full or flushIntervalMs after the first queued row, whichever is first.
+ * High and critical rows schedule an immediate flush.
+ *
+ * Under overload (queue past highWater) low-severity rows are sampled at
+ * sampleRate; once the queue reaches maxBuffered only high and critical
+ * rows are accepted. Dropped counts are reported on the next flush.
+ *
+ * Pending rows are flushed on worker shutdown (beforeunload), and each
+ * flush is registered with EdgeRuntime.waitUntil so the runtime keeps the
+ * worker alive until it completes.
+ *
+ * Failed inserts: yacht_id references fleet_registry, so one row for an
+ * unknown yacht (register's hash_mismatch, *_not_found) fails the whole
+ * multi-row insert. A failed batch is retried row by row; a row that
+ * fails the foreign key is kept with yacht_id moved into details. High
+ * and critical rows that still fail are retried with exponential backoff
+ * up to maxAttempts; anything else that fails is logged and dropped.
+ */
+type BufferedRow = { row: Record<string, unknown>; severity: Severity; attempts: number };
+
+const FOREIGN_KEY_VIOLATION = "23503";
+// Consecutive row failures while isolating a batch that mean the database is down
+const ISOLATION_FAILURES = 3;
+
+export class EventBuffer {
+  private rows: BufferedRow[] = [];
+  private timer: number | null = null;
+  private inflight: Promise<void> | null = null;
+  private dropped = 0;
+  private sampled = 0;
+
+  constructor(
+    private table: string,
+    private options = {
+      maxBatch: 100,
+      flushIntervalMs: 1000,
+      highWater: 500,
+      maxBuffered: 2000,
+      sampleRate: 0.1,
+      maxAttempts: 5,
+      retryBackoffMs: 1000,
+      maxRetryBackoffMs: 60000,
+    },
+  ) {
+    EventBuffer.instances.push(this);
+  }
+
+  static instances: EventBuffer[] = [];
+
+  /**
+   * Queue a row. Returns without touching the database.
+   */
+  log(row: Record<string, unknown>, severity: Severity = "low") {
+    const { maxBatch, highWater, maxBuffered, sampleRate } = this.options;
+    const queued = this.rows.length;
+    const rank = SEVERITY_RANK[severity];
+
+    if (queued >= maxBuffered && rank < SEVERITY_RANK.high) {
+      this.dropped++;
+      return;
+    }
+    if (queued >= highWater && rank === SEVERITY_RANK.low && Math.random() >= sampleRate) {
+      this.sampled++;
+      return;
+    }
+
+    this.rows.push({ row, severity, attempts: 0 });
+
+    if (this.rows.length >= maxBatch || rank >= SEVERITY_RANK.high) {
+      this.schedule(0);
+    } else {
+      this.schedule(this.options.flushIntervalMs);
+    }
+  }
+
+  private schedule(delayMs: number) {
+    if (this.timer !== null) {
+      if (delayMs > 0) return;
+      clearTimeout(this.timer);
+    }
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      keepAlive(this.flush());
+    }, delayMs);
+  }
+
+  /**
+   * Write all queued rows. Concurrent calls share one in-flight insert chain.
+   */
+  async flush(): Promise<void> {
+    while (this.inflight) await this.inflight;
+    if (this.rows.length === 0) return;
+
+    this.inflight = this.writeBatches();
+    try {
+      await this.inflight;
+    } finally {
+      this.inflight = null;
+    }
+  }
+
+  private async writeBatches() {
+    if (this.dropped || this.sampled) {
+      console.warn(
+        `${this.table}: overload, dropped ${this.dropped} and sampled out ${this.sampled} events`,
+      );
+      this.dropped = 0;
+      this.sampled = 0;
+    }
+
+    const db = getServiceClient();
+    while (this.rows.length > 0) {
+      const batch = this.rows.splice(0, this.options.maxBatch);
+      const { error } = await db.from(this.table).insert(batch.map((b) => b.row));
+      if (!error) continue;
+
+      console.error(`${this.table} batch insert error:`, error);
+      if (batch.length === 1) {
+        await this.insertOne(batch[0]);
+        continue;
+      }
+
+      // One bad row fails the whole insert: isolate it. Consecutive
+      // failures mean the database is down, so the rest count as failed.
+      let streak = 0;
+      for (const item of batch) {
+        if (streak >= ISOLATION_FAILURES) {
+          this.failed(item, error);
+          continue;
+        }
+        streak = (await this.insertOne(item)) ? 0 : streak + 1;
+      }
+    }
+  }
+
+  /**
+   * Insert a single row, keeping it without yacht_id if that is what the
+   * foreign key rejects. Returns false if it failed.
+   */
+  private async insertOne(item: BufferedRow): Promise<boolean> {
+    const db = getServiceClient();
+    let { error } = await db.from(this.table).insert(item.row);
+
+    if (error?.code === FOREIGN_KEY_VIOLATION && item.row.yacht_id != null) {
+      const details = (item.row.details as Record<string, unknown>) ?? {};
+      item.row = {
+        ...item.row,
+        yacht_id: null,
+        details: { ...details, unregistered_yacht_id: item.row.yacht_id },
+      };
+      ({ error } = await db.from(this.table).insert(item.row));
+    }
+
+    if (error) {
+      this.failed(item, error);
+      return false;
+    }
+    return true;
+  }
+
+  private failed(item: BufferedRow, error: unknown) {
+    const { maxAttempts, retryBackoffMs, maxRetryBackoffMs } = this.options;
+    item.attempts++;
+
+    if (SEVERITY_RANK[item.severity] >= SEVERITY_RANK.high && item.attempts < maxAttempts) {
+      // Keep security-relevant rows, backing off between attempts
+      const delay = Math.min(retryBackoffMs * 2 ** (item.attempts - 1), maxRetryBackoffMs);
+      setTimeout(() => {
+        this.rows.unshift(item);
+        this.schedule(0);
+      }, delay);
+      return;
+    }
+
+    console.error(`${this.table}: giving up on event after ${item.attempts} attempt(s):`, error, item.row);
+  }
+
+  /**
+   * Flush every buffer (used on shutdown).
+   */
+  static async flushAll(): Promise<void> {
+    await Promise.all(EventBuffer.instances.map((b) => b.flush()));
+  }
+}
+
+/**
+ * Keep the worker alive until a background promise settles.
+ */
+function keepAlive(promise: Promise<void>) {
+  // deno-lint-ignore no-explicit-any
+  const runtime = (globalThis as any).EdgeRuntime;
+  if (runtime?.waitUntil) {
+    runtime.waitUntil(promise);
+  }
+}
+
+globalThis.addEventListener("beforeunload", () => {
+  keepAlive(EventBuffer.flushAll());
+});
+
+const auditBuffer = new EventBuffer("audit_log");
+const securityBuffer = new EventBuffer("security_events");
+
 /**
  * Audit logging.
  */
 export const AuditLog = {
   /**
-   * Log an event.
+   * Log an event (buffered; see EventBuffer).
+   *
+   * Audit rows default to low severity, so they are the first to be
+   * sampled under overload. Pass a higher severity for rows that must
+   * not be dropped.
    */
   async log(params: {
     yachtId?: string;
@@ -131,20 +451,23 @@ export const AuditLog = {
     details?: Record<string, unknown>;
     ipAddress?: string;
     userAgent?: string;
+    severity?: Severity;
   }) {
-    const db = getServiceClient();
-    const { error } = await db.from("audit_log").insert({
-      yacht_id: params.yachtId,
+    auditBuffer.log({
+      yacht_id: params.yachtId ?? null,
       action: params.action,
       details: params.details || {},
-      ip_address: params.ipAddress,
-      user_agent: params.userAgent,
+      ip_address: params.ipAddress ?? null,
+      user_agent: params.userAgent ?? null,
       created_at: new Date().toISOString(),
-    });
+    }, params.severity);
+  },
 
-    if (error) {
-      console.error("Audit log error:", error);
-    }
+  /**
+   * Write queued audit rows now.
+   */
+  flush(): Promise<void> {
+    return auditBuffer.flush();
   },
 };
 
@@ -153,27 +476,29 @@ export const AuditLog = {
  */
 export const SecurityEvents = {
   /**
-   * Log a security event.
+   * Log a security event (buffered; high and critical flush immediately).
    */
   async log(params: {
     yachtId?: string;
     eventType: string;
-    severity: "low" | "medium" | "high" | "critical";
+    severity: Severity;
     details?: Record<string, unknown>;
     ipAddress?: string;
   }) {
-    const db = getServiceClient();
-    const { error } = await db.from("security_events").insert({
-      yacht_id: params.yachtId,
+    securityBuffer.log({
+      yacht_id: params.yachtId ?? null,
       event_type: params.eventType,
       severity: params.severity,
       details: params.details || {},
-      ip_address: params.ipAddress,
+      ip_address: params.ipAddress ?? null,
       created_at: new Date().toISOString(),
-    });
+    }, params.severity);
+  },
 
-    if (error) {
-      console.error("Security event log error:", error);
-    }
+  /**
+   * Write queued security events now.
+   */
+  flush(): Promise<void> {
+    return securityBuffer.flush();
   },
 };
@@ -9,7 +9,8 @@
  * 3. Server validates token using validate_activation_token()
  * 4. Updates yacht status to 'active', generates shared_secret
  * 5. Marks token as used
- * 6. Agent's next poll to /check-activation receives secret
+ * 6. Held /check-activation long-polls are woken (ActivationSignal) and
+ *    the agent's next claim receives the secret
  *
  * Token Security:
  * - Tokens are 256-bit random, stored hashed in database
@@ -19,7 +20,13 @@
 
 import { serve } from "https://deno.land/std@0.208.0/http/server.ts";
 import { generateSharedSecret } from "../_shared/crypto.ts";
-import { FleetRegistry, AuditLog, SecurityEvents, getServiceClient } from "../_shared/db.ts";
+import {
+  FleetRegistry,
+  AuditLog,
+  SecurityEvents,
+  ActivationSignal,
+  getServiceClient,
+} from "../_shared/db.ts";
 import {
   success,
   error,
@@ -161,6 +168,14 @@ serve(async (req: Request) => {
       throw activateError;
     }
 
+    // Wake held check-activation polls; a lost signal only delays the
+    // installer until its next safety recheck
+    try {
+      await ActivationSignal.notify(yachtId);
+    } catch (err) {
+      console.error("Activation signal error:", err);
+    }
+
     // Log successful activation
     await AuditLog.log({
       yachtId,
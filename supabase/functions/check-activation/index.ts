@@ -5,7 +5,9 @@
  *
  * CRITICAL SECURITY:
  * - shared_secret is returned EXACTLY ONCE
- * - credentials_retrieved flag is set atomically
+ * - credentials_retrieved flag is set atomically: one conditional UPDATE
+ *   (claim_activation_secret) claims and returns the secret, so parallel
+ *   polls from a retrying agent cannot both receive it
  * - Second call NEVER returns secret (returns already_retrieved)
  * - All access attempts logged
  *
@@ -15,6 +17,20 @@
  * 3. Once activated, returns shared_secret ONE TIME
  * 4. Subsequent calls return "already_retrieved" with NO secret
  *
+ * Long-poll:
+ * - {"yacht_id", "wait": N} holds a pending request for up to N seconds
+ *   (capped at MAX_WAIT_SECONDS) and answers as soon as the yacht
+ *   activates. The request subscribes to the yacht's ActivationSignal
+ *   (a Realtime broadcast /activate sends, carrying only the yacht_id)
+ *   and re-claims when woken, plus a safety re-check every
+ *   SAFETY_RECHECK_MS in case a signal is lost. A 55 s hold costs 3
+ *   claim_activation_secret() calls, against ~11 for the old client
+ *   polling every 5 s. If Realtime cannot be subscribed the request
+ *   re-checks every FALLBACK_RECHECK_MS, which is no worse than that.
+ * - Pending replies carry "waited" (seconds held); clients that get a
+ *   pending reply without it are talking to a polling-only deployment
+ *   and fall back to polling (lib/installer.py)
+ *
  * States:
  * - pending: Waiting for owner activation
  * - active: Activated, shared_secret returned (first call only)
@@ -23,7 +39,13 @@
  */
 
 import { serve } from "https://deno.land/std@0.208.0/http/server.ts";
-import { FleetRegistry, AuditLog, SecurityEvents, getServiceClient } from "../_shared/db.ts";
+import {
+  FleetRegistry,
+  AuditLog,
+  SecurityEvents,
+  ActivationSignal,
+  ActivationListener,
+} from "../_shared/db.ts";
 import {
   success,
   error,
@@ -35,8 +57,14 @@ import {
 
 interface CheckActivationRequest {
   yacht_id: string;
+  wait?: number;
 }
 
+const MAX_WAIT_SECONDS = 60; // well inside the edge function wall-clock limit
+const SAFETY_RECHECK_MS = 30000; // only matters if a wake-up signal is lost
+const FALLBACK_RECHECK_MS = 5000; // no Realtime: the old client poll interval
+const MIN_RECHECK_MS = 250;
+
 serve(async (req: Request) => {
   // Handle CORS preflight
   if (req.method === "OPTIONS") {
@@ -59,116 +87,116 @@ serve(async (req: Request) => {
     }
 
     const { yacht_id } = body!;
-
-    // Get yacht from registry
-    const yacht = await FleetRegistry.getYacht(yacht_id);
-
-    if (!yacht) {
-      await AuditLog.log({
-        yachtId: yacht_id,
-        action: "check_activation_not_found",
-        ...clientInfo,
-      });
-      return error("Yacht not found", 404);
+    const wait = Math.min(Math.max(Number(body!.wait) || 0, 0), MAX_WAIT_SECONDS);
+
+    const started = Date.now();
+    const deadline = started + wait * 1000;
+
+    // Subscribe before the first claim so an activation in between still
+    // wakes this request
+    let listener: ActivationListener | null = null;
+    if (wait > 0) {
+      try {
+        listener = await ActivationSignal.listen(yacht_id);
+      } catch (err) {
+        console.error("Activation signal subscribe error:", err);
+      }
     }
 
-    // Check current status (using `active` boolean field)
-    if (!yacht.active) {
-      // Still waiting for owner to activate
-      await AuditLog.log({
-        yachtId: yacht_id,
-        action: "check_activation_pending",
-        ...clientInfo,
-      });
-
-      return success({
-        status: "pending",
-        message: "Waiting for owner activation",
-      });
+    // Claim the secret, or learn why not, in one round-trip
+    // (supabase/migrations/20251204_claim_activation_secret.sql)
+    let claim: Awaited<ReturnType<typeof FleetRegistry.claimCredentials>>;
+    try {
+      claim = await FleetRegistry.claimCredentials(yacht_id);
+
+      // Long-poll: hold a pending request until activation or the deadline.
+      // Stop when req.signal reports the client gone. That only covers a
+      // cleanly closed connection: a satellite link that drops silently
+      // fires nothing, so a claim made during the hold can still answer a
+      // dead connection, and holding makes that window longer than an
+      // immediate reply would. The installer then sees already_retrieved.
+      const interval = listener?.live ? SAFETY_RECHECK_MS : FALLBACK_RECHECK_MS;
+      while (claim.status === "pending" && !req.signal.aborted) {
+        const delay = Math.min(interval, deadline - Date.now());
+        if (delay < MIN_RECHECK_MS) break;
+        if (listener) {
+          await listener.next(delay, req.signal);
+        } else {
+          await new Promise((resolve) => setTimeout(resolve, delay));
+        }
+        if (req.signal.aborted) break;
+        claim = await FleetRegistry.claimCredentials(yacht_id);
+      }
+    } finally {
+      await listener?.close();
     }
 
-    // Yacht is active - check if credentials already retrieved
-    if (yacht.credentials_retrieved) {
-          // SECURITY: Second retrieval attempt
-          await SecurityEvents.log({
-            yachtId: yacht_id,
-            eventType: "duplicate_credential_retrieval",
-            severity: "high",
-            details: {
-              first_retrieved_at: yacht.credentials_retrieved_at,
-              current_ip: clientInfo.ipAddress,
-            },
-            ...clientInfo,
-          });
-
-          await AuditLog.log({
-            yachtId: yacht_id,
-            action: "check_activation_already_retrieved",
-            details: { first_retrieved_at: yacht.credentials_retrieved_at },
-            ...clientInfo,
-          });
-
-          // NEVER return secret on second attempt
-          return success({
-            status: "already_retrieved",
-            message: "Credentials were already retrieved. Contact support if this is unexpected.",
-          });
-        }
+    // Audit rows are buffered (EventBuffer), so none of these wait on the database
+    switch (claim.status) {
+      case "active":
+        // SUCCESS: this poll won the claim - return shared_secret ONE TIME
+        AuditLog.log({
+          yachtId: yacht_id,
+          action: "credentials_retrieved_success",
+          details: { retrieved_at: claim.retrieved_at },
+          ...clientInfo,
+        });
 
-        // CRITICAL: Atomic retrieval - mark as retrieved BEFORE returning secret
-        // This uses a database function to ensure atomicity
-        const db = getServiceClient();
+        return success({
+          status: "active",
+          shared_secret: claim.shared_secret,
+          retrieved_at: claim.retrieved_at,
+          message: "Credentials retrieved. Store securely in Keychain.",
+        });
 
-        // Call retrieve_credentials function (returns null if already retrieved)
-        const { data: retrieveResult, error: retrieveError } = await db.rpc(
-          "retrieve_credentials",
-          { p_yacht_id: yacht_id }
-        );
+      case "pending":
+        // Still waiting for owner to activate
+        AuditLog.log({
+          yachtId: yacht_id,
+          action: "check_activation_pending",
+          ...clientInfo,
+        });
 
-        if (retrieveError) {
-          console.error("Retrieve credentials error:", retrieveError);
-          throw retrieveError;
-        }
+        return success({
+          status: "pending",
+          message: "Waiting for owner activation",
+          waited: (Date.now() - started) / 1000,
+        });
 
-        // Check if retrieval was successful
-        if (!retrieveResult || retrieveResult.length === 0) {
-          // Race condition: another request got it first
-          await SecurityEvents.log({
-            yachtId: yacht_id,
-            eventType: "credential_retrieval_race",
-            severity: "medium",
-            ...clientInfo,
-          });
-
-          return success({
-            status: "already_retrieved",
-            message: "Credentials were already retrieved.",
-          });
-        }
+      case "already_retrieved":
+        // SECURITY: Second retrieval attempt (or a parallel poll that lost the claim)
+        SecurityEvents.log({
+          yachtId: yacht_id,
+          eventType: "duplicate_credential_retrieval",
+          severity: "high",
+          details: {
+            first_retrieved_at: claim.retrieved_at,
+            current_ip: clientInfo.ipAddress,
+          },
+          ...clientInfo,
+        });
 
-        const result = retrieveResult[0];
+        AuditLog.log({
+          yachtId: yacht_id,
+          action: "check_activation_already_retrieved",
+          details: { first_retrieved_at: claim.retrieved_at },
+          ...clientInfo,
+        });
 
-        if (result.status === "already_retrieved") {
-          return success({
-            status: "already_retrieved",
-            message: "Credentials were already retrieved.",
-          });
-        }
+        // NEVER return secret on second attempt
+        return success({
+          status: "already_retrieved",
+          message: "Credentials were already retrieved. Contact support if this is unexpected.",
+        });
 
-        // SUCCESS: Return shared_secret ONE TIME
-        await AuditLog.log({
+      default:
+        AuditLog.log({
           yachtId: yacht_id,
-          action: "credentials_retrieved_success",
-          details: { retrieved_at: result.retrieved_at },
+          action: "check_activation_not_found",
           ...clientInfo,
         });
-
-    return success({
-      status: "active",
-      shared_secret: result.shared_secret,
-      retrieved_at: result.retrieved_at,
-      message: "Credentials retrieved. Store securely in Keychain.",
-    });
+        return error("Yacht not found", 404);
+    }
 
   } catch (err) {
     console.error("Check activation error:", err);
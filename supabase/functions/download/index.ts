@@ -14,6 +14,17 @@
  * - Single-use, expire after 7 days
  * - IP logging and rate limiting
  * - DMG served from Supabase Storage (signed URL)
+ *
+ * Resumable downloads (lib/download.py):
+ * - ?format=json returns the signed URL with the published SHA-256 and a
+ *   signed URL for the per-part digest manifest (<dmg>.parts.json)
+ *   instead of redirecting
+ * - ?resume=1 within 24 h of the last counted download re-issues a signed
+ *   URL without counting another download, so a dropped satellite link
+ *   resumes with Range requests instead of burning one of the 3 downloads
+ *
+ * Token validation and the download count are one claim_download() call,
+ * so parallel requests cannot exceed the link's max_downloads.
  */
 
 import { serve } from "https://deno.land/std@0.208.0/http/server.ts";
@@ -26,6 +37,8 @@ import {
   getClientInfo,
 } from "../_shared/response.ts";
 
+const SIGNED_URL_TTL = 3600; // seconds
+
 serve(async (req: Request) => {
   // Handle CORS preflight
   if (req.method === "OPTIONS") {
@@ -42,6 +55,8 @@ serve(async (req: Request) => {
     // Get token from query string
     const url = new URL(req.url);
     const token = url.searchParams.get("token");
+    const wantsJson = url.searchParams.get("format") === "json";
+    const resume = url.searchParams.get("resume") === "1";
 
     if (!token) {
       await AuditLog.log({
@@ -56,88 +71,78 @@ serve(async (req: Request) => {
     // Hash token for lookup
     const tokenHash = await computeYachtHash(token);
 
-    // Find download link by token hash
-    const { data: linkData, error: linkError } = await db
-      .from("download_links")
-      .select(`
-        *,
-        fleet_registry (
-          yacht_id,
-          yacht_name,
-          buyer_email
-        )
-      `)
-      .eq("token_hash", tokenHash)
-      .single();
-
-    if (linkError || !linkData) {
-      await SecurityEvents.log({
-        eventType: "invalid_download_token",
-        severity: "medium",
-        details: { token_hash_prefix: tokenHash.substring(0, 16) },
-        ...clientInfo,
-      });
-
-      await AuditLog.log({
-        action: "download_invalid_token",
-        ...clientInfo,
-      });
+    // Validate, check expiry/limit and count the download in one atomic
+    // statement (supabase/migrations/20251203_claim_download.sql)
+    const { data: claims, error: claimError } = await db.rpc("claim_download", {
+      p_token_hash: tokenHash,
+      p_ip_address: clientInfo.ipAddress ?? null,
+      p_resume: resume,
+    });
 
-      return error("Invalid or expired download link", 401);
+    if (claimError) {
+      throw claimError;
     }
 
-    // Check if token is expired
-    if (new Date(linkData.expires_at) < new Date()) {
-      await AuditLog.log({
-        yachtId: linkData.yacht_id,
-        action: "download_expired_token",
-        details: { expired_at: linkData.expires_at },
-        ...clientInfo,
-      });
+    const claim = claims?.[0];
 
-      return error("Download link has expired. Please request a new one.", 410);
-    }
+    // Audit rows are buffered (EventBuffer), so none of these wait on the database
+    switch (claim?.status) {
+      case "ok":
+        AuditLog.log({
+          yachtId: claim.yacht_id,
+          action: "download_success",
+          details: { download_number: claim.download_count, yacht_name: claim.yacht_name },
+          ...clientInfo,
+        });
+        break;
 
-    // Check if already used (optional: allow multiple downloads)
-    const maxDownloads = 3; // Allow 3 downloads per token
-    if (linkData.download_count >= maxDownloads) {
-      await AuditLog.log({
-        yachtId: linkData.yacht_id,
-        action: "download_max_reached",
-        details: { count: linkData.download_count, max: maxDownloads },
-        ...clientInfo,
-      });
+      case "resumed":
+        AuditLog.log({
+          yachtId: claim.yacht_id,
+          action: "download_resume",
+          details: { download_number: claim.download_count },
+          ...clientInfo,
+        });
+        break;
 
-      return error("Maximum downloads reached. Please contact support.", 429);
-    }
+      case "expired":
+        AuditLog.log({
+          yachtId: claim.yacht_id,
+          action: "download_expired_token",
+          details: { expired_at: claim.expires_at },
+          ...clientInfo,
+        });
+        return error("Download link has expired. Please request a new one.", 410);
 
-    // Increment download count
-    await db
-      .from("download_links")
-      .update({
-        download_count: linkData.download_count + 1,
-        last_download_at: new Date().toISOString(),
-        last_download_ip: clientInfo.ipAddress,
-      })
-      .eq("id", linkData.id);
+      case "limit_reached":
+        AuditLog.log({
+          yachtId: claim.yacht_id,
+          action: "download_max_reached",
+          details: { count: claim.download_count, max: claim.max_downloads },
+          ...clientInfo,
+        });
+        return error("Maximum downloads reached. Please contact support.", 429);
 
-    // Log successful download
-    await AuditLog.log({
-      yachtId: linkData.yacht_id,
-      action: "download_success",
-      details: {
-        download_number: linkData.download_count + 1,
-        yacht_name: linkData.fleet_registry?.yacht_name,
-      },
-      ...clientInfo,
-    });
+      default:
+        SecurityEvents.log({
+          eventType: "invalid_download_token",
+          severity: "medium",
+          details: { token_hash_prefix: tokenHash.substring(0, 16) },
+          ...clientInfo,
+        });
+        AuditLog.log({
+          action: "download_invalid_token",
+          ...clientInfo,
+        });
+        return error("Invalid or expired download link", 401);
+    }
 
     // Generate signed URL for DMG in Supabase Storage
-    const dmgPath = `dmg/${linkData.yacht_id}/CelesteOS-${linkData.yacht_id}.dmg`;
+    const dmgPath = `dmg/${claim.yacht_id}/CelesteOS-${claim.yacht_id}.dmg`;
 
     const { data: signedUrl, error: signError } = await db.storage
       .from("installers")
-      .createSignedUrl(dmgPath, 3600); // 1 hour expiry
+      .createSignedUrl(dmgPath, SIGNED_URL_TTL);
 
     if (signError || !signedUrl) {
       console.error("Signed URL error:", signError);
@@ -145,7 +150,7 @@ serve(async (req: Request) => {
       // Fallback: return info page with instructions
       return new Response(
         generateDownloadPage(
-          linkData.fleet_registry?.yacht_name || linkData.yacht_id,
+          claim.yacht_name || claim.yacht_id,
           null,
           "pending"
         ),
@@ -153,6 +158,22 @@ serve(async (req: Request) => {
       );
     }
 
+    if (wantsJson) {
+      // Missing manifest (older builds) just means no per-part verification
+      const { data: partsUrl } = await db.storage
+        .from("installers")
+        .createSignedUrl(`${dmgPath}.parts.json`, SIGNED_URL_TTL);
+
+      return success({
+        url: signedUrl.signedUrl,
+        expires_in: SIGNED_URL_TTL,
+        sha256: claim.dmg_sha256 ?? null,
+        parts_url: partsUrl?.signedUrl ?? null,
+        download_number: claim.download_count,
+        resumed: claim.status === "resumed",
+      });
+    }
+
     // Redirect to signed URL for download
     return Response.redirect(signedUrl.signedUrl, 302);
 
@@ -0,0 +1,219 @@
+/**
+ * /replace-document Edge Function
+ * ================================
+ * Transactional replacement of a re-indexed document.
+ *
+ * Replaces the old pattern of one delete-chunks call per stale file_hash
+ * followed by one upsert per new chunk in upload-chunks.
+ *
+ * Flow:
+ * 1. Agent detects an edited document (new file_hash)
+ * 2. Agent sends ONE signed request: old hashes + complete new chunk set
+ * 3. Embeddings generated with batched OpenAI calls
+ * 4. replace_yacht_document() deletes old rows and inserts new rows
+ *    in a single transaction (set-based DELETE + multi-row INSERT)
+ *
+ * Security:
+ * - HMAC-SHA256 over the raw body with the yacht's shared_secret
+ * - Timestamp must be within 5 minutes (replay attack prevention)
+ * - yacht_id in body must match X-Yacht-ID header
+ */
+
+import { serve } from "https://deno.land/std@0.208.0/http/server.ts";
+import { verifyRawRequestSignature } from "../_shared/crypto.ts";
+import { FleetRegistry, AuditLog, SecurityEvents, getServiceClient } from "../_shared/db.ts";
+import {
+  success,
+  error,
+  corsResponse,
+  getClientInfo,
+} from "../_shared/response.ts";
+
+const OPENAI_API_KEY = Deno.env.get("OPENAI_API_KEY");
+
+// OpenAI accepts up to 2048 inputs per embeddings call; stay well below
+// so a single request stays under payload limits for long chunks.
+const EMBEDDING_BATCH_SIZE = 100;
+
+interface ChunkData {
+  text: string;
+  chunk_index: number;
+  char_start: number;
+  char_end: number;
+  file_path: string;
+  file_hash: string;
+  metadata: Record<string, unknown>;
+  section: string | null;
+  page_numbers: number[];
+}
+
+interface ReplaceRequest {
+  yacht_id: string;
+  old_hashes: string[];
+  chunks: ChunkData[];
+}
+
+/**
+ * Generate embeddings for many texts with batched OpenAI calls.
+ */
+async function generateEmbeddings(texts: string[]): Promise<number[][]> {
+  const embeddings: number[][] = [];
+
+  for (let i = 0; i < texts.length; i += EMBEDDING_BATCH_SIZE) {
+    const batch = texts.slice(i, i + EMBEDDING_BATCH_SIZE);
+
+    const response = await fetch("https://api.openai.com/v1/embeddings", {
+      method: "POST",
+      headers: {
+        "Authorization": `Bearer ${OPENAI_API_KEY}`,
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({
+        model: "text-embedding-3-small",
+        input: batch,
+      }),
+    });
+
+    if (!response.ok) {
+      const detail = await response.text();
+      throw new Error(`OpenAI API error: ${response.status} ${detail}`);
+    }
+
+    const data = await response.json();
+
+    // Results are not guaranteed to be in input order; sort by index
+    const ordered = [...data.data].sort(
+      (a: { index: number }, b: { index: number }) => a.index - b.index
+    );
+    for (const item of ordered) {
+      embeddings.push(item.embedding);
+    }
+  }
+
+  return embeddings;
+}
+
+serve(async (req: Request) => {
+  // Handle CORS preflight
+  if (req.method === "OPTIONS") {
+    return corsResponse();
+  }
+
+  if (req.method !== "POST") {
+    return error("Method not allowed", 405);
+  }
+
+  const clientInfo = getClientInfo(req);
+
+  try {
+    // Extract authentication headers
+    const yachtId = req.headers.get("X-Yacht-ID");
+    const timestamp = req.headers.get("X-Timestamp");
+    const signature = req.headers.get("X-Signature");
+
+    if (!yachtId || !timestamp || !signature) {
+      return error("Missing authentication headers", 401, "MISSING_AUTH");
+    }
+
+    // Signature covers the raw body, so read it before parsing
+    const rawBody = await req.text();
+
+    let payload: ReplaceRequest;
+    try {
+      payload = JSON.parse(rawBody) as ReplaceRequest;
+    } catch {
+      return error("Invalid request body", 400);
+    }
+
+    if (!Array.isArray(payload.chunks) || !Array.isArray(payload.old_hashes)) {
+      return error("Invalid payload: old_hashes and chunks arrays required", 400);
+    }
+
+    if (payload.yacht_id !== yachtId) {
+      return error("Yacht ID mismatch", 401, "AUTH_FAILED");
+    }
+
+    // Get yacht from registry
+    const yacht = await FleetRegistry.getYacht(yachtId);
+
+    if (!yacht || !yacht.shared_secret) {
+      return error("Authentication failed", 401, "AUTH_FAILED");
+    }
+
+    // Verify HMAC signature
+    const verification = await verifyRawRequestSignature(
+      yacht.shared_secret,
+      rawBody,
+      signature,
+      timestamp
+    );
+
+    if (!verification.valid) {
+      await SecurityEvents.log({
+        yachtId,
+        eventType: "signature_verification_failed",
+        severity: "medium",
+        details: { error: verification.error, endpoint: "replace-document" },
+        ...clientInfo,
+      });
+
+      return error("Authentication failed", 401, "AUTH_FAILED");
+    }
+
+    console.log(
+      `Replacing document for yacht ${yachtId}: ` +
+      `${payload.old_hashes.length} old hashes, ${payload.chunks.length} new chunks`
+    );
+
+    // Embed the whole new chunk set before touching the table, so a
+    // failed embedding call leaves the previous version intact.
+    const embeddings = await generateEmbeddings(payload.chunks.map(c => c.text));
+
+    const rows = payload.chunks.map((chunk, i) => ({
+      ...chunk,
+      embedding: JSON.stringify(embeddings[i]),
+    }));
+
+    const db = getServiceClient();
+    const { data, error: replaceError } = await db.rpc("replace_yacht_document", {
+      p_yacht_id: yachtId,
+      p_old_hashes: payload.old_hashes,
+      p_chunks: rows,
+    });
+
+    if (replaceError) {
+      console.error("Replace document error:", replaceError);
+      return error("Failed to replace document", 500);
+    }
+
+    const result = data?.[0] ?? { deleted: 0, inserted: 0 };
+
+    await AuditLog.log({
+      yachtId,
+      action: "document_replaced",
+      details: {
+        old_hashes: payload.old_hashes.length,
+        deleted: result.deleted,
+        inserted: result.inserted,
+      },
+      ...clientInfo,
+    });
+
+    return success({
+      success: true,
+      deleted: result.deleted,
+      inserted: result.inserted,
+    });
+
+  } catch (err) {
+    console.error("Replace document error:", err);
+
+    await AuditLog.log({
+      action: "replace_document_error",
+      details: { error: String(err) },
+      ...clientInfo,
+    });
+
+    return error("Internal server error", 500);
+  }
+});
@@ -0,0 +1,89 @@
+-- Migration: Transactional document replacement for re-indexing
+-- Date: 2025-11-27
+-- Purpose: Replace all chunks of an edited document in a single statement pair
+--
+-- Previously a re-index cost one delete-chunks call per old file_hash plus
+-- one upsert per new chunk. This function performs a set-based DELETE over
+-- every old hash and a multi-row INSERT of the new chunk set. PL/pgSQL
+-- functions run inside the caller's transaction, so the document is never
+-- observed half-replaced: either both steps commit or neither does.
+
+CREATE OR REPLACE FUNCTION replace_yacht_document(
+    p_yacht_id TEXT,
+    p_old_hashes TEXT[],
+    p_chunks JSONB
+)
+RETURNS TABLE (
+    deleted INTEGER,
+    inserted INTEGER
+) AS $$
+DECLARE
+    v_deleted INTEGER;
+    v_inserted INTEGER;
+BEGIN
+    -- Set-based delete of every previous version of the document
+    DELETE FROM yacht_documents
+    WHERE yacht_id = p_yacht_id
+      AND file_hash = ANY(COALESCE(p_old_hashes, ARRAY[]::TEXT[]));
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    -- Multi-row insert of the new chunk set.
+    -- ON CONFLICT keeps the call idempotent when a retried request re-sends
+    -- chunks whose hash was not part of p_old_hashes.
+    INSERT INTO yacht_documents (
+        yacht_id,
+        file_path,
+        file_hash,
+        chunk_index,
+        chunk_text,
+        char_start,
+        char_end,
+        section,
+        page_numbers,
+        metadata,
+        embedding
+    )
+    SELECT
+        p_yacht_id,
+        c.file_path,
+        c.file_hash,
+        c.chunk_index,
+        c.text,
+        c.char_start,
+        c.char_end,
+        c.section,
+        c.page_numbers,
+        COALESCE(c.metadata, '{}'::JSONB),
+        c.embedding::vector(1536)
+    FROM jsonb_to_recordset(COALESCE(p_chunks, '[]'::JSONB)) AS c(
+        file_path TEXT,
+        file_hash TEXT,
+        chunk_index INTEGER,
+        text TEXT,
+        char_start INTEGER,
+        char_end INTEGER,
+        section TEXT,
+        page_numbers INTEGER[],
+        metadata JSONB,
+        embedding TEXT
+    )
+    ON CONFLICT (yacht_id, file_hash, chunk_index) DO UPDATE SET
+        file_path = EXCLUDED.file_path,
+        chunk_text = EXCLUDED.chunk_text,
+        char_start = EXCLUDED.char_start,
+        char_end = EXCLUDED.char_end,
+        section = EXCLUDED.section,
+        page_numbers = EXCLUDED.page_numbers,
+        metadata = EXCLUDED.metadata,
+        embedding = EXCLUDED.embedding;
+
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+
+    RETURN QUERY SELECT v_deleted, v_inserted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+GRANT EXECUTE ON FUNCTION replace_yacht_document TO service_role;
+
+COMMENT ON FUNCTION replace_yacht_document IS 'Atomically replace a document: set-based delete of old file hashes plus multi-row insert of new chunks';
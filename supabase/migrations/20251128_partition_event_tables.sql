@@ -0,0 +1,251 @@
+-- Migration: Monthly partitioning for audit_log and security_events
+-- Date: 2025-11-28
+-- Purpose: Keep event tables fast and bounded as fleet volume grows
+--
+-- audit_log and security_events were single heap tables written on every
+-- download, verification and rejected signature. They are now range
+-- partitioned by month on created_at:
+--   * recent-window queries prune to one or two partitions
+--   * retention drops whole partitions (no row-by-row DELETE, no bloat)
+--   * BRIN on created_at replaces the btree: rows arrive in time order, so
+--     a few pages of BRIN summarize what the btree needed GBs for
+--
+-- Partitions are named <table>_pYYYY_MM. A <table>_default partition
+-- catches rows outside the created range so inserts never fail;
+-- create_event_partitions() moves any such rows into the proper partition
+-- when it creates it.
+--
+-- Maintenance (python -m lib.maintenance, or pg_cron where installed):
+--   SELECT * FROM create_event_partitions(3);        -- this month + 3 ahead
+--   SELECT * FROM drop_expired_event_partitions(12, 24);
+
+BEGIN;
+
+-- ============================================================================
+-- PARTITIONED TABLES
+-- ============================================================================
+
+ALTER TABLE audit_log RENAME TO audit_log_legacy;
+ALTER TABLE security_events RENAME TO security_events_legacy;
+
+-- Index and primary-key names are schema-wide; free them for the new tables
+ALTER TABLE audit_log_legacy RENAME CONSTRAINT audit_log_pkey TO audit_log_legacy_pkey;
+ALTER TABLE security_events_legacy RENAME CONSTRAINT security_events_pkey TO security_events_legacy_pkey;
+DROP INDEX IF EXISTS idx_audit_log_yacht_id;
+DROP INDEX IF EXISTS idx_audit_log_action;
+DROP INDEX IF EXISTS idx_audit_log_created_at;
+DROP INDEX IF EXISTS idx_security_events_yacht_id;
+DROP INDEX IF EXISTS idx_security_events_severity;
+DROP INDEX IF EXISTS idx_security_events_created_at;
+
+CREATE TABLE audit_log (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    yacht_id TEXT REFERENCES fleet_registry(yacht_id) ON DELETE SET NULL,
+    action TEXT NOT NULL,
+    details JSONB DEFAULT '{}',
+    ip_address TEXT,
+    user_agent TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE security_events (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    yacht_id TEXT REFERENCES fleet_registry(yacht_id) ON DELETE SET NULL,
+    event_type TEXT NOT NULL,
+    severity TEXT NOT NULL CHECK (severity IN ('low', 'medium', 'high', 'critical')),
+    details JSONB DEFAULT '{}',
+    ip_address TEXT,
+    resolved BOOLEAN DEFAULT FALSE,
+    resolved_at TIMESTAMPTZ,
+    resolved_by TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT;
+CREATE TABLE security_events_default PARTITION OF security_events DEFAULT;
+
+-- Indexes on the parent cascade to every partition
+CREATE INDEX idx_audit_log_created_at_brin ON audit_log USING BRIN (created_at);
+CREATE INDEX idx_audit_log_yacht_created ON audit_log (yacht_id, created_at DESC);
+CREATE INDEX idx_audit_log_action ON audit_log (action);
+
+CREATE INDEX idx_security_events_created_at_brin ON security_events USING BRIN (created_at);
+CREATE INDEX idx_security_events_yacht_created ON security_events (yacht_id, created_at DESC);
+CREATE INDEX idx_security_events_severity ON security_events (severity) WHERE NOT resolved;
+
+ALTER TABLE audit_log ENABLE ROW LEVEL SECURITY;
+ALTER TABLE security_events ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role full access" ON audit_log FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON security_events FOR ALL USING (auth.role() = 'service_role');
+
+-- ============================================================================
+-- PARTITION MAINTENANCE
+-- ============================================================================
+
+-- Create the monthly partition of p_table containing p_month.
+-- Rows already sitting in the default partition for that month are moved
+-- in before the partition is attached. Returns FALSE if it already exists.
+CREATE OR REPLACE FUNCTION create_event_partition(p_table TEXT, p_month DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_start TIMESTAMPTZ := date_trunc('month', p_month)::TIMESTAMPTZ;
+    v_end TIMESTAMPTZ := (date_trunc('month', p_month) + INTERVAL '1 month')::TIMESTAMPTZ;
+    v_name TEXT := format('%s_p%s', p_table, to_char(v_start, 'YYYY_MM'));
+BEGIN
+    IF p_table NOT IN ('audit_log', 'security_events') THEN
+        RAISE EXCEPTION 'Not a partitioned event table: %', p_table;
+    END IF;
+
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        v_name, p_table
+    );
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE created_at >= $1 AND created_at < $2 RETURNING *)
+         INSERT INTO %I SELECT * FROM moved',
+        p_table || '_default', v_name
+    ) USING v_start, v_end;
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        p_table, v_name, v_start, v_end
+    );
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Ensure partitions exist from the current month through p_months_ahead.
+CREATE OR REPLACE FUNCTION create_event_partitions(p_months_ahead INTEGER DEFAULT 3)
+RETURNS TABLE (
+    partition_name TEXT,
+    created BOOLEAN
+) AS $$
+DECLARE
+    v_table TEXT;
+    v_month DATE;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['audit_log', 'security_events'] LOOP
+        FOR v_month IN
+            SELECT generate_series(
+                date_trunc('month', NOW()),
+                date_trunc('month', NOW()) + make_interval(months => p_months_ahead),
+                INTERVAL '1 month'
+            )::DATE
+        LOOP
+            partition_name := format('%s_p%s', v_table, to_char(v_month, 'YYYY_MM'));
+            created := create_event_partition(v_table, v_month);
+            RETURN NEXT;
+        END LOOP;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Detach and drop monthly partitions that ended before the retention window.
+-- O(1) per partition regardless of row count.
+CREATE OR REPLACE FUNCTION drop_expired_event_partitions(
+    p_audit_keep_months INTEGER DEFAULT 12,
+    p_security_keep_months INTEGER DEFAULT 24
+)
+RETURNS TABLE (
+    partition_name TEXT
+) AS $$
+DECLARE
+    v_part RECORD;
+    v_cutoff DATE;
+BEGIN
+    FOR v_part IN
+        SELECT parent.relname AS parent_name, child.relname AS child_name
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname IN ('audit_log', 'security_events')
+          AND child.relname ~ '_p[0-9]{4}_[0-9]{2}$'
+    LOOP
+        v_cutoff := date_trunc('month', NOW())::DATE - make_interval(months =>
+            CASE v_part.parent_name
+                WHEN 'audit_log' THEN p_audit_keep_months
+                ELSE p_security_keep_months
+            END);
+
+        -- Partition covers [month, month + 1); drop once it ends at or before the cutoff
+        IF to_date(right(v_part.child_name, 7), 'YYYY_MM') + INTERVAL '1 month' <= v_cutoff THEN
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', v_part.parent_name, v_part.child_name);
+            EXECUTE format('DROP TABLE %I', v_part.child_name);
+            partition_name := v_part.child_name;
+            RETURN NEXT;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Maintenance is for the service role only (not exposed to anon RPC)
+REVOKE EXECUTE ON FUNCTION create_event_partition(TEXT, DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION create_event_partitions(INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION drop_expired_event_partitions(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_event_partitions(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION drop_expired_event_partitions(INTEGER, INTEGER) TO service_role;
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+
+-- Partitions for every month present in the old tables, plus 3 ahead
+DO $$
+DECLARE
+    v_month DATE;
+BEGIN
+    FOR v_month IN
+        SELECT DISTINCT date_trunc('month', created_at)::DATE
+        FROM audit_log_legacy WHERE created_at IS NOT NULL
+    LOOP
+        PERFORM create_event_partition('audit_log', v_month);
+    END LOOP;
+
+    FOR v_month IN
+        SELECT DISTINCT date_trunc('month', created_at)::DATE
+        FROM security_events_legacy WHERE created_at IS NOT NULL
+    LOOP
+        PERFORM create_event_partition('security_events', v_month);
+    END LOOP;
+END;
+$$;
+
+SELECT create_event_partitions(3);
+
+INSERT INTO audit_log (id, yacht_id, action, details, ip_address, user_agent, created_at)
+SELECT id, yacht_id, action, details, ip_address, user_agent, COALESCE(created_at, NOW())
+FROM audit_log_legacy;
+
+INSERT INTO security_events (id, yacht_id, event_type, severity, details, ip_address,
+                             resolved, resolved_at, resolved_by, created_at)
+SELECT id, yacht_id, event_type, severity, details, ip_address,
+       resolved, resolved_at, resolved_by, COALESCE(created_at, NOW())
+FROM security_events_legacy;
+
+DROP TABLE audit_log_legacy;
+DROP TABLE security_events_legacy;
+
+-- ============================================================================
+-- SCHEDULING
+-- ============================================================================
+
+-- Daily maintenance via pg_cron when the extension is enabled; otherwise
+-- run python -m lib.maintenance from any scheduler.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('event-partitions-create', '15 0 * * *',
+                              'SELECT create_event_partitions(3)');
+        PERFORM cron.schedule('event-partitions-retention', '30 0 * * *',
+                              'SELECT drop_expired_event_partitions(12, 24)');
+    END IF;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,262 @@
+-- Migration: Precomputed per-yacht fleet status
+-- Date: 2025-11-29
+-- Purpose: Serve fleet dashboards from one indexed table instead of
+--          aggregating fleet_registry, download_links and audit_log per query
+--
+-- fleet_status is a table-backed materialized view: one row per yacht with
+-- registration / activation / retrieval state, last verification, last
+-- download and failure counts. A native MATERIALIZED VIEW can only be
+-- refreshed whole; this one is refreshed incrementally:
+--
+--   refresh_fleet_status()       recompute only yachts touched since the
+--                                last refresh
+--   refresh_fleet_status(TRUE)   recompute every yacht
+--
+-- "Touched" comes from two sources:
+--   * fleet_status_dirty, filled by triggers on the low-volume tables
+--     (fleet_registry, download_links, security_events updates)
+--   * audit_log / security_events rows newer than the last refresh, found
+--     through the created_at BRIN index and partition pruning, so the
+--     write path of the high-volume tables carries no trigger
+--
+-- Recomputing a yacht is idempotent, so the 5-minute overlap on the
+-- watermark (for late-flushed event batches) costs nothing but a re-read.
+
+BEGIN;
+
+-- ============================================================================
+-- TABLES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS fleet_status (
+    yacht_id TEXT PRIMARY KEY REFERENCES fleet_registry(yacht_id) ON DELETE CASCADE,
+    yacht_name TEXT NOT NULL,
+    buyer_email TEXT NOT NULL,
+    status TEXT NOT NULL CHECK (status IN (
+        'unregistered', 'pending_activation', 'activated', 'operational'
+    )),
+    registered_at TIMESTAMPTZ,
+    activated_at TIMESTAMPTZ,
+    active BOOLEAN NOT NULL DEFAULT FALSE,
+    credentials_retrieved BOOLEAN NOT NULL DEFAULT FALSE,
+    credentials_retrieved_at TIMESTAMPTZ,
+    last_seen_at TIMESTAMPTZ,
+    last_verified_at TIMESTAMPTZ,
+    verify_failures INTEGER NOT NULL DEFAULT 0,
+    last_download_at TIMESTAMPTZ,
+    download_count INTEGER NOT NULL DEFAULT 0,
+    download_failures INTEGER NOT NULL DEFAULT 0,
+    open_security_events INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_fleet_status_status ON fleet_status (status, yacht_id);
+CREATE INDEX IF NOT EXISTS idx_fleet_status_last_verified ON fleet_status (last_verified_at NULLS FIRST);
+CREATE INDEX IF NOT EXISTS idx_fleet_status_open_events
+    ON fleet_status (open_security_events DESC) WHERE open_security_events > 0;
+
+CREATE TABLE IF NOT EXISTS fleet_status_dirty (
+    yacht_id TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS fleet_status_refresh (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    last_refresh_at TIMESTAMPTZ
+);
+INSERT INTO fleet_status_refresh (id, last_refresh_at) VALUES (1, NULL)
+ON CONFLICT (id) DO NOTHING;
+
+ALTER TABLE fleet_status ENABLE ROW LEVEL SECURITY;
+ALTER TABLE fleet_status_dirty ENABLE ROW LEVEL SECURITY;
+ALTER TABLE fleet_status_refresh ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role full access" ON fleet_status FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON fleet_status_dirty FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON fleet_status_refresh FOR ALL USING (auth.role() = 'service_role');
+
+-- ============================================================================
+-- DIRTY TRACKING
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION mark_fleet_status_dirty()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF OLD.yacht_id IS NOT NULL THEN
+            INSERT INTO fleet_status_dirty (yacht_id) VALUES (OLD.yacht_id)
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN OLD;
+    END IF;
+
+    IF NEW.yacht_id IS NOT NULL THEN
+        INSERT INTO fleet_status_dirty (yacht_id) VALUES (NEW.yacht_id)
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trg_fleet_registry_status ON fleet_registry;
+CREATE TRIGGER trg_fleet_registry_status
+    AFTER INSERT OR UPDATE ON fleet_registry
+    FOR EACH ROW EXECUTE FUNCTION mark_fleet_status_dirty();
+
+DROP TRIGGER IF EXISTS trg_download_links_status ON download_links;
+CREATE TRIGGER trg_download_links_status
+    AFTER INSERT OR UPDATE OR DELETE ON download_links
+    FOR EACH ROW EXECUTE FUNCTION mark_fleet_status_dirty();
+
+-- Inserts are found by the created_at watermark; only resolutions need a trigger
+DROP TRIGGER IF EXISTS trg_security_events_status ON security_events;
+CREATE TRIGGER trg_security_events_status
+    AFTER UPDATE OF resolved ON security_events
+    FOR EACH ROW EXECUTE FUNCTION mark_fleet_status_dirty();
+
+-- ============================================================================
+-- REFRESH
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION refresh_fleet_status(p_full BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_since TIMESTAMPTZ;
+    v_started TIMESTAMPTZ := clock_timestamp();
+    v_count INTEGER;
+BEGIN
+    -- One refresh at a time; a concurrent caller waits and then sees little to do
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_fleet_status'));
+
+    SELECT last_refresh_at INTO v_since FROM fleet_status_refresh WHERE id = 1;
+
+    CREATE TEMP TABLE IF NOT EXISTS _fleet_status_targets (yacht_id TEXT PRIMARY KEY) ON COMMIT DROP;
+    TRUNCATE _fleet_status_targets;
+
+    IF p_full OR v_since IS NULL THEN
+        INSERT INTO _fleet_status_targets SELECT yacht_id FROM fleet_registry;
+        DELETE FROM fleet_status_dirty;
+    ELSE
+        WITH claimed AS (DELETE FROM fleet_status_dirty RETURNING yacht_id)
+        INSERT INTO _fleet_status_targets SELECT yacht_id FROM claimed
+        ON CONFLICT DO NOTHING;
+
+        INSERT INTO _fleet_status_targets
+        SELECT DISTINCT yacht_id FROM audit_log
+        WHERE created_at > v_since - INTERVAL '5 minutes' AND yacht_id IS NOT NULL
+        ON CONFLICT DO NOTHING;
+
+        INSERT INTO _fleet_status_targets
+        SELECT DISTINCT yacht_id FROM security_events
+        WHERE created_at > v_since - INTERVAL '5 minutes' AND yacht_id IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    END IF;
+
+    INSERT INTO fleet_status (
+        yacht_id, yacht_name, buyer_email, status,
+        registered_at, activated_at, active,
+        credentials_retrieved, credentials_retrieved_at, last_seen_at,
+        last_verified_at, verify_failures,
+        last_download_at, download_count, download_failures,
+        open_security_events, refreshed_at
+    )
+    SELECT
+        f.yacht_id, f.yacht_name, f.buyer_email,
+        CASE
+            WHEN f.credentials_retrieved THEN 'operational'
+            WHEN f.active THEN 'activated'
+            WHEN f.registered_at IS NOT NULL THEN 'pending_activation'
+            ELSE 'unregistered'
+        END,
+        f.registered_at, f.activated_at, COALESCE(f.active, FALSE),
+        COALESCE(f.credentials_retrieved, FALSE), f.credentials_retrieved_at, f.last_seen_at,
+        a.last_verified_at, COALESCE(a.verify_failures, 0),
+        d.last_download_at, COALESCE(d.download_count, 0), COALESCE(a.download_failures, 0),
+        COALESCE(s.open_events, 0), v_started
+    FROM _fleet_status_targets t
+    JOIN fleet_registry f ON f.yacht_id = t.yacht_id
+    LEFT JOIN LATERAL (
+        SELECT
+            max(created_at) FILTER (WHERE action = 'verify_success') AS last_verified_at,
+            count(*) FILTER (WHERE action IN (
+                'verify_signature_failed', 'verify_not_activated'
+            )) AS verify_failures,
+            count(*) FILTER (WHERE action IN (
+                'download_expired_token', 'download_max_reached', 'download_error'
+            )) AS download_failures
+        FROM audit_log
+        WHERE audit_log.yacht_id = f.yacht_id
+    ) a ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT max(last_download_at) AS last_download_at, sum(download_count) AS download_count
+        FROM download_links
+        WHERE download_links.yacht_id = f.yacht_id
+    ) d ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT count(*) AS open_events
+        FROM security_events
+        WHERE security_events.yacht_id = f.yacht_id AND NOT COALESCE(resolved, FALSE)
+    ) s ON TRUE
+    ON CONFLICT (yacht_id) DO UPDATE SET
+        yacht_name = EXCLUDED.yacht_name,
+        buyer_email = EXCLUDED.buyer_email,
+        status = EXCLUDED.status,
+        registered_at = EXCLUDED.registered_at,
+        activated_at = EXCLUDED.activated_at,
+        active = EXCLUDED.active,
+        credentials_retrieved = EXCLUDED.credentials_retrieved,
+        credentials_retrieved_at = EXCLUDED.credentials_retrieved_at,
+        last_seen_at = EXCLUDED.last_seen_at,
+        last_verified_at = EXCLUDED.last_verified_at,
+        verify_failures = EXCLUDED.verify_failures,
+        last_download_at = EXCLUDED.last_download_at,
+        download_count = EXCLUDED.download_count,
+        download_failures = EXCLUDED.download_failures,
+        open_security_events = EXCLUDED.open_security_events,
+        refreshed_at = EXCLUDED.refreshed_at;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+
+    UPDATE fleet_status_refresh SET last_refresh_at = v_started WHERE id = 1;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Yacht counts per status (fleet_status is one row per yacht, so this is cheap)
+CREATE OR REPLACE FUNCTION fleet_status_summary()
+RETURNS TABLE (
+    status TEXT,
+    yachts BIGINT,
+    with_open_security_events BIGINT,
+    last_refresh_at TIMESTAMPTZ
+) AS $$
+    SELECT fs.status,
+           count(*),
+           count(*) FILTER (WHERE fs.open_security_events > 0),
+           (SELECT last_refresh_at FROM fleet_status_refresh WHERE id = 1)
+    FROM fleet_status fs
+    GROUP BY fs.status
+    ORDER BY fs.status;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION refresh_fleet_status(BOOLEAN) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION fleet_status_summary() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_fleet_status(BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION fleet_status_summary() TO service_role;
+
+-- Initial population
+SELECT refresh_fleet_status(TRUE);
+
+-- Incremental refresh every minute, full nightly, when pg_cron is enabled;
+-- otherwise run python -m lib.maintenance fleet-status [--full]
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('fleet-status-refresh', '* * * * *',
+                              'SELECT refresh_fleet_status()');
+        PERFORM cron.schedule('fleet-status-full-refresh', '45 0 * * *',
+                              'SELECT refresh_fleet_status(TRUE)');
+    END IF;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- Migration: Batch duplicate lookup for NAS ingestion
+-- Date: 2025-11-30
+-- Purpose: Let lib.ingestion check a whole batch of files in one query
+--
+-- The Ingestion_Docs workflow checked duplicates one file at a time by
+-- (yacht_id, filename). lib.ingestion hashes files locally and asks for
+-- every hash in a batch at once:
+--   SELECT * FROM doc_metadata_existing_hashes(yacht_id, ARRAY[...]);
+-- which is a single index probe per hash via sha256 = ANY(...).
+--
+-- The hash list is sent as an RPC body rather than a PostgREST
+-- ?sha256=in.(...) filter so batches of hundreds of hashes do not run
+-- into URL length limits.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_doc_metadata_yacht_sha256
+    ON doc_metadata (yacht_id, sha256)
+    WHERE sha256 IS NOT NULL;
+
+-- Rows of p_yacht_id whose content hash is in p_hashes
+CREATE OR REPLACE FUNCTION doc_metadata_existing_hashes(
+    p_yacht_id UUID,
+    p_hashes TEXT[]
+)
+RETURNS SETOF doc_metadata AS $$
+    SELECT *
+    FROM doc_metadata
+    WHERE yacht_id = p_yacht_id
+      AND sha256 = ANY(p_hashes);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION doc_metadata_existing_hashes(UUID, TEXT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION doc_metadata_existing_hashes(UUID, TEXT[]) TO service_role;
+
+COMMIT;
@@ -0,0 +1,305 @@
+-- Migration: Fleet-wide content-addressed document store
+-- Date: 2025-12-01
+-- Purpose: Store, extract and embed each unique document once per fleet
+--
+-- Yachts of the same build carry the same OEM manuals (MTU engines,
+-- Kohler gensets, ...). doc_metadata / yacht_documents keep and embed one
+-- copy per yacht. Here a document is stored once, keyed by its sha256:
+--
+--   document_blobs        one row per unique file (storage object, size,
+--                         indexing state, reference count)
+--   document_blob_chunks  text chunks + embeddings, once per blob
+--   yacht_document_refs   which yacht has which blob at which path
+--
+-- A yacht adding a manual another yacht already uploaded writes one ref
+-- row: no upload, no text extraction, no embedding. Search goes through
+-- the yacht's refs, so isolation is unchanged.
+--
+-- Blob objects live at <bucket>/blobs/<sha[0:2]>/<sha>.
+
+BEGIN;
+
+-- ============================================================================
+-- TABLES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS document_blobs (
+    sha256 TEXT PRIMARY KEY CHECK (sha256 ~ '^[0-9a-f]{64}$'),
+    storage_path TEXT NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    content_type TEXT,
+    -- NULL until the claiming uploader confirms the object exists
+    uploaded_at TIMESTAMPTZ,
+    indexed BOOLEAN NOT NULL DEFAULT FALSE,
+    indexed_at TIMESTAMPTZ,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS document_blob_chunks (
+    sha256 TEXT NOT NULL REFERENCES document_blobs(sha256) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    chunk_text TEXT NOT NULL,
+    char_start INTEGER,
+    char_end INTEGER,
+    section TEXT,
+    page_numbers INTEGER[],
+    metadata JSONB DEFAULT '{}',
+    embedding vector(1536),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (sha256, chunk_index)
+);
+
+CREATE TABLE IF NOT EXISTS yacht_document_refs (
+    id BIGSERIAL PRIMARY KEY,
+    yacht_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES document_blobs(sha256),
+    file_path TEXT NOT NULL,
+    metadata JSONB DEFAULT '{}',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    -- A path on a yacht holds one version; editing the file re-points it
+    UNIQUE (yacht_id, file_path)
+);
+
+CREATE INDEX IF NOT EXISTS idx_yacht_document_refs_sha256 ON yacht_document_refs (sha256);
+CREATE INDEX IF NOT EXISTS idx_yacht_document_refs_yacht_sha256 ON yacht_document_refs (yacht_id, sha256);
+CREATE INDEX IF NOT EXISTS idx_document_blobs_unindexed ON document_blobs (created_at) WHERE NOT indexed;
+
+CREATE INDEX IF NOT EXISTS idx_document_blob_chunks_embedding
+    ON document_blob_chunks
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+ALTER TABLE document_blobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE document_blob_chunks ENABLE ROW LEVEL SECURITY;
+ALTER TABLE yacht_document_refs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role full access" ON document_blobs FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON document_blob_chunks FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON yacht_document_refs FOR ALL USING (auth.role() = 'service_role');
+
+-- Same isolation as yacht_documents: a yacht sees only its own refs
+CREATE POLICY yacht_document_refs_isolation ON yacht_document_refs
+    FOR SELECT
+    USING (yacht_id = current_setting('request.jwt.claims', true)::json->>'yacht_id');
+
+CREATE TRIGGER update_yacht_document_refs_updated_at
+    BEFORE UPDATE ON yacht_document_refs
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- ============================================================================
+-- REFERENCE COUNTING
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION document_refs_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.sha256 = OLD.sha256 THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE document_blobs SET ref_count = ref_count + 1 WHERE sha256 = NEW.sha256;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE document_blobs SET ref_count = ref_count - 1 WHERE sha256 = OLD.sha256;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER yacht_document_refs_count
+    AFTER INSERT OR DELETE OR UPDATE OF sha256 ON yacht_document_refs
+    FOR EACH ROW
+    EXECUTE FUNCTION document_refs_count();
+
+-- ============================================================================
+-- FUNCTIONS
+-- ============================================================================
+
+-- Register a batch of blobs and tell the caller which ones to upload.
+-- p_blobs: [{"sha256": ..., "size_bytes": ..., "content_type": ...}, ...]
+-- needs_upload is TRUE for the caller that created the row, and for any
+-- caller once an unconfirmed claim is older than 15 minutes (the original
+-- uploader died), so exactly one live uploader sends each blob.
+CREATE OR REPLACE FUNCTION claim_document_blobs(p_blobs JSONB)
+RETURNS TABLE (
+    sha256 TEXT,
+    storage_path TEXT,
+    needs_upload BOOLEAN,
+    indexed BOOLEAN
+) AS $$
+    WITH wanted AS (
+        SELECT DISTINCT ON (b->>'sha256')
+               b->>'sha256' AS sha256,
+               (b->>'size_bytes')::BIGINT AS size_bytes,
+               b->>'content_type' AS content_type
+        FROM jsonb_array_elements(p_blobs) b
+    ),
+    inserted AS (
+        INSERT INTO document_blobs (sha256, storage_path, size_bytes, content_type)
+        SELECT w.sha256,
+               'blobs/' || left(w.sha256, 2) || '/' || w.sha256,
+               w.size_bytes,
+               w.content_type
+        FROM wanted w
+        ON CONFLICT (sha256) DO NOTHING
+        RETURNING document_blobs.sha256, document_blobs.storage_path
+    ),
+    stale AS (
+        UPDATE document_blobs d
+        SET created_at = NOW()
+        FROM wanted w
+        WHERE d.sha256 = w.sha256
+          AND d.uploaded_at IS NULL
+          AND d.created_at < NOW() - INTERVAL '15 minutes'
+        RETURNING d.sha256
+    )
+    -- Pre-existing blobs (the statement snapshot does not see rows
+    -- inserted above, so the two branches do not overlap)
+    SELECT d.sha256, d.storage_path, s.sha256 IS NOT NULL, d.indexed
+    FROM wanted w
+    JOIN document_blobs d ON d.sha256 = w.sha256
+    LEFT JOIN stale s ON s.sha256 = w.sha256
+    UNION ALL
+    SELECT i.sha256, i.storage_path, TRUE, FALSE
+    FROM inserted i;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION mark_document_blobs_uploaded(p_hashes TEXT[])
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE document_blobs
+    SET uploaded_at = NOW()
+    WHERE sha256 = ANY(p_hashes) AND uploaded_at IS NULL;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Called by the indexer after writing a blob's chunks
+CREATE OR REPLACE FUNCTION mark_document_blob_indexed(p_sha256 TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    v_chunks INTEGER;
+BEGIN
+    SELECT count(*) INTO v_chunks FROM document_blob_chunks WHERE sha256 = p_sha256;
+    UPDATE document_blobs
+    SET indexed = TRUE, indexed_at = NOW(), chunk_count = v_chunks
+    WHERE sha256 = p_sha256;
+    RETURN v_chunks;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Semantic search over the blobs a yacht references
+CREATE OR REPLACE FUNCTION search_yacht_blob_chunks(
+    p_yacht_id TEXT,
+    p_query_embedding vector(1536),
+    p_limit INTEGER DEFAULT 10,
+    p_similarity_threshold FLOAT DEFAULT 0.7
+)
+RETURNS TABLE (
+    sha256 TEXT,
+    file_path TEXT,
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    section TEXT,
+    page_numbers INTEGER[],
+    similarity FLOAT,
+    metadata JSONB
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        c.sha256,
+        r.file_path,
+        c.chunk_index,
+        c.chunk_text,
+        c.section,
+        c.page_numbers,
+        1 - (c.embedding <=> p_query_embedding) AS similarity,
+        c.metadata
+    FROM document_blob_chunks c
+    JOIN yacht_document_refs r ON r.sha256 = c.sha256
+    WHERE r.yacht_id = p_yacht_id
+      AND c.embedding IS NOT NULL
+      AND (1 - (c.embedding <=> p_query_embedding)) >= p_similarity_threshold
+    ORDER BY c.embedding <=> p_query_embedding
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Stored vs per-yacht ("logical") volume across the fleet
+CREATE OR REPLACE FUNCTION document_dedup_savings()
+RETURNS TABLE (
+    yachts BIGINT,
+    unique_blobs BIGINT,
+    refs BIGINT,
+    stored_bytes NUMERIC,
+    logical_bytes NUMERIC,
+    stored_chunks NUMERIC,
+    logical_chunks NUMERIC,
+    stored_chunk_chars NUMERIC,
+    logical_chunk_chars NUMERIC
+) AS $$
+    WITH chars AS (
+        SELECT sha256, sum(length(chunk_text)) AS n
+        FROM document_blob_chunks
+        GROUP BY sha256
+    )
+    SELECT
+        (SELECT count(DISTINCT yacht_id) FROM yacht_document_refs),
+        count(*),
+        coalesce(sum(b.ref_count), 0),
+        coalesce(sum(b.size_bytes), 0),
+        coalesce(sum(b.size_bytes * b.ref_count), 0),
+        coalesce(sum(b.chunk_count), 0),
+        coalesce(sum(b.chunk_count * b.ref_count), 0),
+        coalesce(sum(c.n), 0),
+        coalesce(sum(c.n * b.ref_count), 0)
+    FROM document_blobs b
+    LEFT JOIN chars c ON c.sha256 = b.sha256;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION claim_document_blobs(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION mark_document_blobs_uploaded(TEXT[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION mark_document_blob_indexed(TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION document_dedup_savings() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_document_blobs(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION mark_document_blobs_uploaded(TEXT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION mark_document_blob_indexed(TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION document_dedup_savings() TO service_role;
+GRANT EXECUTE ON FUNCTION search_yacht_blob_chunks TO authenticated;
+GRANT EXECUTE ON FUNCTION search_yacht_blob_chunks TO service_role;
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+
+-- Documents already ingested with a hash become blobs; the first copy's
+-- object serves as the blob object, so nothing is re-uploaded.
+INSERT INTO document_blobs (sha256, storage_path, size_bytes, content_type, uploaded_at)
+SELECT DISTINCT ON (sha256)
+       sha256,
+       regexp_replace(storage_path, '^documents/', ''),
+       coalesce(size_bytes, 0),
+       content_type,
+       NOW()
+FROM doc_metadata
+WHERE sha256 ~ '^[0-9a-f]{64}$' AND storage_path IS NOT NULL
+ORDER BY sha256, indexed DESC
+ON CONFLICT (sha256) DO NOTHING;
+
+INSERT INTO yacht_document_refs (yacht_id, sha256, file_path, metadata)
+SELECT DISTINCT ON (yacht_id, original_path)
+       yacht_id::TEXT, sha256, original_path, coalesce(metadata, '{}')
+FROM doc_metadata
+WHERE sha256 ~ '^[0-9a-f]{64}$' AND storage_path IS NOT NULL AND original_path IS NOT NULL
+ORDER BY yacht_id, original_path
+ON CONFLICT (yacht_id, file_path) DO NOTHING;
+
+COMMIT;
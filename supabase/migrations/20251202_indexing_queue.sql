@@ -0,0 +1,313 @@
+-- Migration: Durable indexing job queue
+-- Date: 2025-12-02
+-- Purpose: Decouple document upload from indexing
+--
+-- Ingestion used to call the Index_docs webhook synchronously for every
+-- file: bursts of uploads overloaded indexing and a failed call was lost.
+-- Uploads now enqueue a row in indexing_jobs; lib.indexing workers claim
+-- jobs in batches and run extract -> chunk -> embed -> insert.
+--
+-- Claiming uses FOR UPDATE SKIP LOCKED, so any number of workers pull
+-- disjoint batches without blocking each other. A claim is a lease: a job
+-- whose worker died is handed out again once the lease expires.
+-- Failed jobs are retried with exponential backoff; after max_attempts
+-- they move to indexing_jobs_dead with their last error.
+--
+--   SELECT * FROM enqueue_indexing_jobs('[{...}]');
+--   SELECT * FROM claim_indexing_jobs('worker-1', 10, 600);
+--   SELECT complete_indexing_jobs(ARRAY[...], 'worker-1');
+--   SELECT fail_indexing_job(42, 'worker-1', 'extract: 502');
+--   SELECT * FROM indexing_queue_metrics();
+
+BEGIN;
+
+-- ============================================================================
+-- TABLES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS indexing_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    document_id UUID,
+    yacht_id TEXT NOT NULL,
+    storage_path TEXT NOT NULL,
+    sha256 TEXT,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    locked_at TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+-- Claim order; done rows are not in the index at all
+CREATE INDEX IF NOT EXISTS idx_indexing_jobs_ready
+    ON indexing_jobs (run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_indexing_jobs_running
+    ON indexing_jobs (locked_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_indexing_jobs_finished
+    ON indexing_jobs (finished_at) WHERE status = 'done';
+-- One live job per stored object; re-enqueueing while pending is a no-op
+CREATE UNIQUE INDEX IF NOT EXISTS idx_indexing_jobs_pending_path
+    ON indexing_jobs (storage_path) WHERE status <> 'done';
+
+CREATE TABLE IF NOT EXISTS indexing_jobs_dead (
+    id BIGINT PRIMARY KEY,
+    document_id UUID,
+    yacht_id TEXT NOT NULL,
+    storage_path TEXT NOT NULL,
+    sha256 TEXT,
+    payload JSONB NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL,
+    died_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_indexing_jobs_dead_died_at ON indexing_jobs_dead (died_at DESC);
+
+ALTER TABLE indexing_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE indexing_jobs_dead ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role full access" ON indexing_jobs FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON indexing_jobs_dead FOR ALL USING (auth.role() = 'service_role');
+
+-- ============================================================================
+-- QUEUE FUNCTIONS
+-- ============================================================================
+
+-- p_jobs: [{"document_id", "yacht_id", "storage_path", "sha256", "payload"}, ...]
+-- Returns the number of jobs actually queued (pending duplicates skipped).
+CREATE OR REPLACE FUNCTION enqueue_indexing_jobs(p_jobs JSONB, p_max_attempts INTEGER DEFAULT 5)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO indexing_jobs (document_id, yacht_id, storage_path, sha256, payload, max_attempts)
+    SELECT (j->>'document_id')::UUID,
+           j->>'yacht_id',
+           j->>'storage_path',
+           j->>'sha256',
+           coalesce(j->'payload', '{}'),
+           p_max_attempts
+    FROM jsonb_array_elements(p_jobs) j
+    ON CONFLICT (storage_path) WHERE status <> 'done' DO NOTHING;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Lease up to p_limit ready jobs (or jobs whose lease expired) to p_worker.
+CREATE OR REPLACE FUNCTION claim_indexing_jobs(
+    p_worker TEXT,
+    p_limit INTEGER DEFAULT 10,
+    p_lease_seconds INTEGER DEFAULT 600
+)
+RETURNS SETOF indexing_jobs AS $$
+    WITH ready AS (
+        SELECT id FROM indexing_jobs
+        WHERE status = 'queued' AND run_after <= NOW()
+        ORDER BY run_after, id
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ),
+    expired AS (
+        SELECT id FROM indexing_jobs
+        WHERE status = 'running'
+          AND locked_at < NOW() - make_interval(secs => p_lease_seconds)
+          -- A job that keeps killing its worker is left for prune to dead-letter
+          AND attempts < max_attempts
+        ORDER BY locked_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ),
+    -- Abandoned jobs first, then the oldest ready ones
+    locked AS (
+        SELECT id FROM expired
+        UNION ALL
+        SELECT id FROM ready
+        LIMIT p_limit
+    )
+    UPDATE indexing_jobs j
+    SET status = 'running',
+        locked_by = p_worker,
+        locked_at = NOW(),
+        started_at = coalesce(j.started_at, NOW()),
+        attempts = j.attempts + 1
+    FROM locked
+    WHERE j.id = locked.id
+    RETURNING j.*;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- Mark jobs done. Only the leaseholder's jobs are touched, so a worker
+-- whose lease expired cannot complete a job someone else now holds.
+CREATE OR REPLACE FUNCTION complete_indexing_jobs(p_ids BIGINT[], p_worker TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE indexing_jobs
+    SET status = 'done', finished_at = NOW(), locked_by = NULL, locked_at = NULL, last_error = NULL
+    WHERE id = ANY(p_ids) AND status = 'running' AND locked_by = p_worker;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Record a failure: reschedule with exponential backoff (with jitter,
+-- capped at 1 hour), or dead-letter after max_attempts.
+-- Returns 'retry', 'dead', or NULL if p_worker no longer holds the job.
+CREATE OR REPLACE FUNCTION fail_indexing_job(
+    p_id BIGINT,
+    p_worker TEXT,
+    p_error TEXT,
+    p_base_delay_seconds INTEGER DEFAULT 30
+)
+RETURNS TEXT AS $$
+DECLARE
+    v_job indexing_jobs%ROWTYPE;
+BEGIN
+    SELECT * INTO v_job FROM indexing_jobs
+    WHERE id = p_id AND status = 'running' AND locked_by = p_worker
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    IF v_job.attempts >= v_job.max_attempts THEN
+        INSERT INTO indexing_jobs_dead (id, document_id, yacht_id, storage_path, sha256,
+                                        payload, attempts, last_error, created_at)
+        VALUES (v_job.id, v_job.document_id, v_job.yacht_id, v_job.storage_path, v_job.sha256,
+                v_job.payload, v_job.attempts, left(p_error, 2000), v_job.created_at);
+        DELETE FROM indexing_jobs WHERE id = p_id;
+        RETURN 'dead';
+    END IF;
+
+    UPDATE indexing_jobs
+    SET status = 'queued',
+        locked_by = NULL,
+        locked_at = NULL,
+        last_error = left(p_error, 2000),
+        run_after = NOW() + make_interval(secs =>
+            least(3600, p_base_delay_seconds * power(2, v_job.attempts - 1)) * (0.5 + random() / 2))
+    WHERE id = p_id;
+    RETURN 'retry';
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Put dead jobs back on the queue (all of them when p_ids is NULL)
+CREATE OR REPLACE FUNCTION retry_dead_indexing_jobs(p_ids BIGINT[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH revived AS (
+        DELETE FROM indexing_jobs_dead
+        WHERE p_ids IS NULL OR id = ANY(p_ids)
+        RETURNING *
+    )
+    INSERT INTO indexing_jobs (document_id, yacht_id, storage_path, sha256, payload, created_at)
+    SELECT document_id, yacht_id, storage_path, sha256, payload, created_at
+    FROM revived
+    ON CONFLICT (storage_path) WHERE status <> 'done' DO NOTHING;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Depth and lag
+--   ready:            queued and due now
+--   scheduled:        queued, waiting out a retry backoff
+--   lag_seconds:      age of the oldest ready job (how far behind workers are)
+--   expired_leases:   running jobs whose worker missed its lease
+CREATE OR REPLACE FUNCTION indexing_queue_metrics()
+RETURNS TABLE (
+    ready BIGINT,
+    scheduled BIGINT,
+    running BIGINT,
+    expired_leases BIGINT,
+    dead BIGINT,
+    done_last_hour BIGINT,
+    failed_attempts_last_hour BIGINT,
+    lag_seconds DOUBLE PRECISION,
+    avg_wait_seconds_last_hour DOUBLE PRECISION,
+    avg_run_seconds_last_hour DOUBLE PRECISION
+) AS $$
+    SELECT
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'queued' AND run_after <= NOW()),
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'queued' AND run_after > NOW()),
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'running'),
+        (SELECT count(*) FROM indexing_jobs
+         WHERE status = 'running' AND locked_at < NOW() - INTERVAL '10 minutes'),
+        (SELECT count(*) FROM indexing_jobs_dead),
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour'),
+        (SELECT coalesce(sum(attempts - 1), 0) FROM indexing_jobs
+         WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour'),
+        (SELECT coalesce(extract(epoch FROM NOW() - min(run_after)), 0) FROM indexing_jobs
+         WHERE status = 'queued' AND run_after <= NOW()),
+        (SELECT extract(epoch FROM avg(started_at - created_at)) FROM indexing_jobs
+         WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour'),
+        (SELECT extract(epoch FROM avg(finished_at - locked_at)) FROM indexing_jobs
+         WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour');
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- Delete finished jobs older than p_keep_days, and dead-letter jobs that
+-- used their last attempt and never reported back (worker crashed on them)
+CREATE OR REPLACE FUNCTION prune_indexing_jobs(p_keep_days INTEGER DEFAULT 7)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH abandoned AS (
+        DELETE FROM indexing_jobs
+        WHERE status = 'running'
+          AND attempts >= max_attempts
+          AND locked_at < NOW() - INTERVAL '1 day'
+        RETURNING *
+    )
+    INSERT INTO indexing_jobs_dead (id, document_id, yacht_id, storage_path, sha256,
+                                    payload, attempts, last_error, created_at)
+    SELECT id, document_id, yacht_id, storage_path, sha256, payload, attempts,
+           coalesce(last_error || '; ', '') || 'lease expired on final attempt', created_at
+    FROM abandoned;
+
+    DELETE FROM indexing_jobs
+    WHERE status = 'done' AND finished_at < NOW() - make_interval(days => p_keep_days);
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION enqueue_indexing_jobs(JSONB, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION claim_indexing_jobs(TEXT, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION complete_indexing_jobs(BIGINT[], TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION fail_indexing_job(BIGINT, TEXT, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION retry_dead_indexing_jobs(BIGINT[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION indexing_queue_metrics() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION prune_indexing_jobs(INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION enqueue_indexing_jobs(JSONB, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION claim_indexing_jobs(TEXT, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION complete_indexing_jobs(BIGINT[], TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION fail_indexing_job(BIGINT, TEXT, TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION retry_dead_indexing_jobs(BIGINT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION indexing_queue_metrics() TO service_role;
+GRANT EXECUTE ON FUNCTION prune_indexing_jobs(INTEGER) TO service_role;
+
+-- ============================================================================
+-- SCHEDULING
+-- ============================================================================
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('indexing-jobs-prune', '45 0 * * *',
+                              'SELECT prune_indexing_jobs(7)');
+    END IF;
+END;
+$$;
+
+COMMIT;
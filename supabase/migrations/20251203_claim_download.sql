@@ -0,0 +1,96 @@
+-- Migration: Atomic download claim
+-- Date: 2025-12-03
+-- Purpose: Validate a download token and count the download in one statement
+--
+-- The download function used to select the link (joined to
+-- fleet_registry), check expiry and the limit in TypeScript, then write
+-- download_count + 1. Two concurrent requests could both read count = 2
+-- and both pass a limit of 3. claim_download() does the check and the
+-- increment in one conditional UPDATE: a concurrent claim waits on the
+-- row lock and re-checks the limit against the committed count, so the
+-- limit cannot be exceeded. It also returns the yacht fields the function
+-- needs, so a download costs one round-trip.
+--
+-- status is one of:
+--   ok             counted; download_count is this download's number
+--   resumed        p_resume and a counted download within p_resume_window;
+--                  nothing counted
+--   invalid        no such download token
+--   expired        past expires_at
+--   limit_reached  download_count already at max_downloads
+--
+--   SELECT * FROM claim_download('<sha256 of token>', '203.0.113.7');
+--   SELECT * FROM claim_download('<sha256 of token>', NULL, TRUE);
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION claim_download(
+    p_token_hash TEXT,
+    p_ip_address TEXT DEFAULT NULL,
+    p_resume BOOLEAN DEFAULT FALSE,
+    p_resume_window INTERVAL DEFAULT INTERVAL '24 hours'
+)
+RETURNS TABLE(
+    status TEXT,
+    link_id UUID,
+    yacht_id TEXT,
+    yacht_name TEXT,
+    dmg_sha256 TEXT,
+    download_count INTEGER,
+    max_downloads INTEGER,
+    expires_at TIMESTAMPTZ
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_link download_links%ROWTYPE;
+    v_status TEXT := 'ok';
+BEGIN
+    UPDATE download_links d
+    SET download_count = d.download_count + 1,
+        last_download_at = NOW(),
+        last_download_ip = COALESCE(p_ip_address, d.last_download_ip)
+    WHERE d.token_hash = p_token_hash
+      AND d.is_activation_link IS NOT TRUE
+      AND d.expires_at > NOW()
+      AND d.download_count < COALESCE(d.max_downloads, 3)
+      AND NOT (p_resume
+               AND d.download_count > 0
+               AND d.last_download_at > NOW() - p_resume_window)
+    RETURNING d.* INTO v_link;
+
+    IF NOT FOUND THEN
+        -- Nothing counted: say why
+        SELECT d.* INTO v_link
+        FROM download_links d
+        WHERE d.token_hash = p_token_hash
+          AND d.is_activation_link IS NOT TRUE;
+
+        IF NOT FOUND THEN
+            RETURN QUERY SELECT 'invalid'::TEXT, NULL::UUID, NULL::TEXT, NULL::TEXT,
+                                NULL::TEXT, NULL::INTEGER, NULL::INTEGER, NULL::TIMESTAMPTZ;
+            RETURN;
+        END IF;
+
+        v_status := CASE
+            WHEN v_link.expires_at <= NOW() THEN 'expired'
+            WHEN p_resume
+                 AND v_link.download_count > 0
+                 AND v_link.last_download_at > NOW() - p_resume_window THEN 'resumed'
+            ELSE 'limit_reached'
+        END;
+    END IF;
+
+    RETURN QUERY
+    SELECT v_status, v_link.id, v_link.yacht_id, f.yacht_name, f.dmg_sha256,
+           v_link.download_count, COALESCE(v_link.max_downloads, 3), v_link.expires_at
+    FROM (SELECT 1) AS one
+    LEFT JOIN fleet_registry f ON f.yacht_id = v_link.yacht_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+COMMENT ON FUNCTION claim_download IS 'Validate a download token and count the download atomically (one round-trip)';
+
+REVOKE EXECUTE ON FUNCTION claim_download(TEXT, TEXT, BOOLEAN, INTERVAL) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_download(TEXT, TEXT, BOOLEAN, INTERVAL) TO service_role;
+
+COMMIT;
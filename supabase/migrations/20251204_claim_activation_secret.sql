@@ -0,0 +1,69 @@
+-- Migration: Atomic one-time credential claim
+-- Date: 2025-12-04
+-- Purpose: Hand out shared_secret exactly once in a single statement
+--
+-- check-activation used to select the yacht row, branch on active /
+-- credentials_retrieved in TypeScript, then call retrieve_credentials(),
+-- which locked and re-read the row before flipping the flag: three
+-- round-trips per poll, and a retrying agent polls in parallel.
+-- claim_activation_secret() flips credentials_retrieved in one conditional
+-- UPDATE and returns the secret from RETURNING. A concurrent claim waits
+-- on the row lock, re-checks credentials_retrieved against the committed
+-- row and matches nothing, so exactly one caller ever sees the secret.
+-- Only a poll that gets nothing does a second (read-only) query to say why.
+--
+-- status is one of:
+--   active             claimed; shared_secret is returned (first call only)
+--   pending            not activated by the owner yet
+--   already_retrieved  claimed before; retrieved_at is the first claim
+--   not_found          no such yacht
+--
+--   SELECT * FROM claim_activation_secret('YACHT_001');
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION claim_activation_secret(p_yacht_id TEXT)
+RETURNS TABLE(
+    status TEXT,
+    shared_secret TEXT,
+    retrieved_at TIMESTAMPTZ
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_yacht fleet_registry%ROWTYPE;
+BEGIN
+    UPDATE fleet_registry f
+    SET credentials_retrieved = TRUE,
+        credentials_retrieved_at = NOW(),
+        last_seen_at = NOW()
+    WHERE f.yacht_id = p_yacht_id
+      AND f.active
+      AND f.credentials_retrieved IS NOT TRUE
+      AND f.shared_secret IS NOT NULL
+    RETURNING f.* INTO v_yacht;
+
+    IF FOUND THEN
+        RETURN QUERY SELECT 'active'::TEXT, v_yacht.shared_secret, v_yacht.credentials_retrieved_at;
+        RETURN;
+    END IF;
+
+    -- Nothing claimed: say why, never with the secret
+    SELECT f.* INTO v_yacht FROM fleet_registry f WHERE f.yacht_id = p_yacht_id;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'not_found'::TEXT, NULL::TEXT, NULL::TIMESTAMPTZ;
+    ELSIF v_yacht.credentials_retrieved THEN
+        RETURN QUERY SELECT 'already_retrieved'::TEXT, NULL::TEXT, v_yacht.credentials_retrieved_at;
+    ELSE
+        -- Not active, or active without a secret yet (activation in flight)
+        RETURN QUERY SELECT 'pending'::TEXT, NULL::TEXT, NULL::TIMESTAMPTZ;
+    END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+COMMENT ON FUNCTION claim_activation_secret IS 'Claim a yacht''s shared_secret exactly once (one conditional UPDATE ... RETURNING)';
+
+REVOKE EXECUTE ON FUNCTION claim_activation_secret(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_activation_secret(TEXT) TO service_role;
+
+COMMIT;
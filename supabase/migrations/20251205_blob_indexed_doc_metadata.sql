@@ -0,0 +1,52 @@
+-- Migration: Propagate blob indexing to doc_metadata
+-- Date: 2025-12-05
+-- Purpose: Keep doc_metadata.indexed true for every yacht sharing a blob
+--
+-- With the fleet blob store only the yacht that claims a blob sends it for
+-- indexing; every other yacht inserts its doc_metadata row with the
+-- blob's indexed flag at that instant, usually false. The worker then
+-- marks document_blobs indexed but only PATCHes the claimer's own row,
+-- so the other yachts' rows stayed indexed = false, and ingestion now
+-- re-enqueues unindexed rows on every run.
+-- mark_document_blob_indexed() flags every doc_metadata row with the
+-- blob's sha256 in the same transaction, and already-indexed blobs are
+-- backfilled once here.
+
+BEGIN;
+
+-- sha256-only lookups (the existing index leads with yacht_id)
+CREATE INDEX IF NOT EXISTS idx_doc_metadata_sha256_unindexed
+    ON doc_metadata (sha256)
+    WHERE sha256 IS NOT NULL AND indexed IS NOT TRUE;
+
+CREATE OR REPLACE FUNCTION mark_document_blob_indexed(p_sha256 TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    v_chunks INTEGER;
+BEGIN
+    SELECT count(*) INTO v_chunks FROM document_blob_chunks WHERE sha256 = p_sha256;
+    UPDATE document_blobs
+    SET indexed = TRUE, indexed_at = NOW(), chunk_count = v_chunks
+    WHERE sha256 = p_sha256;
+    UPDATE doc_metadata
+    SET indexed = TRUE
+    WHERE sha256 = p_sha256 AND indexed IS NOT TRUE;
+    RETURN v_chunks;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION mark_document_blob_indexed(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION mark_document_blob_indexed(TEXT) TO service_role;
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+
+UPDATE doc_metadata d
+SET indexed = TRUE
+FROM document_blobs b
+WHERE d.sha256 = b.sha256
+  AND b.indexed
+  AND d.indexed IS NOT TRUE;
+
+COMMIT;
@@ -0,0 +1,51 @@
+-- Migration: Lease-aware indexing queue metrics
+-- Date: 2025-12-06
+-- Purpose: Count expired leases against the lease workers actually use
+--
+-- indexing_queue_metrics() reported running jobs older than a hardcoded
+-- 10 minutes as expired_leases, while the lease is set per worker
+-- (claim_indexing_jobs p_lease_seconds, `lib.indexing work --lease`).
+-- It now takes the lease length, defaulting to the workers' 600 s.
+--
+--   SELECT * FROM indexing_queue_metrics(900);
+
+BEGIN;
+
+-- Signature changes: drop the old one so a bare call is not ambiguous
+DROP FUNCTION IF EXISTS indexing_queue_metrics();
+
+CREATE OR REPLACE FUNCTION indexing_queue_metrics(p_lease_seconds INTEGER DEFAULT 600)
+RETURNS TABLE (
+    ready BIGINT,
+    scheduled BIGINT,
+    running BIGINT,
+    expired_leases BIGINT,
+    dead BIGINT,
+    done_last_hour BIGINT,
+    failed_attempts_last_hour BIGINT,
+    lag_seconds DOUBLE PRECISION,
+    avg_wait_seconds_last_hour DOUBLE PRECISION,
+    avg_run_seconds_last_hour DOUBLE PRECISION
+) AS $$
+    SELECT
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'queued' AND run_after <= NOW()),
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'queued' AND run_after > NOW()),
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'running'),
+        (SELECT count(*) FROM indexing_jobs
+         WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => p_lease_seconds)),
+        (SELECT count(*) FROM indexing_jobs_dead),
+        (SELECT count(*) FROM indexing_jobs WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour'),
+        (SELECT coalesce(sum(attempts - 1), 0) FROM indexing_jobs
+         WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour'),
+        (SELECT coalesce(extract(epoch FROM NOW() - min(run_after)), 0) FROM indexing_jobs
+         WHERE status = 'queued' AND run_after <= NOW()),
+        (SELECT extract(epoch FROM avg(started_at - created_at)) FROM indexing_jobs
+         WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour'),
+        (SELECT extract(epoch FROM avg(finished_at - locked_at)) FROM indexing_jobs
+         WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour');
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION indexing_queue_metrics(INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION indexing_queue_metrics(INTEGER) TO service_role;
+
+COMMIT;